@@ -1,23 +1,202 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Request, Response, render_template, request, jsonify, stream_with_context, url_for
 import os
-import requests
+import logging
 import base64
 import json
+import hashlib
+import hmac
+import math
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from batch import BatchError, read_zip_images, run_batch, skipped
+from cache import DiskCache, TTLCache
+from config import (
+    OCR_PROMPT, OCR_CACHE_MAX_ENTRIES, OCR_CACHE_TTL_SECONDS,
+    OCR_CACHE_PATH, OCR_CACHE_DISK_MAX_ENTRIES, SCENARIO_CACHE_ENABLED,
+    SCENARIO_CACHE_MAX_ENTRIES, SCENARIO_CACHE_TTL_SECONDS,
+    JOB_WORKERS, JOB_QUEUE_SIZE, JOB_RESULT_TTL_SECONDS, JOB_MAX_WAIT_SECONDS,
+    BATCH_CONCURRENCY, BATCH_MAX_ITEMS, BATCH_MAX_ARCHIVE_BYTES, UPLOAD_MAX_BYTES,
+    OCR_PREPROCESS, OCR_MAX_SIDE, OCR_GRAYSCALE, OCR_JPEG_QUALITY, LOG_LEVEL, LOG_FORMAT,
+    PROFILE_TOKEN, PROFILE_TOP_N, PROFILE_DIR, CACHE_ADMIN_TOKEN, ANALYSIS_MODE,
+    CASCADE_UNCERTAIN_MIN, CASCADE_UNCERTAIN_MAX, CASCADE_TRIGGER_CATEGORIES,
+    CATEGORY_PENALTIES, FINDING_PENALTY, LOW_RISK_MIN_SCORE, MEDIUM_RISK_MIN_SCORE,
+    SCHEDULER_MAX_WAIT_SECONDS, OCR_PHASH_ENABLED, OCR_PHASH_MAX_DISTANCE, OCR_PHASH_MAX_ENTRIES,
+    OCR_PHASH_MAX_PIXEL_DISTANCE,
+    SCENARIO_MODE, LOCAL_SCENARIOS_SPECIALIZE, OCR_HEDGE_ENABLED, OCR_HEDGE_PERCENTILE,
+    OCR_HEDGE_MIN_DELAY, OCR_HEDGE_MAX_RATE, OCR_HEDGE_MODEL, OCR_TILE_ENABLED,
+    OCR_TILE_MIN_HEIGHT, OCR_TILE_MIN_ASPECT, OCR_TILE_HEIGHT, OCR_TILE_OVERLAP,
+    OCR_TILE_MAX_TILES, SCENARIO_TEXT_MAX_CHARS, OCR_PREFILTER_ENABLED, OCR_PREFILTER_MIN_BLOCKS
+)
+from detector import DETECTOR, IncrementalDetector
+from hedge import HedgePolicy
+from image_preprocess import preprocess_image, sniff_mime_type
+from jobs import JobManager, QueueFullError
+from log import configure_logging
+from metrics import FAST_BUCKETS, REGISTRY
+from openrouter import CLIENT, IMAGE_PLACEHOLDER, build_request_body
+from phash import NearDuplicateIndex
+from prefilter import TextPrefilter
+from profiling import profile_call, record_stage
+from redact import RedactionError, redact_image
+from rescore import BulkScorer, InvalidRecord, read_records
+import scheduler
+from scheduler import SCHEDULER, SchedulerRejected
+from tiles import image_size, split_image, stitch_text, tile_bounds
+import utils
 
 # Load environment variables
 load_dotenv()
 
+configure_logging(LOG_LEVEL, LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+class UploadRequest(Request):
+    """Request whose body size limit can be raised per endpoint"""
+
+    @property
+    def max_content_length(self):
+        # Batch archives are bounded by their own limits instead
+        if self.endpoint == 'analyze_batch':
+            return max(app.config['MAX_CONTENT_LENGTH'], BATCH_MAX_ARCHIVE_BYTES)
+        return app.config['MAX_CONTENT_LENGTH']
+
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'static/uploads'
+app.request_class = UploadRequest
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
 # Configuration
-OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
 MODEL_NAME = "qwen/qwen2.5-vl-72b-instruct:free"
 
+# Cache of OCR results so re-uploaded images skip the model call
+OCR_CACHE = TTLCache(
+    max_entries=OCR_CACHE_MAX_ENTRIES,
+    ttl_seconds=OCR_CACHE_TTL_SECONDS,
+    disk=DiskCache(OCR_CACHE_PATH, OCR_CACHE_DISK_MAX_ENTRIES, OCR_CACHE_TTL_SECONDS) if OCR_CACHE_PATH else None
+)
+
+# Perceptual-hash index so re-compressed copies reuse OCR text
+OCR_INDEX = NearDuplicateIndex(
+    max_distance=OCR_PHASH_MAX_DISTANCE,
+    max_entries=OCR_PHASH_MAX_ENTRIES,
+    max_pixel_distance=OCR_PHASH_MAX_PIXEL_DISTANCE
+) if OCR_PHASH_ENABLED else None
+
+# Local check that skips OCR for images without text
+OCR_PREFILTER = TextPrefilter(min_blocks=OCR_PREFILTER_MIN_BLOCKS) if OCR_PREFILTER_ENABLED else None
+
+# Duplicate OCR calls that are slower than usual
+OCR_HEDGE = HedgePolicy(
+    'ocr',
+    percentile=OCR_HEDGE_PERCENTILE,
+    min_delay=OCR_HEDGE_MIN_DELAY,
+    max_rate=OCR_HEDGE_MAX_RATE
+) if OCR_HEDGE_ENABLED else None
+
+# Cache of risk scenarios keyed by the detected findings
+SCENARIO_CACHE = TTLCache(
+    max_entries=SCENARIO_CACHE_MAX_ENTRIES,
+    ttl_seconds=SCENARIO_CACHE_TTL_SECONDS
+) if SCENARIO_CACHE_ENABLED else None
+
+# Worker pool for /analyze?async=1
+JOBS = JobManager(workers=JOB_WORKERS, max_queue=JOB_QUEUE_SIZE, result_ttl=JOB_RESULT_TTL_SECONDS)
+
+# Metrics exposed on /metrics
+STAGE_SECONDS = REGISTRY.histogram('analyze_stage_seconds', 'Time spent in each analysis stage',
+                                   ('stage',), FAST_BUCKETS)
+SCENARIO_SOURCES = REGISTRY.counter('scenario_source_total',
+                                    'Risk scenario results by source (none, local, cache, model, fallback)',
+                                    ('source',))
+OCR_TILES = REGISTRY.histogram('ocr_tiles', 'Strips each image was read in',
+                               buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32))
+OCR_TEXT_CHARS = REGISTRY.histogram('ocr_text_chars', 'Length of the extracted text in characters',
+                                    buckets=(0, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+UPLOAD_BYTES = REGISTRY.histogram('upload_bytes', 'Size of uploaded images in bytes',
+                                  buckets=(1e4, 5e4, 1e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 1.6e7))
+CASCADE_DECISIONS = REGISTRY.counter('cascade_decisions_total',
+                                     'Cascade-mode texts kept local or escalated to the LLM',
+                                     ('decision', 'reason'))
+HTTP_REQUESTS = REGISTRY.counter('http_requests_total', 'HTTP requests by endpoint and status',
+                                 ('endpoint', 'method', 'status'))
+HTTP_SECONDS = REGISTRY.histogram('http_request_seconds', 'Time to produce an HTTP response',
+                                  ('endpoint',))
+
+@contextmanager
+def stage_timer(stage):
+    """Time the with block into the stage histogram and any active profile"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+        record_stage(stage, elapsed)
+
+def _cache_stats():
+    caches = [('ocr', OCR_CACHE)]
+    if SCENARIO_CACHE is not None:
+        caches.append(('scenarios', SCENARIO_CACHE))
+    return [(name, cache.stats()) for name, cache in caches]
+
+def _cache_metric(field):
+    return lambda: [({'cache': name}, stats[field]) for name, stats in _cache_stats()]
+
+REGISTRY.callback('cache_hits_total', 'Cache lookups answered from memory or disk', 'counter',
+                  _cache_metric('hits'))
+REGISTRY.callback('cache_disk_hits_total', 'Cache hits served from the disk tier (included in cache_hits_total)',
+                  'counter', _cache_metric('disk_hits'))
+REGISTRY.callback('cache_misses_total', 'Cache lookups that ran the computation', 'counter',
+                  _cache_metric('misses'))
+REGISTRY.callback('cache_coalesced_total', 'Cache lookups that waited on an identical in-flight call',
+                  'counter', _cache_metric('coalesced'))
+def _near_duplicate_lookups():
+    if OCR_INDEX is None:
+        return []
+    stats = OCR_INDEX.stats()
+    return [({'outcome': 'hit'}, stats['hits']), ({'outcome': 'miss'}, stats['lookups'] - stats['hits'])]
+
+REGISTRY.callback('phash_lookups_total', 'Near-duplicate index lookups by outcome', 'counter',
+                  _near_duplicate_lookups)
+REGISTRY.callback('phash_entries', 'Images in the near-duplicate index', 'gauge',
+                  lambda: [({}, OCR_INDEX.stats()['entries'])] if OCR_INDEX is not None else [])
+REGISTRY.callback('hedge_rate', 'Share of recent OCR calls that were hedged', 'gauge',
+                  lambda: [({'call': 'ocr'}, OCR_HEDGE.stats()['hedge_rate'])] if OCR_HEDGE is not None else [])
+REGISTRY.callback('hedge_p99_improvement_seconds', 'OCR p99 without hedging minus the p99 callers saw', 'gauge',
+                  lambda: [({'call': 'ocr'}, OCR_HEDGE.stats()['p99_improvement'] or 0.0)]
+                  if OCR_HEDGE is not None else [])
+REGISTRY.callback('ocr_prefilter_seconds_saved_total', 'Estimated OCR time saved by prefilter skips', 'counter',
+                  lambda: [({}, prefilter_stats()['estimated_seconds_saved'] or 0.0)]
+                  if OCR_PREFILTER is not None else [])
+REGISTRY.callback('cache_entries', 'Entries held in memory', 'gauge', _cache_metric('entries'))
+REGISTRY.callback('cache_seconds_saved_total', 'Model time saved by cache hits', 'counter',
+                  _cache_metric('seconds_saved'))
+REGISTRY.callback('openrouter_retries_total', 'OpenRouter calls retried after 429, 5xx or connection errors',
+                  'counter', lambda: [({}, CLIENT.stats()['retries'])])
+def _scheduler_metric(field):
+    return lambda: [({'priority': name}, value) for name, value in SCHEDULER.stats()[field].items()]
+
+REGISTRY.callback('scheduler_queued', 'Upstream calls waiting for the scheduler', 'gauge',
+                  _scheduler_metric('queued'))
+REGISTRY.callback('scheduler_rejected_total', 'Upstream calls rejected because they would miss their deadline',
+                  'counter', _scheduler_metric('rejected'))
+REGISTRY.callback('scheduler_estimated_wait_seconds', 'Estimated wait for a new upstream call', 'gauge',
+                  _scheduler_metric('estimated_wait'))
+REGISTRY.callback('scheduler_in_flight', 'Upstream calls holding a concurrency slot', 'gauge',
+                  lambda: [({}, SCHEDULER.stats()['in_flight'])])
+REGISTRY.callback('scheduler_tokens', 'Requests left in the rate limit bucket', 'gauge',
+                  lambda: [({}, SCHEDULER.stats()['tokens'])])
+REGISTRY.callback('jobs_queued', 'Async jobs waiting for a worker', 'gauge',
+                  lambda: [({}, JOBS.stats()['queued'])])
+REGISTRY.callback('jobs_running', 'Async jobs being run', 'gauge',
+                  lambda: [({}, JOBS.stats()['running'])])
+REGISTRY.callback('jobs_rejected_total', 'Async jobs rejected because the queue was full', 'counter',
+                  lambda: [({}, JOBS.stats()['rejected'])])
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -29,51 +208,349 @@ def encode_image_to_base64(image_path):
     except Exception as e:
         raise Exception(f"Error encoding image: {str(e)}")
 
+def ocr_settings():
+    """Everything besides the image that shapes the OCR text"""
+    settings = [MODEL_NAME, OCR_PROMPT]
+    # Pre-processing changes what the model sees, so it is part of the key
+    if OCR_PREPROCESS:
+        settings.append(f'{OCR_MAX_SIDE}:{OCR_GRAYSCALE}:{OCR_JPEG_QUALITY}')
+    if OCR_TILE_ENABLED:
+        settings.append(f'tiles:{OCR_TILE_MIN_HEIGHT}:{OCR_TILE_MIN_ASPECT}:{OCR_TILE_HEIGHT}:'
+                        f'{OCR_TILE_OVERLAP}:{OCR_TILE_MAX_TILES}')
+    return '\0'.join(settings)
+
+def ocr_cache_key(image_bytes):
+    """Content address for an OCR result: image bytes and OCR settings"""
+    digest = hashlib.sha256(image_bytes)
+    digest.update(b'\0' + ocr_settings().encode('utf-8'))
+    return digest.hexdigest()
+
+def prepare_ocr_image(image_bytes):
+    """Return (image_bytes, mime_type) ready to send to the model"""
+    if not OCR_PREPROCESS:
+        return image_bytes, sniff_mime_type(image_bytes)
+    return preprocess_image(image_bytes, max_side=OCR_MAX_SIDE,
+                            grayscale=OCR_GRAYSCALE, quality=OCR_JPEG_QUALITY)
+
+def build_ocr_request_body(image_bytes, mime_type='image/jpeg', stream=False, model=None):
+    """Encode the OCR request for one image straight to JSON bytes"""
+    payload = {
+        "model": model or MODEL_NAME,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": OCR_PROMPT
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": IMAGE_PLACEHOLDER
+                        }
+                    }
+                ]
+            }
+        ],
+        "max_tokens": 1000
+    }
+    if stream:
+        payload["stream"] = True
+    return build_request_body(payload, image_bytes, mime_type)
+
+def ocr_tiles(image_bytes):
+    """Overlapping strips [(image_bytes, mime_type)] to read a tall image
+    in, or None when it is read in one call"""
+    if not OCR_TILE_ENABLED:
+        return None
+    size = image_size(image_bytes)
+    if size is None:
+        return None
+    width, height = size
+    if height <= OCR_TILE_HEIGHT or (height < OCR_TILE_MIN_HEIGHT and height < OCR_TILE_MIN_ASPECT * width):
+        return None
+    bounds = tile_bounds(height, OCR_TILE_HEIGHT, OCR_TILE_OVERLAP, OCR_TILE_MAX_TILES)
+    try:
+        return split_image(image_bytes, bounds, max_side=OCR_MAX_SIDE, grayscale=OCR_GRAYSCALE,
+                           quality=OCR_JPEG_QUALITY, lossless=not OCR_PREPROCESS)
+    except Exception as e:
+        logger.warning(f"Reading tall image in one call: {str(e)}")
+        return None
+
+def prepare_ocr_tiles(image_bytes):
+    """[(image_bytes, mime_type)] to send: the prepared image, or
+    overlapping strips of a tall one"""
+    tiles = ocr_tiles(image_bytes)
+    return tiles if tiles is not None else [prepare_ocr_image(image_bytes)]
+
+def request_text_extraction(image_bytes):
+    """Send an image to the Qwen VL model and return the extracted text;
+    tall images are read in overlapping strips"""
+    with stage_timer('preprocess'):
+        tiles = prepare_ocr_tiles(image_bytes)
+    OCR_TILES.observe(len(tiles))
+    if len(tiles) == 1:
+        return request_ocr(*tiles[0])
+    return request_tiled_text_extraction(tiles)
+
+def request_tiled_text_extraction(tiles):
+    """OCR every strip concurrently and stitch the text back together.
+
+    Each strip is an ordinary OCR call, hedged and scheduled like any
+    other, so how many run at once is bounded by OPENROUTER_CONCURRENCY.
+    A strip that fails fails the whole extraction rather than leave a gap.
+    """
+    logger.info(f"Reading tall image in {len(tiles)} strips", extra={'tiles': len(tiles)})
+    executor = ThreadPoolExecutor(max_workers=len(tiles), thread_name_prefix='ocr-tile')
+    try:
+        # Each strip runs in a copy of the caller's context so it keeps the
+        # request's scheduler priority and deadline
+        futures = [executor.submit(contextvars.copy_context().run, request_ocr, tile_bytes, mime_type)
+                   for tile_bytes, mime_type in tiles]
+        texts = [future.result() for future in futures]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    with stage_timer('tile_stitch'):
+        return stitch_text(texts)
+
+def request_ocr(image_bytes, mime_type):
+    """One OCR call for a prepared image"""
+    with stage_timer('base64_encode'):
+        body = build_ocr_request_body(image_bytes, mime_type)
+    logger.info("Sending request to OpenRouter API...", extra={'body_bytes': len(body)})
+    with stage_timer('ocr_request'):
+        if OCR_HEDGE is None:
+            return CLIENT.chat_completion(body, name='ocr')
+        return OCR_HEDGE.run(
+            lambda: CLIENT.chat_completion(body, name='ocr'),
+            lambda: CLIENT.chat_completion(hedge_request_body(body, image_bytes, mime_type), name='ocr_hedge')
+        )
+
+def hedge_request_body(body, image_bytes, mime_type):
+    """The OCR request for a hedge: the same body, or one for OCR_HEDGE_MODEL"""
+    if not OCR_HEDGE_MODEL:
+        return body
+    logger.info("Hedging slow OCR call with another model", extra={'model': OCR_HEDGE_MODEL})
+    return build_ocr_request_body(image_bytes, mime_type, model=OCR_HEDGE_MODEL)
+
+def perceptual_hash(image_bytes):
+    """Fingerprint for the near-duplicate index, or None when it is off
+    or the image cannot be decoded"""
+    if OCR_INDEX is None:
+        return None
+    found = OCR_INDEX.hash(image_bytes)
+    if found is None:
+        return None
+    # Text is only shared between copies read with the same settings
+    return found + (ocr_settings(),)
+
+def find_near_duplicate_text(image_hash):
+    """Text extracted earlier from a re-encoded copy of the image, or None"""
+    if image_hash is None:
+        return None
+    found = OCR_INDEX.lookup(image_hash)
+    if found is None:
+        return None
+    text, distance = found
+    logger.info("Reusing text extracted from a copy of the image", extra={'hash_distance': distance})
+    return text
+
+def likely_text_free(image_bytes):
+    """True when the prefilter finds no text in the image"""
+    if OCR_PREFILTER is None:
+        return False
+    with stage_timer('prefilter'):
+        text_free = OCR_PREFILTER.is_text_free(image_bytes)
+    if text_free:
+        logger.info("No text found by the prefilter; skipping OCR")
+    return text_free
+
+def prefilter_stats():
+    """Prefilter skip rate and the OCR time the skips saved, net of the
+    time spent checking"""
+    stats = OCR_PREFILTER.stats()
+    latency = CLIENT.stats()['latency'].get('ocr', {})
+    calls = latency.get('count', 0)
+    avg_seconds = latency['sum'] / calls if calls else None
+    checking = stats['prefilter_seconds']['sum']
+    stats['avg_ocr_seconds'] = round(avg_seconds, 6) if avg_seconds is not None else None
+    stats['estimated_seconds_saved'] = (round(stats['skipped'] * avg_seconds - checking, 3)
+                                        if avg_seconds is not None else None)
+    return stats
+
+class TextFree(Exception):
+    """The prefilter found no text; raised so the empty result is not cached"""
+
+def extract_or_reuse_text(image_bytes):
+    """OCR an image unless it has no text or a near-duplicate has already
+    been read"""
+    if likely_text_free(image_bytes):
+        raise TextFree()
+    image_hash = perceptual_hash(image_bytes)
+    text = find_near_duplicate_text(image_hash)
+    if text is None:
+        text = request_text_extraction(image_bytes)
+        if image_hash is not None:
+            OCR_INDEX.add(image_hash, text)
+    return text
+
+def extract_text_from_bytes(image_bytes):
+    """Extract text from image bytes, reusing cached results for the same
+    or a near-duplicate image"""
+    logger.info("Starting text extraction from image...")
+    try:
+        extracted_text, cached = OCR_CACHE.get_or_compute(
+            ocr_cache_key(image_bytes),
+            lambda: extract_or_reuse_text(image_bytes)
+        )
+        logger.info("Text extraction served from cache" if cached else "Text extraction completed successfully",
+                    extra={'cached': cached, 'text_chars': len(extracted_text or '')})
+        OCR_TEXT_CHARS.observe(len(extracted_text or ''))
+        return extracted_text
+    except TextFree:
+        # A skip is a guess, so it is never served from the OCR cache
+        OCR_TEXT_CHARS.observe(0)
+        return ''
+    except SchedulerRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error in extract_text_from_image: {str(e)}")
+        raise Exception(f"Failed to extract text from image: {str(e)}")
+
+def read_tiles_as_chunk(tiles):
+    """Yield the stitched text of a tiled read, for the streaming path"""
+    yield request_tiled_text_extraction(tiles)
+
+def extract_text_streaming(image_bytes, stop_at_high_risk=False):
+    """Stream OCR tokens through the incremental keyword detector.
+
+    With stop_at_high_risk the stream is abandoned as soon as the findings
+    so far put the text at high risk; more findings can only lower the
+    score, so the verdict is settled. Returns the text read so far along
+    with time-to-first-finding and total latency in seconds. Tall images
+    are read in strips like extract_text_from_bytes, so the text cached
+    here matches the tiled read.
+    """
+    logger.info("Starting streamed text extraction from image...")
+    started = time.time()
+    key = ocr_cache_key(image_bytes)
+    incremental = IncrementalDetector(DETECTOR)
+    first_finding = None
+    stopped_early = False
+
+    cached_text = OCR_CACHE.get(key)
+    image_hash = None
+    text_free = cached_text is None and likely_text_free(image_bytes)
+    if cached_text is None and not text_free:
+        image_hash = perceptual_hash(image_bytes)
+        cached_text = find_near_duplicate_text(image_hash)
+    if text_free:
+        chunks = iter([])
+    elif cached_text is not None:
+        chunks = iter([cached_text])
+    else:
+        with stage_timer('preprocess'):
+            tiles = prepare_ocr_tiles(image_bytes)
+        OCR_TILES.observe(len(tiles))
+        if len(tiles) > 1:
+            # One call would squash a tall image and cut off its text, so
+            # strips are read as usual and the stitched text fed as a whole
+            chunks = read_tiles_as_chunk(tiles)
+        else:
+            body = build_ocr_request_body(*tiles[0], stream=True)
+            logger.info("Sending streaming request to OpenRouter API...")
+            chunks = CLIENT.stream_chat_completion(body, name='ocr_stream')
+
+    try:
+        for chunk in chunks:
+            if not incremental.feed(chunk):
+                continue
+            if first_finding is None:
+                first_finding = time.time() - started
+            if stop_at_high_risk and score_findings(incremental.detected_data())[2] == 'high':
+                stopped_early = True
+                break
+        if not stopped_early and incremental.finish() and first_finding is None:
+            first_finding = time.time() - started
+    except SchedulerRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error in extract_text_streaming: {str(e)}")
+        raise Exception(f"Failed to extract text from image: {str(e)}")
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+    total_latency = time.time() - started
+    if not stopped_early and cached_text is None and not text_free:
+        OCR_CACHE.set(key, incremental.text, total_latency)
+        if image_hash is not None:
+            OCR_INDEX.add(image_hash, incremental.text)
+    logger.info(f"Streamed text extraction {'stopped early' if stopped_early else 'completed'} "
+                f"in {total_latency:.2f}s",
+                extra={'stopped_early': stopped_early, 'seconds': round(total_latency, 6)})
+    return {
+        'extracted_text': incremental.text,
+        'complete': not stopped_early,
+        'cached': cached_text is not None,
+        'time_to_first_finding': round(first_finding, 6) if first_finding is not None else None,
+        'total_latency': round(total_latency, 6)
+    }
+
+def read_upload(file, max_bytes=UPLOAD_MAX_BYTES):
+    """Read an uploaded file into memory without touching the upload folder.
+
+    Werkzeug already spools large uploads to an anonymous temporary file,
+    so this is the only full copy of the image the request makes before
+    encoding. Raises ValueError if the upload is larger than max_bytes.
+    """
+    with stage_timer('upload_read'):
+        image_bytes = file.stream.read(max_bytes + 1)
+    if len(image_bytes) > max_bytes:
+        raise ValueError(f"Image is larger than {max_bytes} bytes")
+    UPLOAD_BYTES.observe(len(image_bytes))
+    return image_bytes
+
 def extract_text_from_image(image_path):
     """Extract text from image using Qwen VL model"""
-    print("Starting text extraction from image...")
     try:
-        base64_image = encode_image_to_base64(image_path)
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Extract all text from this image accurately. Return only the extracted text without any additional commentary or analysis."
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            "max_tokens": 1000
-        }
-        print("Sending request to OpenRouter API...")
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload)
-        response.raise_for_status()
-        result = response.json()
-        extracted_text = result['choices'][0]['message']['content']
-        print("Text extraction completed successfully")
-        return extracted_text
+        with open(image_path, "rb") as image_file:
+            image_bytes = image_file.read()
     except Exception as e:
-        print(f"Error in extract_text_from_image: {str(e)}")
         raise Exception(f"Failed to extract text from image: {str(e)}")
+    return extract_text_from_bytes(image_bytes)
 
-def generate_risk_scenarios(detected_data, extracted_text):
-    """Generate realistic risk scenarios using AI"""
-    print("Generating risk scenarios...")
-    
+def scenario_excerpt(extracted_text):
+    """The extracted text as quoted in the scenario prompt, cut at
+    SCENARIO_TEXT_MAX_CHARS with a note of how much was left out"""
+    if len(extracted_text) <= SCENARIO_TEXT_MAX_CHARS:
+        return extracted_text
+    omitted = len(extracted_text) - SCENARIO_TEXT_MAX_CHARS
+    return f"{extracted_text[:SCENARIO_TEXT_MAX_CHARS]}\n[... {omitted} more characters not shown]"
+
+def scenario_cache_key(detected_data, extracted_text):
+    """Normalized signature of the findings and the quoted text that
+    drive scenario generation"""
+    signature = {
+        'model': MODEL_NAME,
+        'findings': sorted(
+            [category, sorted(set(items))]
+            for category, items in detected_data.items() if items
+        ),
+        'text': hashlib.sha256(scenario_excerpt(extracted_text).encode('utf-8')).hexdigest()
+    }
+    return hashlib.sha256(json.dumps(signature, sort_keys=True).encode('utf-8')).hexdigest()
+
+def get_risk_scenarios(detected_data, extracted_text):
+    """Return (scenarios, source) where source is one of
+    'none', 'local', 'cache', 'model' or 'fallback'"""
+    with stage_timer('scenario_generation'):
+        scenarios, source = _get_risk_scenarios(detected_data, extracted_text)
+    SCENARIO_SOURCES.labels(source=source).inc()
+    return scenarios, source
+
+def _get_risk_scenarios(detected_data, extracted_text):
     # If no sensitive data found, return basic scenarios
     total_findings = sum(len(items) for items in detected_data.values())
     if total_findings == 0:
@@ -81,104 +558,129 @@ def generate_risk_scenarios(detected_data, extracted_text):
             "✅ No significant risks detected in this post",
             "🔒 This content appears safe for sharing on social media",
             "📱 Continue practicing good privacy habits"
-        ]
+        ], 'none'
+
+    # Local mode answers from precomputed templates with no upstream call
+    if SCENARIO_MODE == 'local':
+        return local_risk_scenarios(detected_data), 'local'
+
+    try:
+        if SCENARIO_CACHE is None:
+            return request_risk_scenarios(detected_data, extracted_text), 'model'
+        scenarios, cached = SCENARIO_CACHE.get_or_compute(
+            scenario_cache_key(detected_data, extracted_text),
+            lambda: request_risk_scenarios(detected_data, extracted_text)
+        )
+        if cached:
+            logger.info("Risk scenarios served from cache")
+        return list(scenarios), 'cache' if cached else 'model'
+    except Exception:
+        return generate_fallback_scenarios(detected_data), 'fallback'
+
+def generate_risk_scenarios(detected_data, extracted_text):
+    """Generate realistic risk scenarios using AI"""
+    return get_risk_scenarios(detected_data, extracted_text)[0]
+
+def build_scenario_payload(detected_data, extracted_text):
+    """Chat completion payload asking for 3 risk scenarios"""
+    # Create a prompt for scenario generation
+    scenario_prompt = f"""
+    Based on this social media post content and detected sensitive information, generate 3 realistic, specific scenarios of how this information could be misused if shared publicly.
+
+    EXTRACTED TEXT FROM POST:
+    {scenario_excerpt(extracted_text)}
+
+    DETECTED SENSITIVE INFORMATION:
+    {json.dumps(detected_data, indent=2)}
+
+    CRITICAL REQUIREMENTS:
+    - Generate EXACTLY 3 different scenarios
+    - Each scenario must be UNIQUE and focus on DIFFERENT risks
+    - Each scenario should be 1-2 sentences long
+    - Make them realistic and specific to social media context
+    - Focus on concrete consequences (identity theft, stalking, financial fraud, etc.)
+    - Use simple, clear language that anyone can understand
+    - Start each scenario with a relevant emoji that matches the risk type
+    - Format as a numbered list (1., 2., 3.)
+
+    EMOJI GUIDE:
+    - 💳 for financial risks
+    - 🆔 for identity theft
+    - 📍 for location/stalking risks
+    - 🏥 for medical privacy risks
+    - 🔐 for password/account security
+    - 📧 for email/phishing risks
+    - 🏠 for home security risks
+    - 👤 for impersonation risks
+
+    EXAMPLE FORMAT:
+    1. 💳 Someone could use your bank information to make unauthorized purchases or drain your accounts.
+    2. 📍 Your location data could help stalkers track your daily routine and know when you're vulnerable.
+    3. 🆔 Identity thieves might use your personal details to open credit cards or loans in your name.
+
+    Now generate 3 UNIQUE scenarios for the detected information above:
+    """
+    
+    return {
+        "model": MODEL_NAME,
+        "messages": [
+            {
+                "role": "user",
+                "content": scenario_prompt
+            }
+        ],
+        "max_tokens": 800,
+        "temperature": 0.7
+    }
+
+def parse_risk_scenarios(scenarios_text, detected_data):
+    """Pick 3 unique scenarios out of the model reply, topped up from the templates"""
+    # Parse the scenarios from the response
+    scenarios = []
+    for line in scenarios_text.split('\n'):
+        line = line.strip()
+        if line and (line.startswith('•') or line.startswith('-') or any(char.isdigit() and '.' in line for char in line) or
+                    any(emoji in line for emoji in ['🔓', '💳', '👥', '🚨', '📍', '👀', '💰', '🆔', '🏥', '🗺️', '🔐', '📧', '🏦', '🚗', '🏠', '💊', '🔬', '🚶', '📝', '🤖', '📱', '🌐'])):
+            # Clean up the scenario text
+            scenario = line.lstrip('•- 123.').strip()
+            if scenario and len(scenario) > 20:
+                scenarios.append(scenario)
+    
+    # Remove duplicates
+    seen = set()
+    unique_scenarios = []
+    for scenario in scenarios:
+        if scenario not in seen:
+            seen.add(scenario)
+            unique_scenarios.append(scenario)
+    
+    # Ensure we have exactly 3 unique scenarios
+    while len(unique_scenarios) < 3:
+        fallback_scenarios = generate_fallback_scenarios(detected_data)
+        for fb_scenario in fallback_scenarios:
+            if fb_scenario not in unique_scenarios and len(unique_scenarios) < 3:
+                unique_scenarios.append(fb_scenario)
+    return unique_scenarios[:3]
+
+def request_risk_scenarios(detected_data, extracted_text):
+    """Ask the model for 3 risk scenarios; raises if the call fails"""
+    logger.info("Generating risk scenarios...")
     
     try:
-        # Create a prompt for scenario generation
-        scenario_prompt = f"""
-        Based on this social media post content and detected sensitive information, generate 3 realistic, specific scenarios of how this information could be misused if shared publicly.
-
-        EXTRACTED TEXT FROM POST:
-        {extracted_text[:1000]}
-
-        DETECTED SENSITIVE INFORMATION:
-        {json.dumps(detected_data, indent=2)}
-
-        CRITICAL REQUIREMENTS:
-        - Generate EXACTLY 3 different scenarios
-        - Each scenario must be UNIQUE and focus on DIFFERENT risks
-        - Each scenario should be 1-2 sentences long
-        - Make them realistic and specific to social media context
-        - Focus on concrete consequences (identity theft, stalking, financial fraud, etc.)
-        - Use simple, clear language that anyone can understand
-        - Start each scenario with a relevant emoji that matches the risk type
-        - Format as a numbered list (1., 2., 3.)
-
-        EMOJI GUIDE:
-        - 💳 for financial risks
-        - 🆔 for identity theft
-        - 📍 for location/stalking risks
-        - 🏥 for medical privacy risks
-        - 🔐 for password/account security
-        - 📧 for email/phishing risks
-        - 🏠 for home security risks
-        - 👤 for impersonation risks
-
-        EXAMPLE FORMAT:
-        1. 💳 Someone could use your bank information to make unauthorized purchases or drain your accounts.
-        2. 📍 Your location data could help stalkers track your daily routine and know when you're vulnerable.
-        3. 🆔 Identity thieves might use your personal details to open credit cards or loans in your name.
-
-        Now generate 3 UNIQUE scenarios for the detected information above:
-        """
-        
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": scenario_prompt
-                }
-            ],
-            "max_tokens": 800,
-            "temperature": 0.7
-        }
-        
-        print("Sending scenario generation request to OpenRouter API...")
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload)
-        response.raise_for_status()
-        result = response.json()
-        scenarios_text = result['choices'][0]['message']['content']
-        
-        # Parse the scenarios from the response
-        scenarios = []
-        for line in scenarios_text.split('\n'):
-            line = line.strip()
-            if line and (line.startswith('•') or line.startswith('-') or any(char.isdigit() and '.' in line for char in line) or
-                        any(emoji in line for emoji in ['🔓', '💳', '👥', '🚨', '📍', '👀', '💰', '🆔', '🏥', '🗺️', '🔐', '📧', '🏦', '🚗', '🏠', '💊', '🔬', '🚶', '📝', '🤖', '📱', '🌐'])):
-                # Clean up the scenario text
-                scenario = line.lstrip('•- 123.').strip()
-                if scenario and len(scenario) > 20:
-                    scenarios.append(scenario)
-        
-        # Remove duplicates
-        seen = set()
-        unique_scenarios = []
-        for scenario in scenarios:
-            if scenario not in seen:
-                seen.add(scenario)
-                unique_scenarios.append(scenario)
-        
-        # Ensure we have exactly 3 unique scenarios
-        while len(unique_scenarios) < 3:
-            fallback_scenarios = generate_fallback_scenarios(detected_data)
-            for fb_scenario in fallback_scenarios:
-                if fb_scenario not in unique_scenarios and len(unique_scenarios) < 3:
-                    unique_scenarios.append(fb_scenario)
-        
-        print("Scenario generation completed successfully")
-        return unique_scenarios[:3]
+        payload = build_scenario_payload(detected_data, extracted_text)
+        logger.info("Sending scenario generation request to OpenRouter API...")
+        # Scenarios are less urgent than OCR for requests still waiting
+        with stage_timer('scenario_request'), scheduler.priority('scenario'):
+            scenarios_text = CLIENT.chat_completion(payload, name='scenarios')
+        scenarios = parse_risk_scenarios(scenarios_text, detected_data)
+        logger.info("Scenario generation completed successfully")
+        return scenarios
         
     except Exception as e:
-        print(f"Error generating scenarios: {str(e)}")
-        return generate_fallback_scenarios(detected_data)
+        logger.error(f"Error generating scenarios: {str(e)}")
+        raise
 
-def generate_fallback_scenarios(detected_data):
+def build_fallback_scenarios(detected_data):
     """Generate fallback scenarios when AI fails"""
     scenarios = []
     
@@ -265,117 +767,125 @@ def generate_fallback_scenarios(detected_data):
                 unique_scenarios.append(scenario)
         return unique_scenarios[:3]
 
+# Categories in bitmask order: bit i is set when SCENARIO_CATEGORIES[i] has findings
+SCENARIO_CATEGORIES = ['personal_identifiers', 'location_data', 'financial_info',
+                       'medical_info', 'other_sensitive_data']
+
+def category_mask(detected_data):
+    """Bitmask of the categories with at least one finding"""
+    return sum(1 << bit for bit, category in enumerate(SCENARIO_CATEGORIES) if detected_data.get(category))
+
+# Fallback scenarios depend only on which categories have findings, so all
+# 32 combinations are built once at startup
+FALLBACK_SCENARIOS = [
+    tuple(build_fallback_scenarios({category: [category] for bit, category in enumerate(SCENARIO_CATEGORIES)
+                                    if mask & (1 << bit)}))
+    for mask in range(1 << len(SCENARIO_CATEGORIES))
+]
+
+# Sharper lead scenarios for specific findings, most severe first
+FINDING_SCENARIOS = [
+    ('financial_info', 'Potential card information',
+     "💳 Anyone who sees your card details could try them in online checkouts that skip extra verification."),
+    ('financial_info', 'Potential bank information',
+     "🏦 Your bank account details could be used to set up fraudulent direct debits or convincing payment scams."),
+    ('financial_info', 'Potential financial information',
+     "💰 Income or tax details could make you a target for tailored investment scams or identity fraud."),
+    ('other_sensitive_data', 'Potential password information',
+     "🔐 A visible password could let anyone log in to your accounts, and any others where you reuse it."),
+    ('medical_info', 'Potential prescription information',
+     "💊 Prescription details could be used to obtain medication fraudulently or to target you with health scams."),
+    ('personal_identifiers', 'Potential id information',
+     "🆔 ID or passport details are enough for many identity checks and could be used to open accounts in your name."),
+    ('personal_identifiers', 'Potential birth information',
+     "🎂 Your date of birth is a common security question and helps thieves pass identity checks as you."),
+    ('personal_identifiers', 'Potential address information',
+     "🏠 Your address tells strangers where to find you and when your home might be empty."),
+    ('personal_identifiers', 'Potential email information',
+     "📧 Your email address could be used for targeted phishing that references details from this post."),
+    ('personal_identifiers', 'Potential phone information',
+     "📱 Your phone number could be used for SIM-swap attacks, scam calls or smishing messages."),
+    ('location_data', 'Potential current location information',
+     "📍 Sharing your current location tells anyone watching exactly where you are right now."),
+]
+
+def generate_fallback_scenarios(detected_data):
+    """Fallback scenarios for the categories found, from the precomputed table"""
+    return list(FALLBACK_SCENARIOS[category_mask(detected_data)])
+
+def local_risk_scenarios(detected_data):
+    """Scenarios without a model call: up to two lead scenarios for the
+    most severe specific findings, then the table entry for the categories"""
+    scenarios = []
+    if LOCAL_SCENARIOS_SPECIALIZE:
+        for category, label, scenario in FINDING_SCENARIOS:
+            if label in detected_data.get(category, ()):
+                scenarios.append(scenario)
+                if len(scenarios) == 2:
+                    break
+    for scenario in FALLBACK_SCENARIOS[category_mask(detected_data)]:
+        if len(scenarios) == 3:
+            break
+        scenarios.append(scenario)
+    return scenarios
+
 def calculate_privacy_score(total_findings, category_counts):
     """Calculate a privacy score from 0-100"""
     base_score = 100
     
     # Heavy penalties for high-risk categories
-    financial_penalty = category_counts['financial'] * 20
-    medical_penalty = category_counts['medical'] * 15
-    personal_penalty = category_counts['personal'] * 10
+    financial_penalty = category_counts['financial'] * CATEGORY_PENALTIES['financial_info']
+    medical_penalty = category_counts['medical'] * CATEGORY_PENALTIES['medical_info']
+    personal_penalty = category_counts['personal'] * CATEGORY_PENALTIES['personal_identifiers']
     
     # General penalty for any findings
-    findings_penalty = total_findings * 5
+    findings_penalty = total_findings * FINDING_PENALTY
     
     total_penalty = financial_penalty + medical_penalty + personal_penalty + findings_penalty
     
     final_score = max(0, base_score - total_penalty)
     return final_score
 
-def analyze_privacy_risk(text):
-    """Simple and reliable privacy risk analysis using keyword detection"""
-    print("Starting privacy risk analysis...")
-    
-    if not text or not text.strip():
-        return {
-            "detected_data": {},
-            "risk_level": "low",
-            "risk_explanation": "No text detected in the image",
-            "recommendations": ["No action needed"],
-            "privacy_score": 100
-        }
-
-    # Convert text to lowercase for easier matching
-    text_lower = text.lower()
-
-    # Define keywords for different privacy categories
-    personal_identifiers = []
-    location_data = []
-    financial_info = []
-    medical_info = []
-    other_sensitive_data = []
-
-    # Check for personal identifiers
-    personal_keywords = {
-        'name': ['name', 'full name', 'first name', 'last name', 'username'], 
-        'email': ['email', 'e-mail', '@', 'gmail', 'yahoo', 'outlook'], 
-        'phone': ['phone', 'mobile', 'cell', 'telephone', 'call me', 'contact'], 
-        'address': ['address', 'street', 'avenue', 'road', 'city', 'zip code', 'postal'],
-        'birth': ['birth', 'birthday', 'born', 'age', 'date of birth', 'd.o.b'],
-        'id': ['id', 'identification', 'passport', 'driver license', 'license']
-    }
-
-    for category, keywords in personal_keywords.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                personal_identifiers.append(f'Potential {category} information')
-                break
-
-    # Check for location data
-    location_keywords = ['location', 'gps', 'coordinates', 'map', 'here', 'current location', 'latitude', 'longitude']
-    for keyword in location_keywords:
-        if keyword in text_lower:
-            location_data.append(f'Potential {keyword} information')
-
-    # Check for financial info
-    financial_keywords = {
-        'bank': ['bank', 'account number', 'routing number'],
-        'card': ['credit card', 'debit card', 'card number', 'expiry', 'cvv'],
-        'financial': ['salary', 'income', 'tax', 'ssn', 'social security', 'money']
-    }
-
-    for category, keywords in financial_keywords.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                financial_info.append(f"Potential {category} information")
-                break
-
-    # Check for medical info
-    medical_keywords = ['medical', 'health', 'doctor', 'hospital', 'prescription', 'medicine', 'illness', 'condition']
-    for keyword in medical_keywords:
-        if keyword in text_lower:
-            medical_info.append(f'Potential {keyword} information')
-
-    # Check for other sensitive data
-    other_keywords = ['password', 'secret', 'confidential', 'private', 'sensitive']
-    for keyword in other_keywords:
-        if keyword in text_lower:
-            other_sensitive_data.append(f'Potential {keyword} information')
-
+def score_findings(detected_data):
+    """Return (total_findings, privacy_score, risk_level) for detected_data"""
     # Count total findings
-    total_findings = (
-        len(personal_identifiers) +
-        len(location_data) +
-        len(financial_info) +
-        len(medical_info) +
-        len(other_sensitive_data)
-    )
+    total_findings = sum(len(items) for items in detected_data.values())
 
     # Calculate Privacy Score (0-100)
     privacy_score = calculate_privacy_score(total_findings, {
-        'personal': len(personal_identifiers),
-        'financial': len(financial_info),
-        'medical': len(medical_info)
+        'personal': len(detected_data.get('personal_identifiers', [])),
+        'financial': len(detected_data.get('financial_info', [])),
+        'medical': len(detected_data.get('medical_info', []))
     })
 
     # Determine risk level based on score
-    if privacy_score >= 80:
+    if privacy_score >= LOW_RISK_MIN_SCORE:
         risk_level = "low"
-    elif privacy_score >= 50:
+    elif privacy_score >= MEDIUM_RISK_MIN_SCORE:
         risk_level = "medium"
     else:
         risk_level = "high"
 
+    return total_findings, privacy_score, risk_level
+
+def score_privacy_risk(text):
+    """Keyword findings, privacy score and risk level, without scenarios"""
+    logger.info("Starting privacy risk analysis...")
+    
+    if not text or not text.strip():
+        return {
+            "detected_data": {},
+            "risk_level": "low",
+            "risk_explanation": "No text detected in the image",
+            "recommendations": ["No action needed"],
+            "privacy_score": 100
+        }
+
+    # Find every keyword of every category in one pass over the text
+    with stage_timer('keyword_analysis'):
+        detected_data = DETECTOR.detect(text)
+        total_findings, privacy_score, risk_level = score_findings(detected_data)
+
     risk_explanation = f"Privacy Score: {privacy_score}/100 - Found {total_findings} potential privacy concerns"
 
     # Generate recommendations based on risk level
@@ -398,36 +908,233 @@ def analyze_privacy_risk(text):
             "Review privacy settings for your social media accounts"
         ]
 
-    # Prepare the detected data
-    detected_data = {
-        "personal_identifiers": personal_identifiers,
-        "location_data": location_data,
-        "financial_info": financial_info,
-        "medical_info": medical_info,
-        "other_sensitive_data": other_sensitive_data
-    }
-
-    # Generate risk scenarios
-    risk_scenarios = generate_risk_scenarios(detected_data, text)
-
-    # Prepare the final result
-    result = {
+    return {
         "detected_data": detected_data,
         "risk_level": risk_level,
         "risk_explanation": risk_explanation,
         "recommendations": recommendations,
         "privacy_score": privacy_score,
-        "total_findings": total_findings,
-        "risk_scenarios": risk_scenarios
+        "total_findings": total_findings
     }
 
-    print(f"Privacy analysis completed: {risk_level} risk level, Score: {privacy_score}")
+def analyze_privacy_risk(text):
+    """Simple and reliable privacy risk analysis using keyword detection"""
+    result = score_privacy_risk(text)
+    if not text or not text.strip():
+        return result
+    return add_risk_scenarios(result, text)
+
+def add_risk_scenarios(result, text):
+    """Generate risk scenarios for a scored result and add them to it"""
+    risk_scenarios, scenario_source = get_risk_scenarios(result['detected_data'], text)
+    result["risk_scenarios"] = risk_scenarios
+    result["scenario_source"] = scenario_source
+
+    logger.info(f"Privacy analysis completed: {result['risk_level']} risk level, Score: {result['privacy_score']}",
+                extra={'risk_level': result['risk_level'], 'privacy_score': result['privacy_score'],
+                       'scenario_source': scenario_source})
     return result
 
+RISK_LEVELS = ['low', 'medium', 'high']
+
+def escalation_reason(result):
+    """Why a locally scored result needs the LLM analysis, or None"""
+    for category in CASCADE_TRIGGER_CATEGORIES:
+        if result['detected_data'].get(category):
+            return f'trigger:{category}'
+    if CASCADE_UNCERTAIN_MIN <= result['privacy_score'] <= CASCADE_UNCERTAIN_MAX:
+        return 'uncertain_band'
+    return None
+
+def merge_llm_analysis(result, llm_result):
+    """Fold the LLM structured analysis into a local result.
+
+    Findings and recommendations are unioned, and the more severe of the
+    two risk levels wins. The local privacy score is kept as is. A reply
+    that could not be parsed into a risk level is not merged.
+    """
+    llm_level = str(llm_result.get('risk_level', '')).lower()
+    if llm_level not in RISK_LEVELS:
+        return llm_level
+
+    for category, items in (llm_result.get('detected_data') or {}).items():
+        if not isinstance(items, list):
+            items = [items]
+        merged = result['detected_data'].setdefault(category, [])
+        for item in items:
+            item = item if isinstance(item, str) else json.dumps(item)
+            if item and item not in merged:
+                merged.append(item)
+
+    if RISK_LEVELS.index(llm_level) > RISK_LEVELS.index(result['risk_level']):
+        result['risk_level'] = llm_level
+    if llm_result.get('risk_explanation'):
+        result['risk_explanation'] += f" | Model review: {llm_result['risk_explanation']}"
+    for recommendation in llm_result.get('recommendations') or []:
+        if recommendation not in result['recommendations']:
+            result['recommendations'].append(recommendation)
+    return llm_level
+
+def cascade_privacy_risk(text):
+    """Keyword analysis first; escalate to the LLM only when it is ambiguous.
+    Scenarios are generated from the merged findings"""
+    result = score_privacy_risk(text)
+    if not text or not text.strip():
+        return result
+    cascade_review(result, text)
+    return add_risk_scenarios(result, text)
+
+def cascade_review(result, text):
+    """Escalate a locally scored result to the LLM analysis when it is
+    ambiguous, merging the model's findings into it"""
+    reason = escalation_reason(result)
+    cascade = {'escalated': reason is not None, 'reason': reason}
+    if reason is None:
+        CASCADE_DECISIONS.labels(decision='local', reason='confident').inc()
+    else:
+        CASCADE_DECISIONS.labels(decision='escalated', reason=reason).inc()
+        logger.info(f"Escalating analysis to the LLM ({reason})", extra={'reason': reason})
+        started = time.perf_counter()
+        try:
+            with stage_timer('llm_analysis'):
+                llm_result = utils.analyze_privacy_risk(text)
+            cascade['llm_risk_level'] = merge_llm_analysis(result, llm_result)
+        except Exception as e:
+            # The local result stands on its own if the model is unavailable
+            logger.error(f"Error in cascade escalation: {str(e)}")
+            cascade['error'] = str(e)
+        cascade['llm_seconds'] = round(time.perf_counter() - started, 6)
+    result['cascade'] = cascade
+    return result
+
+def cascade_stats():
+    """Escalation rate and estimated savings against always calling the LLM"""
+    decisions = {'local': 0, 'escalated': 0}
+    reasons = {}
+    for labels, counter in CASCADE_DECISIONS.children():
+        decisions[labels['decision']] += counter.value
+        if labels['decision'] == 'escalated':
+            reasons[labels['reason']] = reasons.get(labels['reason'], 0) + counter.value
+    total = decisions['local'] + decisions['escalated']
+
+    # Average cost of one LLM analysis, from the calls actually made
+    upstream = CLIENT.stats()
+    latency = upstream['latency'].get('analysis', {})
+    calls = latency.get('count', 0)
+    tokens = sum(upstream['tokens'].get('analysis', {}).values())
+    avg_seconds = latency['sum'] / calls if calls else None
+    avg_tokens = tokens / calls if calls and tokens else None
+
+    return {
+        'texts': total,
+        'escalated': decisions['escalated'],
+        'escalation_rate': round(decisions['escalated'] / total, 4) if total else None,
+        'escalation_reasons': reasons,
+        'llm_calls_avoided': decisions['local'],
+        'avg_llm_seconds': round(avg_seconds, 6) if avg_seconds is not None else None,
+        'avg_llm_tokens': round(avg_tokens, 1) if avg_tokens is not None else None,
+        'estimated_seconds_saved': round(decisions['local'] * avg_seconds, 3) if avg_seconds is not None else None,
+        'estimated_tokens_saved': round(decisions['local'] * avg_tokens) if avg_tokens is not None else None
+    }
+
+def run_analysis(image_bytes, mode=None):
+    """Run the full pipeline for one image and return the response body"""
+    # Extract text from image
+    logger.info("=== Starting Analysis ===")
+    extracted_text = extract_text_from_bytes(image_bytes)
+
+    # Analyze privacy risk
+    if (mode or ANALYSIS_MODE) == 'cascade':
+        analysis_result = cascade_privacy_risk(extracted_text)
+    else:
+        analysis_result = analyze_privacy_risk(extracted_text)
+
+    return {
+        'success': True,
+        'extracted_text': extracted_text,
+        'analysis': analysis_result
+    }
+
+@app.before_request
+def start_request_timer():
+    request.environ['analyze.started'] = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUESTS.labels(endpoint=endpoint, method=request.method, status=response.status_code).inc()
+    started = request.environ.get('analyze.started')
+    if started is not None:
+        # Streamed responses are timed up to their first byte
+        HTTP_SECONDS.labels(endpoint=endpoint).observe(time.perf_counter() - started)
+    return response
+
+def busy_response(error):
+    """503 with a Retry-After for a request the upstream scheduler turned away"""
+    response = jsonify({'error': str(error), 'estimated_wait': round(error.estimated_wait, 3)})
+    response.headers['Retry-After'] = str(max(1, math.ceil(error.estimated_wait)))
+    return response, 503
+
+def max_upstream_wait():
+    """Seconds this request may queue for the model (?max_wait=, capped)"""
+    return min(request.args.get('max_wait', SCHEDULER_MAX_WAIT_SECONDS, type=float),
+               SCHEDULER_MAX_WAIT_SECONDS)
+
+def profiling_requested():
+    """True when the request carries the admin profiling token"""
+    if not PROFILE_TOKEN:
+        return False
+    token = request.headers.get('X-Profile-Token') or request.args.get('profile', '')
+    return hmac.compare_digest(token.encode('utf-8'), PROFILE_TOKEN.encode('utf-8'))
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/cache/stats')
+def cache_stats():
+    stats = {'ocr': OCR_CACHE.stats()}
+    if OCR_INDEX is not None:
+        stats['near_duplicates'] = OCR_INDEX.stats()
+    if SCENARIO_CACHE is not None:
+        stats['scenarios'] = SCENARIO_CACHE.stats()
+    if OCR_PREFILTER is not None:
+        stats['prefilter'] = prefilter_stats()
+    return jsonify(stats)
+
+def cache_admin_authorized():
+    """True when the request carries the cache admin token"""
+    if not CACHE_ADMIN_TOKEN:
+        return False
+    token = request.headers.get('X-Admin-Token', '')
+    return hmac.compare_digest(token.encode('utf-8'), CACHE_ADMIN_TOKEN.encode('utf-8'))
+
+@app.route('/cache/clear', methods=['POST'])
+def cache_clear():
+    if not cache_admin_authorized():
+        return jsonify({'error': 'Forbidden'}), 403
+    OCR_CACHE.clear()
+    if OCR_INDEX is not None:
+        OCR_INDEX.clear()
+    if SCENARIO_CACHE is not None:
+        SCENARIO_CACHE.clear()
+    return jsonify({'success': True})
+
+@app.route('/cascade/stats')
+def cascade_stats_route():
+    return jsonify(cascade_stats())
+
+@app.route('/upstream/stats')
+def upstream_stats():
+    stats = CLIENT.stats()
+    if OCR_HEDGE is not None:
+        stats['hedging'] = OCR_HEDGE.stats()
+    return jsonify(stats)
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     if 'image' not in request.files:
@@ -437,39 +1144,272 @@ def analyze():
     if file.filename == '':
         return jsonify({'error': 'No image selected'}), 400
 
+    # ?mode=cascade or ?mode=local overrides ANALYSIS_MODE
+    mode = request.args.get('mode')
+    if mode not in (None, 'local', 'cascade'):
+        return jsonify({'error': f'Unknown analysis mode: {mode}'}), 400
+
+    if file and allowed_file(file.filename) and request.args.get('async') == '1':
+        # Queue the analysis and let the client poll for the result
+        try:
+            job_id = JOBS.submit(run_analysis, read_upload(file), mode)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 413
+        except QueueFullError as e:
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status_url': url_for('job_status', job_id=job_id)
+        }), 202
+
     if file and allowed_file(file.filename):
-        # Create the uploads folder if it doesn't exist
-        if not os.path.exists(app.config['UPLOAD_FOLDER']):
-            os.makedirs(app.config['UPLOAD_FOLDER'])
-        
-        filename = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-        file.save(filename)
+        try:
+            image_bytes = read_upload(file)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 413
 
         try:
-            # Extract text from image
-            print("=== Starting Analysis ===")
-            extracted_text = extract_text_from_image(filename)
+            with scheduler.deadline(max_upstream_wait()):
+                if profiling_requested():
+                    result, profile = profile_call(run_analysis, (image_bytes, mode), top_n=PROFILE_TOP_N,
+                                                   output_dir=PROFILE_DIR or None)
+                    result['profile'] = profile
+                else:
+                    result = run_analysis(image_bytes, mode)
+            with stage_timer('response_serialization'):
+                return jsonify(result)
+        except SchedulerRejected as e:
+            return busy_response(e)
+        except Exception as e:
+            logger.error(f"Error in analyze route: {str(e)}")
+            return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
+
+    return jsonify({'error': 'Invalid file type'}), 400
+
+def sse_event(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-            # Analyze privacy risk
-            analysis_result = analyze_privacy_risk(extracted_text)
+def stream_analysis(image_bytes, max_wait=SCHEDULER_MAX_WAIT_SECONDS, mode=None):
+    """Yield the pipeline results as Server-Sent Events, one per stage:
+    extracted text, scored findings (after the LLM review in cascade
+    mode), then risk scenarios"""
+    try:
+        logger.info("=== Starting Streamed Analysis ===")
+        with scheduler.deadline(max_wait):
+            extracted_text = extract_text_from_bytes(image_bytes)
+        yield sse_event('text', {'extracted_text': extracted_text})
 
-            # Clean up uploaded file
-            os.remove(filename)
+        analysis = score_privacy_risk(extracted_text)
+        if (mode or ANALYSIS_MODE) == 'cascade' and extracted_text and extracted_text.strip():
+            with scheduler.deadline(max_wait):
+                cascade_review(analysis, extracted_text)
+        yield sse_event('findings', {'analysis': analysis})
 
-            return jsonify({
-                'success': True,
-                'extracted_text': extracted_text,
-                'analysis': analysis_result
+        if extracted_text and extracted_text.strip():
+            with scheduler.deadline(max_wait):
+                risk_scenarios, scenario_source = get_risk_scenarios(analysis['detected_data'], extracted_text)
+            yield sse_event('scenarios', {
+                'risk_scenarios': risk_scenarios,
+                'scenario_source': scenario_source
             })
+        yield sse_event('done', {'success': True})
+    except SchedulerRejected as e:
+        yield sse_event('error', {'error': str(e), 'estimated_wait': round(e.estimated_wait, 3)})
+    except Exception as e:
+        logger.error(f"Error in streamed analysis: {str(e)}")
+        yield sse_event('error', {'error': f'Analysis failed: {str(e)}'})
 
-        except Exception as e:
-            # Clean up file in case of error
-            if os.path.exists(filename):
-                os.remove(filename)
-            print(f"Error in analyze route: {str(e)}")
-            return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_stream():
+    # ?mode=cascade or ?mode=local overrides ANALYSIS_MODE
+    mode = request.args.get('mode')
+    if mode not in (None, 'local', 'cascade'):
+        return jsonify({'error': f'Unknown analysis mode: {mode}'}), 400
 
-    return jsonify({'error': 'Invalid file type'}), 400
+    if 'image' not in request.files:
+        return jsonify({'error': 'No image file provided'}), 400
+
+    file = request.files['image']
+    if file.filename == '':
+        return jsonify({'error': 'No image selected'}), 400
+
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+
+    try:
+        image_bytes = read_upload(file)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 413
+
+    response = Response(stream_analysis(image_bytes, max_upstream_wait(), mode), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/analyze/verdict', methods=['POST'])
+def analyze_verdict():
+    if 'image' not in request.files:
+        return jsonify({'error': 'No image file provided'}), 400
+
+    file = request.files['image']
+    if file.filename == '':
+        return jsonify({'error': 'No image selected'}), 400
+
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+
+    try:
+        image_bytes = read_upload(file)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 413
+
+    try:
+        # Stop reading the OCR stream once the verdict is settled at high
+        # risk, unless the caller asks for the full text
+        with scheduler.deadline(max_upstream_wait()):
+            ocr = extract_text_streaming(image_bytes,
+                                         stop_at_high_risk=request.args.get('early_exit', '1') == '1')
+        return jsonify({
+            'success': True,
+            'extracted_text': ocr['extracted_text'],
+            'complete': ocr['complete'],
+            'analysis': score_privacy_risk(ocr['extracted_text']),
+            'timing': {
+                'cached': ocr['cached'],
+                'time_to_first_finding': ocr['time_to_first_finding'],
+                'total_latency': ocr['total_latency']
+            }
+        })
+    except SchedulerRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error in verdict route: {str(e)}")
+        return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
+
+def read_batch_image(file):
+    """Bytes of one uploaded batch image; raises BatchError when too large"""
+    try:
+        return read_upload(file)
+    except ValueError as e:
+        raise BatchError(str(e))
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    # Collect images from repeated 'images' fields and an optional zip
+    # 'archive'. Werkzeug spools both to temporary files; each image is
+    # read only when its analysis starts, and files that are not images
+    # are reported as failed items
+    items = []
+    for file in request.files.getlist('images'):
+        if file.filename:
+            items.append((file.filename, partial(read_batch_image, file) if allowed_file(file.filename)
+                          else partial(skipped, file.filename)))
+
+    archive = request.files.get('archive')
+    if archive and archive.filename:
+        try:
+            items.extend(read_zip_images(archive.stream, allowed_file,
+                                         BATCH_MAX_ITEMS, BATCH_MAX_ARCHIVE_BYTES))
+        except BatchError as e:
+            return jsonify({'error': str(e)}), 400
+
+    if not items:
+        return jsonify({'error': 'No image files provided'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f'Too many images, the limit is {BATCH_MAX_ITEMS}'}), 400
+
+    concurrency = min(request.args.get('concurrency', BATCH_CONCURRENCY, type=int), BATCH_CONCURRENCY)
+    logger.info(f"=== Starting batch analysis of {len(items)} images ===")
+
+    def analyze_batch_item(image_bytes):
+        # Batch work yields to interactive requests and has no deadline
+        with scheduler.priority('batch'):
+            return run_analysis(image_bytes)
+
+    def generate():
+        for result in run_batch(items, analyze_batch_item, concurrency):
+            yield json.dumps(result) + '\n'
+
+    # The uploaded files are closed with the request, so keep it open
+    # until every item has been read
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/redact', methods=['POST'])
+def redact():
+    if 'image' not in request.files:
+        return jsonify({'error': 'No image file provided'}), 400
+
+    file = request.files['image']
+    if file.filename == '' or not allowed_file(file.filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+
+    try:
+        image_bytes = read_upload(file)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 413
+
+    # rectangles is a JSON list in the canvas tool's shape; scale maps
+    # canvas coordinates to image pixels
+    try:
+        rectangles = json.loads(request.form.get('rectangles', '[]'))
+        scale = float(request.form.get('scale', 1))
+    except ValueError:
+        return jsonify({'error': 'Invalid rectangles or scale'}), 400
+
+    try:
+        with stage_timer('redaction'):
+            redacted, mime_type = redact_image(
+                image_bytes, rectangles, scale=scale,
+                output_format=request.form.get('format', 'png'),
+                default_mode=request.form.get('mode', 'blur'),
+                default_strength=request.form.get('strength', 15, type=int)
+            )
+    except RedactionError as e:
+        return jsonify({'error': str(e)}), 400
+    return Response(redacted, mimetype=mime_type)
+
+@app.route('/rescore', methods=['POST'])
+def rescore():
+    # NDJSON records with an 'extracted_text' field in, NDJSON scores out;
+    # scenarios are never generated
+    chunk_size = max(1, request.args.get('chunk_size', 10000, type=int))
+    lines = (line.decode('utf-8') for line in request.stream)
+    results = BulkScorer(DETECTOR).iter_results(read_records(lines), chunk_size)
+    # Score the first chunk before responding, so a bad record in it is a 400
+    try:
+        first = next(results, None)
+    except (InvalidRecord, UnicodeDecodeError) as e:
+        return jsonify({'error': f'Invalid record: {str(e)}'}), 400
+
+    def generate():
+        if first is None:
+            return
+        yield json.dumps(first) + '\n'
+        try:
+            for result in results:
+                yield json.dumps(result) + '\n'
+        except (InvalidRecord, UnicodeDecodeError) as e:
+            # The status is already sent; end the stream with the error
+            yield json.dumps({'error': f'Invalid record: {str(e)}'}) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    # Optionally block for up to JOB_MAX_WAIT_SECONDS until the job finishes
+    wait = min(request.args.get('wait', 0, type=float), JOB_MAX_WAIT_SECONDS)
+    job = JOBS.get(job_id, wait=max(wait, 0))
+    if job is None:
+        return jsonify({'error': 'Unknown job id'}), 404
+    return jsonify(job)
+
+@app.route('/jobs/stats')
+def job_stats():
+    return jsonify(JOBS.stats())
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,416 @@
+"""ASGI serving path for /, /analyze and /analyze/stream.
+
+Runs the same pipeline as app.py (OCR cache, near-duplicate index,
+keyword detection, scoring, scenarios and cascade) but waits on the
+model through the shared AsyncOpenRouterClient, so an analysis waiting
+on OpenRouter costs a coroutine rather than a worker thread. Image
+decoding and pre-processing run on a thread pool to keep the event loop
+free.
+
+    uvicorn app_async:app --host 0.0.0.0 --port 8000
+
+Upstream calls still pass through the scheduler, so OPENROUTER_CONCURRENCY
+and OPENROUTER_RPM bound how many analyses reach the model at once; the
+rest wait in the queue without holding a thread. ?async=1 jobs, the
+token-streaming /analyze/verdict and profiling stay on the Flask app.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+from jinja2 import pass_context
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+from starlette.templating import Jinja2Templates
+
+import app as pipeline
+import scheduler
+import utils
+from config import SCHEDULER_MAX_WAIT_SECONDS, UPLOAD_MAX_BYTES
+from metrics import REGISTRY
+from openrouter import ASYNC_CLIENT
+from scheduler import SchedulerRejected
+
+logger = logging.getLogger(__name__)
+
+if ASYNC_CLIENT is None:
+    raise ImportError("app_async needs httpx for its upstream client")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+templates = Jinja2Templates(directory=os.path.join(ROOT, 'templates'))
+
+IN_FLIGHT = REGISTRY.gauge('async_requests_in_flight', 'Requests being served by the ASGI app')
+
+# OCR calls in flight, so concurrent uploads of one image share a call
+_OCR_IN_FLIGHT = {}
+
+
+@pass_context
+def url_for(context, name, **params):
+    # The templates are shared with Flask, which names static files filename=
+    if 'filename' in params:
+        params['path'] = params.pop('filename')
+    return context['request'].app.url_path_for(name, **params)
+
+
+templates.env.globals['url_for'] = url_for
+
+
+async def request_text_extraction(image_bytes):
+    """Send an image to the Qwen VL model and return the extracted text;
+    tall images are read in overlapping strips, concurrently"""
+    with pipeline.stage_timer('preprocess'):
+        tiles = await run_in_threadpool(pipeline.prepare_ocr_tiles, image_bytes)
+    pipeline.OCR_TILES.observe(len(tiles))
+    if len(tiles) == 1:
+        return await request_ocr(*tiles[0])
+    logger.info(f"Reading tall image in {len(tiles)} strips", extra={'tiles': len(tiles)})
+    # gather cancels nothing on failure, so cancel the other strips here
+    tasks = [asyncio.ensure_future(request_ocr(tile_bytes, mime_type)) for tile_bytes, mime_type in tiles]
+    try:
+        texts = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    with pipeline.stage_timer('tile_stitch'):
+        return pipeline.stitch_text(texts)
+
+
+async def request_ocr(image_bytes, mime_type):
+    """One OCR call for a prepared image"""
+    with pipeline.stage_timer('base64_encode'):
+        body = pipeline.build_ocr_request_body(image_bytes, mime_type)
+    logger.info("Sending request to OpenRouter API...", extra={'body_bytes': len(body)})
+    with pipeline.stage_timer('ocr_request'):
+        if pipeline.OCR_HEDGE is None:
+            return await ASYNC_CLIENT.chat_completion(body, name='ocr')
+        return await pipeline.OCR_HEDGE.run_async(
+            lambda: ASYNC_CLIENT.chat_completion(body, name='ocr'),
+            lambda: ASYNC_CLIENT.chat_completion(pipeline.hedge_request_body(body, image_bytes, mime_type),
+                                                 name='ocr_hedge')
+        )
+
+
+async def extract_and_cache(key, image_bytes):
+    """OCR an image unless it has no text or a near-duplicate has been
+    read, and cache the text. Prefilter skips are not cached"""
+    started = time.time()
+    if await run_in_threadpool(pipeline.likely_text_free, image_bytes):
+        return ''
+    image_hash = await run_in_threadpool(pipeline.perceptual_hash, image_bytes)
+    # The index and the OCR cache take locks, and the cache may hit SQLite,
+    # so they run off the event loop
+    text = await run_in_threadpool(pipeline.find_near_duplicate_text, image_hash)
+    if text is None:
+        text = await request_text_extraction(image_bytes)
+        if image_hash is not None:
+            await run_in_threadpool(pipeline.OCR_INDEX.add, image_hash, text)
+    await run_in_threadpool(pipeline.OCR_CACHE.set, key, text, time.time() - started)
+    return text
+
+
+def _forget_ocr(key, task):
+    _OCR_IN_FLIGHT.pop(key, None)
+    # Mark the error as seen when every waiter has gone away
+    if not task.cancelled():
+        task.exception()
+
+
+async def extract_text_from_bytes(image_bytes):
+    """Extract text from image bytes, reusing cached results for the same
+    or a near-duplicate image"""
+    logger.info("Starting text extraction from image...")
+    try:
+        key = await run_in_threadpool(pipeline.ocr_cache_key, image_bytes)
+        extracted_text = await run_in_threadpool(pipeline.OCR_CACHE.get, key)
+        cached = extracted_text is not None
+        if not cached:
+            task = _OCR_IN_FLIGHT.get(key)
+            cached = task is not None
+            if task is None:
+                task = asyncio.ensure_future(extract_and_cache(key, image_bytes))
+                _OCR_IN_FLIGHT[key] = task
+                task.add_done_callback(lambda done: _forget_ocr(key, done))
+            # A client that disconnects does not cancel the call others wait on
+            extracted_text = await asyncio.shield(task)
+        logger.info("Text extraction served from cache" if cached else "Text extraction completed successfully",
+                    extra={'cached': cached, 'text_chars': len(extracted_text or '')})
+        pipeline.OCR_TEXT_CHARS.observe(len(extracted_text or ''))
+        return extracted_text
+    except SchedulerRejected:
+        raise
+    except Exception as e:
+        logger.error(f"Error in extract_text_from_image: {str(e)}")
+        raise Exception(f"Failed to extract text from image: {str(e)}")
+
+
+async def request_risk_scenarios(detected_data, extracted_text):
+    """Ask the model for 3 risk scenarios; raises if the call fails"""
+    logger.info("Generating risk scenarios...")
+    try:
+        payload = pipeline.build_scenario_payload(detected_data, extracted_text)
+        logger.info("Sending scenario generation request to OpenRouter API...")
+        with pipeline.stage_timer('scenario_request'), scheduler.priority('scenario'):
+            scenarios_text = await ASYNC_CLIENT.chat_completion(payload, name='scenarios')
+        scenarios = pipeline.parse_risk_scenarios(scenarios_text, detected_data)
+        logger.info("Scenario generation completed successfully")
+        return scenarios
+    except Exception as e:
+        logger.error(f"Error generating scenarios: {str(e)}")
+        raise
+
+
+async def _get_risk_scenarios(detected_data, extracted_text):
+    # Without findings, or in local mode, no model call is made
+    if pipeline.SCENARIO_MODE == 'local' or not any(detected_data.values()):
+        return pipeline._get_risk_scenarios(detected_data, extracted_text)
+
+    cache = pipeline.SCENARIO_CACHE
+    try:
+        key = pipeline.scenario_cache_key(detected_data, extracted_text) if cache is not None else None
+        scenarios = cache.get(key) if cache is not None else None
+        if scenarios is not None:
+            logger.info("Risk scenarios served from cache")
+            return list(scenarios), 'cache'
+        started = time.time()
+        scenarios = await request_risk_scenarios(detected_data, extracted_text)
+        if cache is not None:
+            cache.set(key, scenarios, time.time() - started)
+        return scenarios, 'model'
+    except Exception:
+        return pipeline.generate_fallback_scenarios(detected_data), 'fallback'
+
+
+async def get_risk_scenarios(detected_data, extracted_text):
+    """Return (scenarios, source) where source is one of
+    'none', 'local', 'cache', 'model' or 'fallback'"""
+    with pipeline.stage_timer('scenario_generation'):
+        scenarios, source = await _get_risk_scenarios(detected_data, extracted_text)
+    pipeline.SCENARIO_SOURCES.labels(source=source).inc()
+    return scenarios, source
+
+
+async def analyze_privacy_risk(text):
+    """Keyword analysis plus risk scenarios"""
+    result = pipeline.score_privacy_risk(text)
+    if not text or not text.strip():
+        return result
+    return await add_risk_scenarios(result, text)
+
+
+async def add_risk_scenarios(result, text):
+    """Generate risk scenarios for a scored result and add them to it"""
+    risk_scenarios, scenario_source = await get_risk_scenarios(result['detected_data'], text)
+    result["risk_scenarios"] = risk_scenarios
+    result["scenario_source"] = scenario_source
+
+    logger.info(f"Privacy analysis completed: {result['risk_level']} risk level, Score: {result['privacy_score']}",
+                extra={'risk_level': result['risk_level'], 'privacy_score': result['privacy_score'],
+                       'scenario_source': scenario_source})
+    return result
+
+
+async def cascade_privacy_risk(text):
+    """Keyword analysis first; escalate to the LLM only when it is ambiguous.
+    Scenarios are generated from the merged findings"""
+    result = pipeline.score_privacy_risk(text)
+    if not text or not text.strip():
+        return result
+    await cascade_review(result, text)
+    return await add_risk_scenarios(result, text)
+
+
+async def cascade_review(result, text):
+    """Escalate a locally scored result to the LLM analysis when it is
+    ambiguous, merging the model's findings into it"""
+    reason = pipeline.escalation_reason(result)
+    cascade = {'escalated': reason is not None, 'reason': reason}
+    if reason is None:
+        pipeline.CASCADE_DECISIONS.labels(decision='local', reason='confident').inc()
+    else:
+        pipeline.CASCADE_DECISIONS.labels(decision='escalated', reason=reason).inc()
+        logger.info(f"Escalating analysis to the LLM ({reason})", extra={'reason': reason})
+        started = time.perf_counter()
+        try:
+            with pipeline.stage_timer('llm_analysis'):
+                analysis_text = await ASYNC_CLIENT.chat_completion(utils.build_analysis_payload(text),
+                                                                   name='analysis')
+            cascade['llm_risk_level'] = pipeline.merge_llm_analysis(result, utils.parse_analysis(analysis_text))
+        except Exception as e:
+            # The local result stands on its own if the model is unavailable
+            logger.error(f"Error in cascade escalation: {str(e)}")
+            cascade['error'] = str(e)
+        cascade['llm_seconds'] = round(time.perf_counter() - started, 6)
+    result['cascade'] = cascade
+    return result
+
+
+async def run_analysis(image_bytes, mode=None):
+    """Run the full pipeline for one image and return the response body"""
+    logger.info("=== Starting Analysis ===")
+    extracted_text = await extract_text_from_bytes(image_bytes)
+
+    if (mode or pipeline.ANALYSIS_MODE) == 'cascade':
+        analysis_result = await cascade_privacy_risk(extracted_text)
+    else:
+        analysis_result = await analyze_privacy_risk(extracted_text)
+
+    return {
+        'success': True,
+        'extracted_text': extracted_text,
+        'analysis': analysis_result
+    }
+
+
+def busy_response(error):
+    """503 with a Retry-After for a request the upstream scheduler turned away"""
+    return JSONResponse({'error': str(error), 'estimated_wait': round(error.estimated_wait, 3)}, status_code=503,
+                        headers={'Retry-After': str(max(1, math.ceil(error.estimated_wait)))})
+
+
+def max_upstream_wait(request):
+    """Seconds this request may queue for the model (?max_wait=, capped)"""
+    try:
+        max_wait = float(request.query_params.get('max_wait', SCHEDULER_MAX_WAIT_SECONDS))
+    except ValueError:
+        max_wait = SCHEDULER_MAX_WAIT_SECONDS
+    return min(max_wait, SCHEDULER_MAX_WAIT_SECONDS)
+
+
+def timed(rule, endpoint):
+    """Record the same request metrics as the Flask app around an endpoint"""
+    async def handler(request):
+        started = time.perf_counter()
+        IN_FLIGHT.inc()
+        try:
+            response = await endpoint(request)
+        finally:
+            IN_FLIGHT.dec()
+        pipeline.HTTP_REQUESTS.labels(endpoint=rule, method=request.method, status=response.status_code).inc()
+        pipeline.HTTP_SECONDS.labels(endpoint=rule).observe(time.perf_counter() - started)
+        return response
+    return handler
+
+
+async def index(request):
+    return templates.TemplateResponse(request, 'index.html')
+
+
+async def metrics(request):
+    return Response(REGISTRY.render(), media_type='text/plain; version=0.0.4')
+
+
+async def read_image_upload(request):
+    """Return (image_bytes, None) for the uploaded image, or (None, error response)"""
+    if int(request.headers.get('content-length') or 0) > pipeline.app.config['MAX_CONTENT_LENGTH']:
+        return None, JSONResponse({'error': 'Request is too large'}, status_code=413)
+
+    form = await request.form()
+    file = form.get('image')
+    if file is None or isinstance(file, str):
+        return None, JSONResponse({'error': 'No image file provided'}, status_code=400)
+    if not file.filename:
+        return None, JSONResponse({'error': 'No image selected'}, status_code=400)
+    if not pipeline.allowed_file(file.filename):
+        return None, JSONResponse({'error': 'Invalid file type'}, status_code=400)
+
+    with pipeline.stage_timer('upload_read'):
+        image_bytes = await file.read(UPLOAD_MAX_BYTES + 1)
+    await form.close()
+    if len(image_bytes) > UPLOAD_MAX_BYTES:
+        return None, JSONResponse({'error': f"Image is larger than {UPLOAD_MAX_BYTES} bytes"}, status_code=413)
+    pipeline.UPLOAD_BYTES.observe(len(image_bytes))
+    return image_bytes, None
+
+
+async def analyze(request):
+    # ?mode=cascade or ?mode=local overrides ANALYSIS_MODE
+    mode = request.query_params.get('mode')
+    if mode not in (None, 'local', 'cascade'):
+        return JSONResponse({'error': f'Unknown analysis mode: {mode}'}, status_code=400)
+    if request.query_params.get('async') == '1':
+        return JSONResponse({'error': 'Asynchronous jobs are served by the Flask app'}, status_code=400)
+
+    image_bytes, error = await read_image_upload(request)
+    if error is not None:
+        return error
+
+    try:
+        with scheduler.deadline(max_upstream_wait(request)):
+            result = await run_analysis(image_bytes, mode)
+        with pipeline.stage_timer('response_serialization'):
+            return JSONResponse(result)
+    except SchedulerRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error in analyze route: {str(e)}")
+        return JSONResponse({'error': f'Analysis failed: {str(e)}'}, status_code=500)
+
+
+async def stream_analysis(image_bytes, max_wait=SCHEDULER_MAX_WAIT_SECONDS, mode=None):
+    """Yield the pipeline results as Server-Sent Events, one per stage:
+    extracted text, scored findings (after the LLM review in cascade
+    mode), then risk scenarios"""
+    try:
+        logger.info("=== Starting Streamed Analysis ===")
+        with scheduler.deadline(max_wait):
+            extracted_text = await extract_text_from_bytes(image_bytes)
+        yield pipeline.sse_event('text', {'extracted_text': extracted_text})
+
+        analysis = pipeline.score_privacy_risk(extracted_text)
+        if (mode or pipeline.ANALYSIS_MODE) == 'cascade' and extracted_text and extracted_text.strip():
+            with scheduler.deadline(max_wait):
+                await cascade_review(analysis, extracted_text)
+        yield pipeline.sse_event('findings', {'analysis': analysis})
+
+        if extracted_text and extracted_text.strip():
+            with scheduler.deadline(max_wait):
+                risk_scenarios, scenario_source = await get_risk_scenarios(analysis['detected_data'],
+                                                                           extracted_text)
+            yield pipeline.sse_event('scenarios', {
+                'risk_scenarios': risk_scenarios,
+                'scenario_source': scenario_source
+            })
+        yield pipeline.sse_event('done', {'success': True})
+    except SchedulerRejected as e:
+        yield pipeline.sse_event('error', {'error': str(e), 'estimated_wait': round(e.estimated_wait, 3)})
+    except Exception as e:
+        logger.error(f"Error in streamed analysis: {str(e)}")
+        yield pipeline.sse_event('error', {'error': f'Analysis failed: {str(e)}'})
+
+
+async def analyze_stream(request):
+    mode = request.query_params.get('mode')
+    if mode not in (None, 'local', 'cascade'):
+        return JSONResponse({'error': f'Unknown analysis mode: {mode}'}, status_code=400)
+
+    image_bytes, error = await read_image_upload(request)
+    if error is not None:
+        return error
+    return StreamingResponse(stream_analysis(image_bytes, max_upstream_wait(request), mode),
+                             media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await ASYNC_CLIENT.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route('/', timed('/', index)),
+        Route('/analyze', timed('/analyze', analyze), methods=['POST']),
+        Route('/analyze/stream', timed('/analyze/stream', analyze_stream), methods=['POST']),
+        Route('/metrics', timed('/metrics', metrics)),
+        Mount('/static', StaticFiles(directory=os.path.join(ROOT, 'static')), name='static')
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,83 @@
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+
+
+class BatchError(Exception):
+    """Raised when a batch upload cannot be read"""
+
+
+def read_zip_images(stream, is_allowed, max_items, max_bytes):
+    """Return [(filename, read)] for the files in a zip archive.
+
+    read() returns a member's bytes when it is called, so members are
+    decompressed one at a time as the batch reaches them rather than all
+    up front. Members that are not allowed image files are kept, with a
+    read() that raises BatchError, so they show up as failed items. The
+    archive is rejected if it has more than max_items files or its
+    images would expand past max_bytes. The stream must stay open until
+    every read() has run.
+    """
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile as e:
+        raise BatchError(f"Invalid zip archive: {str(e)}")
+
+    entries = [(info, is_allowed(info.filename) and not os.path.basename(info.filename).startswith('.'))
+               for info in archive.infolist() if not info.is_dir()]
+    if len(entries) > max_items:
+        archive.close()
+        raise BatchError(f"Archive has {len(entries)} files, the limit is {max_items}")
+    if sum(info.file_size for info, image in entries if image) > max_bytes:
+        archive.close()
+        raise BatchError(f"Archive expands past the {max_bytes} byte limit")
+    return [(info.filename, partial(archive.read, info) if image else partial(skipped, info.filename))
+            for info, image in entries]
+
+
+def skipped(filename):
+    raise BatchError(f"Skipped {filename}: not an allowed image file")
+
+
+def run_batch(items, fn, concurrency):
+    """Run fn(read()) for every (filename, read) item with at most
+    concurrency calls in flight, yielding one result dict per item as
+    soon as it finishes, then a summary dict.
+
+    Each item's bytes are only read when its call starts. A failing item,
+    or one whose read() raises BatchError, is reported inline and does
+    not stop the batch.
+    """
+    started = time.time()
+    succeeded = failed = 0
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='batch')
+    try:
+        futures = {
+            executor.submit(lambda read: fn(read()), read): (index, filename)
+            for index, (filename, read) in enumerate(items)
+        }
+        for future in as_completed(futures):
+            index, filename = futures[future]
+            item = {'index': index, 'filename': filename}
+            try:
+                item.update(future.result())
+                succeeded += 1
+            except BatchError as e:
+                item.update({'success': False, 'error': str(e)})
+                failed += 1
+            except Exception as e:
+                item.update({'success': False, 'error': f'Analysis failed: {str(e)}'})
+                failed += 1
+            yield item
+        yield {
+            'done': True,
+            'total': len(futures),
+            'succeeded': succeeded,
+            'failed': failed,
+            'elapsed': round(time.time() - started, 3)
+        }
+    finally:
+        # Drop queued items if the client goes away mid-stream
+        executor.shutdown(wait=False, cancel_futures=True)
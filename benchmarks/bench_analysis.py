@@ -0,0 +1,189 @@
+"""Microbenchmarks for the local analysis path.
+
+Times analyze_privacy_risk (with scenario generation stubbed out so no
+network call is made), calculate_privacy_score and
+generate_fallback_scenarios over synthetic corpora from 100 characters
+to 1 MB, at low and high keyword density. Reports throughput, p50/p99
+latency and allocations, and can save a baseline and compare later runs
+against it on the same machine.
+
+Usage:
+    python benchmarks/bench_analysis.py --save baseline
+    python benchmarks/bench_analysis.py --compare benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep the pipeline's per-call logging out of the timings
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import app  # noqa: E402
+from detector import KEYWORD_TABLES  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+SIZES = [100, 1000, 10000, 100000, 1000000]
+# Share of words in the corpus that are privacy keywords
+DENSITIES = {'low': 0.002, 'high': 0.05}
+FILLER = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+          'incididunt ut labore et dolore magna aliqua enim minim veniam quis nostrud '
+          'exercitation ullamco laboris nisi aliquip ex ea commodo consequat').split()
+KEYWORDS = sorted({keyword for groups in KEYWORD_TABLES.values()
+                   for keywords in groups.values() for keyword in keywords})
+
+
+def make_corpus(size, density, seed=0):
+    """Return size characters of filler text with the given keyword density"""
+    rng = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(KEYWORDS) if rng.random() < density else rng.choice(FILLER)
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:size]
+
+
+def stub_scenarios(detected_data, extracted_text):
+    return app.generate_fallback_scenarios(detected_data), 'stub'
+
+
+def time_calls(fn, args, min_time, min_runs):
+    """Return per-call latencies in seconds"""
+    latencies = []
+    deadline = time.perf_counter() + min_time
+    while len(latencies) < min_runs or time.perf_counter() < deadline:
+        started = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def count_allocations(fn, args):
+    """Return (peak_bytes, net_allocated_blocks) for one call"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        fn(*args)
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    return peak, blocks
+
+
+def percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, int(round(q / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_case(name, fn, args, input_bytes, min_time, min_runs):
+    latencies = sorted(time_calls(fn, args, min_time, min_runs))
+    peak, blocks = count_allocations(fn, args)
+    p50 = percentile(latencies, 50)
+    result = {
+        'name': name,
+        'runs': len(latencies),
+        'p50_ms': round(p50 * 1000, 4),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 4),
+        'calls_per_sec': round(1 / p50, 1) if p50 else None,
+        'peak_alloc_bytes': peak,
+        'net_alloc_blocks': blocks
+    }
+    if input_bytes:
+        result['mb_per_sec'] = round(input_bytes / p50 / 1e6, 3) if p50 else None
+    return result
+
+
+def run_suite(min_time, min_runs, sizes):
+    app.get_risk_scenarios = stub_scenarios
+    results = []
+    for density_name, density in DENSITIES.items():
+        for size in sizes:
+            text = make_corpus(size, density)
+            results.append(run_case(f'analyze_privacy_risk/{density_name}/{size}',
+                                    app.analyze_privacy_risk, (text,), len(text.encode('utf-8')),
+                                    min_time, min_runs))
+
+    counts = {'personal': 3, 'financial': 2, 'medical': 1}
+    results.append(run_case('calculate_privacy_score', app.calculate_privacy_score,
+                            (9, counts), 0, min_time, min_runs))
+
+    for label, text in [('none', ''), ('all', ' '.join(KEYWORDS))]:
+        detected_data = app.DETECTOR.detect(text)
+        results.append(run_case(f'generate_fallback_scenarios/{label}', app.generate_fallback_scenarios,
+                                (detected_data,), 0, min_time, min_runs))
+    return results
+
+
+def machine_info():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'node': platform.node()
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """Print the change in p50 against a baseline; return the regressions"""
+    with open(baseline_path) as f:
+        baseline = {case['name']: case for case in json.load(f)['results']}
+    regressions = []
+    print(f"\n{'case':<45} {'base p50':>10} {'p50':>10} {'change':>8}")
+    for case in results:
+        base = baseline.get(case['name'])
+        if base is None or not base['p50_ms']:
+            continue
+        change = (case['p50_ms'] - base['p50_ms']) / base['p50_ms']
+        flag = '  REGRESSION' if change > threshold else ''
+        print(f"{case['name']:<45} {base['p50_ms']:>10.4f} {case['p50_ms']:>10.4f} {change:>+7.1%}{flag}")
+        if change > threshold:
+            regressions.append(case['name'])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds to spend on each case')
+    parser.add_argument('--min-runs', type=int, default=5, help='minimum calls per case')
+    parser.add_argument('--max-size', type=int, default=SIZES[-1], help='largest corpus in characters')
+    parser.add_argument('--save', metavar='NAME', help='save results to benchmarks/results/NAME.json')
+    parser.add_argument('--compare', metavar='PATH', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='p50 slowdown that counts as a regression (default 0.10)')
+    args = parser.parse_args()
+
+    results = run_suite(args.min_time, args.min_runs, [size for size in SIZES if size <= args.max_size])
+
+    print(f"{'case':<45} {'runs':>6} {'p50 ms':>10} {'p99 ms':>10} {'MB/s':>9} {'peak KB':>9} {'blocks':>7}")
+    for case in results:
+        mb_per_sec = case.get('mb_per_sec')
+        print(f"{case['name']:<45} {case['runs']:>6} {case['p50_ms']:>10.4f} {case['p99_ms']:>10.4f} "
+              f"{mb_per_sec if mb_per_sec is not None else '-':>9} {case['peak_alloc_bytes'] / 1024:>9.1f} "
+              f"{case['net_alloc_blocks']:>7}")
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f'{args.save}.json')
+        with open(path, 'w') as f:
+            json.dump({'machine': machine_info(), 'created': time.time(), 'results': results}, f, indent=2)
+        print(f"\nSaved results to {path}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""Compare the Flask and ASGI serving paths under many in-flight analyses.
+
+Starts the mock upstream, then each server in turn: the Flask app on
+Werkzeug's threaded server (one thread per request) and app_async under
+uvicorn. At each concurrency level, that many clients keep one /analyze
+request open each until --requests have completed. Every upload is a
+unique image, so each analysis makes its OCR and scenario calls.
+
+Reports throughput, p50/p99 latency, errors, the server's CPU time per
+request and its resident memory: idle, peak under load, and the growth
+per in-flight request. The client, mock and server share the machine, so
+on few cores throughput is bounded by their combined CPU time.
+
+    python benchmarks/bench_async.py --concurrency 10 100 500 --latency-mean 1.0
+
+The upstream scheduler is opened up (OPENROUTER_RPM=0, a high
+OPENROUTER_CONCURRENCY) so the servers, not the rate limit, are measured.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+from load_test import percentile, synthetic_png
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+SERVERS = {
+    'flask': [sys.executable, '-c', "import sys, app; app.app.run(port=int(sys.argv[1]), threaded=True)"],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'app_async:app', '--log-level', 'warning', '--port']
+}
+
+
+def rss_kb(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def cpu_seconds(pid):
+    """User plus system CPU time of a process"""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise SystemExit(f"Server at {url} did not start")
+
+
+class MemorySampler(threading.Thread):
+    """Track the peak RSS of a process while a level runs"""
+
+    def __init__(self, pid, interval=0.05):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self.running = True
+
+    def run(self):
+        while self.running:
+            self.peak = max(self.peak, rss_kb(self.pid))
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.join()
+        return self.peak
+
+
+async def drive(url, concurrency, total, seed, timeout):
+    """Keep concurrency requests open until total have completed"""
+    latencies = []
+    errors = {}
+    # Build the uploads up front so the client spends its CPU on requests
+    uploads = iter([synthetic_png(seed + index) for index in range(total)])
+
+    # One connection per client, since a single httpx pool gets slower with
+    # every keep-alive connection it holds. Clients are built before the
+    # clock starts; each loads the CA bundle.
+    clients = [httpx.AsyncClient(limits=httpx.Limits(max_connections=1), timeout=timeout)
+               for _ in range(concurrency)]
+
+    async def worker(client):
+        async with client:
+            for data in uploads:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, files={'image': ('upload.png', data)})
+                    outcome = str(response.status_code)
+                except httpx.HTTPError as e:
+                    outcome = type(e).__name__
+                if outcome == '200':
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors[outcome] = errors.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(client) for client in clients))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return elapsed, latencies, errors
+
+
+def run_server(name, port, env, levels, requests_per_level, timeout):
+    command = SERVERS[name] + [str(port)]
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    rows = []
+    try:
+        base = f'http://127.0.0.1:{port}'
+        wait_until_up(base + '/')
+        idle = rss_kb(server.pid)
+        for level_index, concurrency in enumerate(levels):
+            total = max(requests_per_level, concurrency)
+            sampler = MemorySampler(server.pid)
+            sampler.start()
+            cpu = cpu_seconds(server.pid)
+            # Offset the seeds so no level hits the previous level's cache
+            elapsed, latencies, errors = asyncio.run(
+                drive(base + '/analyze', concurrency, total, 1000000 * (level_index + 1), timeout))
+            peak = sampler.stop()
+            cpu = cpu_seconds(server.pid) - cpu
+            row = {
+                'server': name,
+                'concurrency': concurrency,
+                'requests': total,
+                'ok': len(latencies),
+                'errors': errors,
+                'throughput_rps': round(len(latencies) / elapsed, 2),
+                'p50_s': round(percentile(latencies, 50), 3) if latencies else None,
+                'p99_s': round(percentile(latencies, 99), 3) if latencies else None,
+                'idle_rss_mb': round(idle / 1024, 1),
+                'peak_rss_mb': round(peak / 1024, 1),
+                'kb_per_in_flight': round((peak - idle) / concurrency, 1),
+                'server_cpu_ms_per_request': round(1000 * cpu / total, 2)
+            }
+            rows.append(row)
+            print(f"{name:>6} {concurrency:>6} {row['throughput_rps']:>9} {str(row['p50_s']):>7} "
+                  f"{str(row['p99_s']):>7} {row['peak_rss_mb']:>8} {row['kb_per_in_flight']:>10} "
+                  f"{row['server_cpu_ms_per_request']:>7} {sum(errors.values()):>6}")
+    finally:
+        server.terminate()
+        server.wait()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--requests', type=int, default=1000, help='requests per level (at least the concurrency)')
+    parser.add_argument('--servers', nargs='+', choices=sorted(SERVERS), default=['flask', 'asgi'])
+    parser.add_argument('--latency-mean', type=float, default=1.0, help='mock upstream latency per call in seconds')
+    parser.add_argument('--port', type=int, default=8190, help='first of three consecutive ports used')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--output', help='where to save the JSON report')
+    args = parser.parse_args()
+
+    mock_port = args.port
+    mock = subprocess.Popen([sys.executable, os.path.join(ROOT, 'benchmarks', 'mock_openrouter.py'),
+                             '--port', str(mock_port), '--latency', 'fixed',
+                             '--latency-mean', str(args.latency_mean)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    env = dict(os.environ,
+               OPENROUTER_API_URL=f'http://127.0.0.1:{mock_port}/api/v1/chat/completions',
+               OPENROUTER_RPM='0', OPENROUTER_CONCURRENCY='100000',
+               # Enough upstream connections for one call per in-flight request
+               OPENROUTER_POOL_SIZE=str(max(args.concurrency)),
+               SCHEDULER_MAX_WAIT_SECONDS=str(args.timeout), SCENARIO_CACHE_ENABLED='0',
+               OCR_CACHE_PATH='', LOG_LEVEL='WARNING')
+
+    print(f"{'server':>6} {'conc':>6} {'req/s':>9} {'p50 s':>7} {'p99 s':>7} {'peak MB':>8} "
+          f"{'KB/flight':>10} {'CPU ms':>7} {'errors':>6}")
+    rows = []
+    try:
+        for offset, name in enumerate(args.servers, 1):
+            rows += run_server(name, args.port + offset, env, args.concurrency, args.requests, args.timeout)
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    report = {'latency_mean': args.latency_mean, 'created': time.time(), 'results': rows}
+    output = args.output or os.path.join(RESULTS_DIR, f"async-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Tail latency of OCR calls with and without hedging.
+
+Starts the mock upstream with a long-tailed (lognormal) latency and sends
+the same OCR request --calls times at --concurrency, first plainly and
+then through a HedgePolicy. Reports p50/p95/p99, the hedge rate and how
+many extra upstream calls the hedges cost.
+
+    python benchmarks/bench_hedge.py --calls 500 --latency-mean 0.5 --latency-sigma 1.2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, int(round(q / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def timed_calls(call, calls, concurrency):
+    def one(_):
+        started = time.perf_counter()
+        call()
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(one, range(calls)))
+    return {
+        'p50_s': round(percentile(latencies, 50), 3),
+        'p95_s': round(percentile(latencies, 95), 3),
+        'p99_s': round(percentile(latencies, 99), 3),
+        'max_s': round(latencies[-1], 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency-mean', type=float, default=0.5)
+    parser.add_argument('--latency-sigma', type=float, default=1.2, help='lognormal shape; higher is a longer tail')
+    parser.add_argument('--percentile', type=float, default=95, help='hedge after this percentile of latency')
+    parser.add_argument('--min-delay', type=float, default=0.0)
+    parser.add_argument('--max-rate', type=float, default=0.1)
+    parser.add_argument('--port', type=int, default=8290)
+    parser.add_argument('--output', help='where to save the JSON report')
+    args = parser.parse_args()
+
+    mock = subprocess.Popen([sys.executable, os.path.join(ROOT, 'benchmarks', 'mock_openrouter.py'),
+                             '--port', str(args.port), '--latency', 'lognormal',
+                             '--latency-mean', str(args.latency_mean),
+                             '--latency-sigma', str(args.latency_sigma)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ.update(OPENROUTER_API_URL=f'http://127.0.0.1:{args.port}/api/v1/chat/completions',
+                      OPENROUTER_RPM='0', OPENROUTER_CONCURRENCY='1000', LOG_LEVEL='WARNING')
+    try:
+        from app import build_ocr_request_body
+        from hedge import HedgePolicy
+        from load_test import synthetic_png
+        from openrouter import OpenRouterClient
+
+        time.sleep(1)
+        client = OpenRouterClient(pool_size=args.concurrency * 2)
+        body = build_ocr_request_body(synthetic_png(0))
+        policy = HedgePolicy('bench', percentile=args.percentile, min_delay=args.min_delay,
+                             max_rate=args.max_rate)
+
+        results = {'plain': timed_calls(lambda: client.chat_completion(body, name='bench'),
+                                        args.calls, args.concurrency)}
+        # Let the policy learn the latency distribution before it is timed
+        for _ in range(policy.min_samples):
+            policy.run(lambda: client.chat_completion(body, name='bench'))
+        results['hedged'] = timed_calls(lambda: policy.run(lambda: client.chat_completion(body, name='bench')),
+                                        args.calls, args.concurrency)
+        stats = policy.stats()
+        results['hedged'].update({'hedges': stats['hedges'], 'hedge_rate': stats['hedge_rate'],
+                                  'wins': stats['wins'], 'delay_s': stats['delay']})
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    for name, result in results.items():
+        print(f"{name:>7}: p50 {result['p50_s']}s  p95 {result['p95_s']}s  p99 {result['p99_s']}s  "
+              f"max {result['max_s']}s")
+    hedged = results['hedged']
+    print(f"hedges: {hedged['hedges']} ({hedged['hedge_rate']:.1%} of recent calls), wins {hedged['wins']}, "
+          f"delay {hedged['delay_s']:.3f}s")
+
+    report = {'args': vars(args), 'created': time.time(), 'results': results}
+    output = args.output or os.path.join(RESULTS_DIR, f"hedge-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {output}")
+
+
+if __name__ == '__main__':
+    main()
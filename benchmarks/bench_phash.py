@@ -0,0 +1,123 @@
+"""Scaling benchmark for the near-duplicate OCR index.
+
+Grows a MultiIndexHash with synthetic 256-bit hashes and, at each size,
+times lookups for near-duplicates of stored images (a few bits flipped)
+and for unseen images. Reports the hit rate for each kind, p50/p99
+lookup latency and the process's peak memory.
+
+Real screenshots are not uniformly random: many share a layout, so
+--clustered draws hashes around a set of templates, which makes buckets
+fuller and lookups slower.
+
+    python benchmarks/bench_phash.py --sizes 1000 10000 100000 1000000
+    python benchmarks/bench_phash.py --clustered --max-distance 8
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phash import MultiIndexHash  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+BITS = 256
+
+
+def flip_bits(rng, value, count):
+    for bit in rng.sample(range(BITS), count):
+        value ^= 1 << bit
+    return value
+
+
+def hash_source(rng, clustered, templates=1000, spread=40):
+    """Yield an endless stream of synthetic hashes"""
+    if not clustered:
+        while True:
+            yield rng.getrandbits(BITS)
+    centres = [rng.getrandbits(BITS) for _ in range(templates)]
+    while True:
+        yield flip_bits(rng, rng.choice(centres), rng.randint(spread // 2, spread))
+
+
+def percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, int(round(q / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def time_lookups(index, queries):
+    latencies = []
+    hits = 0
+    for query in queries:
+        started = time.perf_counter()
+        found = index.nearest(query)
+        latencies.append(time.perf_counter() - started)
+        hits += found is not None
+    latencies.sort()
+    return hits / len(queries), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--max-distance', type=int, default=6)
+    parser.add_argument('--queries', type=int, default=2000, help='lookups of each kind per size')
+    parser.add_argument('--clustered', action='store_true', help='draw hashes around shared templates')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='where to save the JSON report')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    source = hash_source(rng, args.clustered)
+    index = MultiIndexHash(BITS, args.max_distance, max_entries=max(args.sizes))
+    stored = []
+    rows = []
+
+    print(f"{'entries':>10} {'dup hit':>8} {'new hit':>8} {'p50 us':>8} {'p99 us':>8} {'build s':>8} {'peak MB':>8}")
+    for size in sorted(args.sizes):
+        started = time.perf_counter()
+        while len(stored) < size:
+            value = next(source)
+            index.add(value, len(stored))
+            stored.append(value)
+        build = time.perf_counter() - started
+
+        duplicates = [flip_bits(rng, rng.choice(stored), rng.randint(0, args.max_distance))
+                      for _ in range(args.queries)]
+        unseen = [next(source) for _ in range(args.queries)]
+        duplicate_rate, duplicate_latency = time_lookups(index, duplicates)
+        unseen_rate, unseen_latency = time_lookups(index, unseen)
+        latencies = sorted(duplicate_latency + unseen_latency)
+
+        row = {
+            'entries': len(index),
+            'duplicate_hit_rate': round(duplicate_rate, 4),
+            # Unseen hashes can only match by chance; with --clustered some
+            # do land within range of a stored neighbour
+            'unseen_hit_rate': round(unseen_rate, 4),
+            'lookup_p50_us': round(percentile(latencies, 50) * 1e6, 2),
+            'lookup_p99_us': round(percentile(latencies, 99) * 1e6, 2),
+            'build_seconds': round(build, 3),
+            # ru_maxrss is in kilobytes on Linux
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        }
+        rows.append(row)
+        print(f"{row['entries']:>10} {row['duplicate_hit_rate']:>8} {row['unseen_hit_rate']:>8} "
+              f"{row['lookup_p50_us']:>8} {row['lookup_p99_us']:>8} {row['build_seconds']:>8} "
+              f"{row['peak_rss_mb']:>8}")
+
+    report = {'max_distance': args.max_distance, 'clustered': args.clustered,
+              'created': time.time(), 'results': rows}
+    output = args.output or os.path.join(RESULTS_DIR, f"phash-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""Text prefilter: skip rate, false skips and OCR latency saved.
+
+Scores a labeled sample set with prefilter.text_blocks. With --samples DIR
+the images come from DIR/text and DIR/no_text; otherwise a synthetic set
+is drawn: chat screenshots, documents, photos with captions or a small
+watermark, and hard cases - blurred photos of documents, grey text on a
+grey background, white text on a noisy photo - (text), and
+noise-textured photos, smooth product-style shots and object scenes (no
+text), each saved as PNG or JPEG.
+
+Reports, for each --min-blocks setting, the share of text-free images
+skipped and the share of text images wrongly skipped (a false skip
+loses their text), plus the scoring latency. Then starts the mock
+upstream and runs extract_text_from_bytes over the set with and without
+the prefilter to measure the OCR latency saved.
+
+    python benchmarks/bench_prefilter.py --count 200 --text-share 0.5
+    python benchmarks/bench_prefilter.py --samples ~/labeled-uploads
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+from load_test import percentile  # noqa: E402
+from prefilter import text_blocks  # noqa: E402
+
+WORDS = ('meet', 'me', 'at', 'the', 'station', 'my', 'number', 'is', 'new', 'address', 'happy', 'birthday',
+         'call', 'tomorrow', 'doctor', 'said', 'password', 'lol', 'see', 'you', 'tonight', 'thanks')
+SCREEN_SIZES = ((720, 1280), (1080, 2400), (1920, 1080), (1284, 2778), (1170, 2532))
+PHOTO_SIZES = ((1600, 1200), (1200, 1600), (2016, 1512), (1024, 1024))
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def encode(image, rng):
+    output = io.BytesIO()
+    if rng.random() < 0.5:
+        image.save(output, format='JPEG', quality=rng.randint(60, 95))
+    else:
+        image.save(output, format='PNG')
+    return output.getvalue()
+
+
+def photo(rng, size):
+    """A text-free photo-like image: fractal noise, shapes, blur and sensor noise"""
+    width, height = size
+    np_rng = np.random.default_rng(rng.randrange(1 << 30))
+    kind = rng.choice(('texture', 'smooth', 'scene'))
+    base = np.zeros((height, width, 3), dtype=np.float32)
+    octaves = (2, 4, 8, 16, 32, 64, 128) if kind == 'texture' else (2, 4, 8)
+    for octave in octaves:
+        noise = np_rng.random((octave, octave * width // height + 1, 3)).astype(np.float32)
+        layer = Image.fromarray((noise * 255).astype(np.uint8)).resize((width, height), Image.BICUBIC)
+        base += np.asarray(layer, dtype=np.float32) / len(octaves)
+    image = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8))
+    if kind != 'texture':
+        draw = ImageDraw.Draw(image)
+        for _ in range(rng.randint(2, 12) if kind == 'scene' else rng.randint(1, 3)):
+            x, y = rng.randrange(width), rng.randrange(height)
+            radius = rng.randint(width // 20, width // 3)
+            color = tuple(rng.randrange(256) for _ in range(3))
+            shape = draw.ellipse if rng.random() < 0.5 else draw.rectangle
+            shape((x - radius, y - radius, x + radius, y + radius), fill=color)
+        image = image.filter(ImageFilter.GaussianBlur(rng.uniform(1.0, 4.0)))
+    pixels = np.asarray(image, dtype=np.float32) + np_rng.normal(0, rng.uniform(2, 8), (height, width, 3))
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def screenshot(rng):
+    width, height = rng.choice(SCREEN_SIZES)
+    dark = rng.random() < 0.3
+    image = Image.new('RGB', (width, height), (18, 18, 18) if dark else (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    font_size = max(10, int(width / rng.uniform(25, 60)))
+    font = ImageFont.load_default(size=font_size)
+    y = rng.randint(10, 200)
+    while y < height - font_size * 2:
+        x = 20 if rng.random() < 0.5 else width // 3
+        if rng.random() < 0.5:
+            bubble = (0, 132, 255) if rng.random() < 0.5 else ((60, 60, 60) if dark else (230, 230, 230))
+            draw.rounded_rectangle((x - 10, y - 6, width - 20, y + font_size * 2 + 6), 12, fill=bubble)
+        draw.text((x, y), sentence(rng, rng.randint(2, 8)), font=font, fill=(230, 230, 230) if dark else (20, 20, 20))
+        y += font_size * rng.randint(2, 4)
+        if rng.random() < 0.1:
+            # A shared photo between messages
+            block = min(height - y, width // 2)
+            if block > 0:
+                image.paste(photo(rng, (width - 60, block)), (30, y))
+                y += block + 20
+    return image
+
+
+def document(rng):
+    image = Image.new('RGB', (1240, 1754), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=rng.randint(12, 22))
+    for y in range(100, 1650, rng.randint(24, 34)):
+        draw.text((100, y), sentence(rng, rng.randint(6, 14)), font=font, fill=(0, 0, 0))
+    return image
+
+
+def captioned(rng, size):
+    """A photo with a meme caption, a caption bar or a small watermark"""
+    image = photo(rng, size)
+    draw = ImageDraw.Draw(image)
+    width, height = size
+    style = rng.choice(('meme', 'bar', 'watermark'))
+    if style == 'watermark':
+        font = ImageFont.load_default(size=max(14, width // 60))
+        draw.text((width - width // 4, height - height // 12), '@' + rng.choice(WORDS) + '_' + rng.choice(WORDS),
+                  font=font, fill=(255, 255, 255))
+    elif style == 'bar':
+        font = ImageFont.load_default(size=max(16, width // 40))
+        draw.rectangle((0, height - height // 8, width, height), fill=(0, 0, 0))
+        draw.text((20, height - height // 10), sentence(rng, 6), font=font, fill=(255, 255, 255))
+    else:
+        font = ImageFont.load_default(size=max(24, width // 18))
+        draw.text((width // 12, height // 20), sentence(rng, 4).upper(), font=font, fill=(255, 255, 255),
+                  stroke_width=3, stroke_fill=(0, 0, 0))
+    return image, style
+
+
+def hard(rng):
+    """Text that is legible but faint: blurred, low contrast or on noise"""
+    kind = rng.choice(('blurred', 'low_contrast', 'noisy'))
+    if kind == 'blurred':
+        # A phone photo of a document, out of focus
+        image = Image.new('RGB', (3000, 4000), (235, 232, 225))
+        draw = ImageDraw.Draw(image)
+        font = ImageFont.load_default(size=rng.randint(50, 80))
+        for y in range(300, 3700, rng.randint(100, 130)):
+            draw.text((200, y), sentence(rng, rng.randint(4, 8)), font=font, fill=(30, 30, 30))
+        return image.filter(ImageFilter.GaussianBlur(rng.uniform(4, 8))), kind
+    if kind == 'low_contrast':
+        background = rng.randint(100, 200)
+        image = Image.new('RGB', (1080, 1920), (background,) * 3)
+        draw = ImageDraw.Draw(image)
+        font = ImageFont.load_default(size=rng.randint(28, 44))
+        for y in range(200, 1700, 90):
+            draw.text((60, y), sentence(rng, 4), font=font, fill=(background - 30,) * 3)
+        return image, kind
+    np_rng = np.random.default_rng(rng.randrange(1 << 30))
+    pixels = np.clip(np_rng.normal(110, rng.uniform(30, 50), (1200, 1600, 3)), 0, 255).astype(np.uint8)
+    image = Image.fromarray(pixels)
+    draw = ImageDraw.Draw(image)
+    draw.text((100, rng.randint(200, 1000)), sentence(rng, 3), font=ImageFont.load_default(size=rng.randint(40, 56)),
+              fill=(255, 255, 255))
+    return image, kind
+
+
+def synthetic_samples(count, text_share, seed):
+    rng = random.Random(seed)
+    samples = []
+    for index in range(count):
+        if rng.random() < text_share:
+            kind = rng.choice(('screenshot', 'screenshot', 'document', 'caption', 'hard'))
+            if kind == 'screenshot':
+                image = screenshot(rng)
+            elif kind == 'document':
+                image = document(rng)
+            elif kind == 'hard':
+                image, kind = hard(rng)
+            else:
+                image, kind = captioned(rng, rng.choice(PHOTO_SIZES))
+            samples.append((f'{kind}-{index}', True, encode(image, rng)))
+        else:
+            samples.append((f'photo-{index}', False, encode(photo(rng, rng.choice(PHOTO_SIZES)), rng)))
+    return samples
+
+
+def load_samples(directory):
+    samples = []
+    for label, has_text in (('text', True), ('no_text', False)):
+        for path in sorted(glob.glob(os.path.join(directory, label, '*'))):
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    samples.append((os.path.basename(path), has_text, f.read()))
+    if not samples:
+        raise SystemExit(f"No images under {directory}/text or {directory}/no_text")
+    return samples
+
+
+def sweep(scored, settings):
+    text = [score for _, has_text, score, _ in scored if has_text]
+    text_free = [score for _, has_text, score, _ in scored if not has_text]
+    rows = []
+    for min_blocks in settings:
+        skipped_text = sum(score < min_blocks for score in text)
+        skipped_free = sum(score < min_blocks for score in text_free)
+        rows.append({
+            'min_blocks': min_blocks,
+            'skip_rate': round((skipped_text + skipped_free) / len(scored), 4),
+            'text_free_skipped': round(skipped_free / len(text_free), 4) if text_free else None,
+            'false_skip_rate': round(skipped_text / len(text), 4) if text else None
+        })
+    return rows
+
+
+def ocr_latency(samples, latency, min_blocks, concurrency):
+    """Mean extract_text_from_bytes latency with and without the prefilter"""
+    import app
+    from prefilter import TextPrefilter
+
+    def run(prefilter):
+        app.OCR_PREFILTER = prefilter
+        app.OCR_CACHE.clear()
+        app.OCR_INDEX = None
+
+        def one(sample):
+            started = time.perf_counter()
+            app.extract_text_from_bytes(sample[2])
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(one, samples))
+        return round(sum(latencies) / len(latencies), 4)
+
+    prefilter = TextPrefilter(min_blocks=min_blocks)
+    return {'mock_latency_s': latency, 'without_prefilter_s': run(None),
+            'with_prefilter_s': run(prefilter), 'prefilter': prefilter.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', help='directory with text/ and no_text/ subdirectories of labeled images')
+    parser.add_argument('--count', type=int, default=200, help='synthetic samples to draw')
+    parser.add_argument('--text-share', type=float, default=0.5, help='share of synthetic samples with text')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--min-blocks', type=int, nargs='+', default=[1, 2, 3, 4, 6, 8],
+                        help='settings to sweep; the first of them at least 2 is used for the OCR run')
+    parser.add_argument('--latency-mean', type=float, default=1.0, help='mock upstream latency per call in seconds')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--port', type=int, default=8490)
+    parser.add_argument('--output', help='where to save the JSON report')
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples) if args.samples else synthetic_samples(args.count, args.text_share, args.seed)
+    scored = []
+    for name, has_text, data in samples:
+        started = time.perf_counter()
+        score = text_blocks(data)
+        # Undecodable images are never skipped
+        scored.append((name, has_text, score if score is not None else float('inf'), time.perf_counter() - started))
+    seconds = sorted(elapsed for *_, elapsed in scored)
+    results = {
+        'samples': len(samples),
+        'text_samples': sum(has_text for _, has_text, _ in samples),
+        'score_ms': {'p50': round(1000 * percentile(seconds, 50), 2), 'p99': round(1000 * percentile(seconds, 99), 2)},
+        'sweep': sweep(scored, args.min_blocks),
+        'lowest_text_scores': sorted((score, name) for name, has_text, score, _ in scored if has_text)[:5],
+        'highest_text_free_scores': sorted((score, name) for name, has_text, score, _ in scored if not has_text)[-5:]
+    }
+
+    min_blocks = next((value for value in args.min_blocks if value >= 2), args.min_blocks[0])
+    mock = subprocess.Popen([sys.executable, os.path.join(ROOT, 'benchmarks', 'mock_openrouter.py'),
+                             '--port', str(args.port), '--latency', 'fixed',
+                             '--latency-mean', str(args.latency_mean)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ.update(OPENROUTER_API_URL=f'http://127.0.0.1:{args.port}/api/v1/chat/completions',
+                      OPENROUTER_RPM='0', OPENROUTER_CONCURRENCY='1000', OCR_CACHE_PATH='',
+                      LOG_LEVEL='WARNING')
+    try:
+        time.sleep(1)
+        results['ocr'] = ocr_latency(samples, args.latency_mean, min_blocks, args.concurrency)
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    print(f"{results['samples']} samples ({results['text_samples']} with text); scoring p50 "
+          f"{results['score_ms']['p50']}ms p99 {results['score_ms']['p99']}ms")
+    print(f"{'min blocks':>10} {'skipped':>8} {'no-text skipped':>16} {'false skips':>12}")
+    for row in results['sweep']:
+        print(f"{row['min_blocks']:>10} {row['skip_rate']:>8.1%} {row['text_free_skipped']:>16.1%} "
+              f"{row['false_skip_rate']:>12.1%}")
+    print(f"lowest text scores: {results['lowest_text_scores']}")
+    print(f"highest text-free scores: {results['highest_text_free_scores']}")
+    ocr = results['ocr']
+    print(f"OCR latency per image with min_blocks {min_blocks}: {ocr['without_prefilter_s']}s without, "
+          f"{ocr['with_prefilter_s']}s with the prefilter ({ocr['prefilter']['skip_rate']:.1%} skipped)")
+
+    report = {'args': vars(args), 'created': time.time(), 'results': results}
+    output = args.output or os.path.join(RESULTS_DIR, f"prefilter-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Latency of the three ways to produce risk scenarios.
+
+Compares, over findings covering every category combination:
+  * fallback-build: build_fallback_scenarios, the per-call pool builder
+  * local: local_risk_scenarios, the precomputed SCENARIO_MODE=local path
+  * model: request_risk_scenarios, a full upstream round trip
+
+The model calls go to OPENROUTER_API_URL, so point it at
+benchmarks/mock_openrouter.py (with a realistic --latency-mean) or at the
+real API. --model-calls 0 skips them.
+
+    python benchmarks/bench_scenarios.py --model-calls 20
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import app  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def findings_for(mask):
+    """detected_data with one finding in each category of the mask"""
+    detected_data = {category: [] for category in app.SCENARIO_CATEGORIES}
+    for bit, category in enumerate(app.SCENARIO_CATEGORIES):
+        if mask & (1 << bit):
+            label = next((label for cat, label, _ in app.FINDING_SCENARIOS if cat == category),
+                         f'Potential {category} information')
+            detected_data[category].append(label)
+    return detected_data
+
+
+def measure(fn, inputs, repeat):
+    samples = []
+    for _ in range(repeat):
+        for detected_data in inputs:
+            started = time.perf_counter()
+            fn(detected_data)
+            samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {
+        'calls': len(samples),
+        'p50_us': round(samples[len(samples) // 2] * 1e6, 3),
+        'p99_us': round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6, 3),
+        'mean_us': round(sum(samples) / len(samples) * 1e6, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000, help='passes over all 31 combinations')
+    parser.add_argument('--model-calls', type=int, default=10, help='upstream calls to time; 0 skips the model')
+    parser.add_argument('--output', help='where to save the JSON report')
+    args = parser.parse_args()
+
+    inputs = [findings_for(mask) for mask in range(1, 1 << len(app.SCENARIO_CATEGORIES))]
+    results = {
+        'fallback-build': measure(app.build_fallback_scenarios, inputs, args.repeat),
+        'local': measure(app.local_risk_scenarios, inputs, args.repeat)
+    }
+    if args.model_calls:
+        text = 'My email is on my profile and my card number is in the screenshot.'
+        results['model'] = measure(lambda detected_data: app.request_risk_scenarios(detected_data, text),
+                                   inputs[:args.model_calls], 1)
+
+    local = results['local']['mean_us']
+    for name, result in results.items():
+        print(f"{name:>15}: p50 {result['p50_us']:>12} us  p99 {result['p99_us']:>12} us  "
+              f"({result['mean_us'] / local:.0f}x local)")
+
+    report = {'created': time.time(), 'results': results}
+    output = args.output or os.path.join(RESULTS_DIR, f"scenarios-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Tiled OCR of tall screenshots: stitching accuracy and wall time.
+
+Stitching: a synthetic chat export of --lines lines is cut into strips
+with the app's tile settings. Each strip "reads" the lines it fully
+contains, plus a garbled fragment of any line cut by its top or bottom
+edge, as a vision model would. Reports lines lost and lines duplicated
+after stitch_text.
+
+Wall time: starts the mock upstream with a fixed latency and reads a tall
+image through request_text_extraction, once in a single call and once in
+strips, against one call for a single strip. With enough upstream
+concurrency the tiled read should take about as long as one strip.
+
+    python benchmarks/bench_tiles.py --height 12000 --latency-mean 1.0
+"""
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+LINE_HEIGHT = 40
+WORDS = ('hey', 'are', 'you', 'coming', 'tonight', 'call', 'me', 'at', 'the', 'new', 'place',
+         'bring', 'snacks', 'my', 'number', 'changed', 'see', 'lol', 'ok', 'thanks', 'tomorrow')
+
+
+def chat_lines(count, seed):
+    rng = random.Random(seed)
+    speakers = ('Alice', 'Bob', 'Carol')
+    return [f"{rng.choice(speakers)}: {' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 9)))}"
+            for _ in range(count)]
+
+
+def read_strip(lines, top, bottom):
+    """Text a model would return for the rows top..bottom of the export"""
+    seen = []
+    for index, line in enumerate(lines):
+        line_top, line_bottom = index * LINE_HEIGHT, (index + 1) * LINE_HEIGHT
+        if line_top >= top and line_bottom <= bottom:
+            seen.append(line)
+        elif line_top < bottom < line_bottom or line_top < top < line_bottom:
+            # A line cut by the strip's edge is misread
+            seen.append(line[:len(line) // 3] + '~')
+    return '\n'.join(seen)
+
+
+def stitching(args):
+    from config import OCR_TILE_HEIGHT, OCR_TILE_MAX_TILES, OCR_TILE_OVERLAP
+    from tiles import stitch_text, tile_bounds
+
+    lost = duplicated = strips = 0
+    for seed in range(args.trials):
+        lines = chat_lines(args.lines, seed)
+        bounds = tile_bounds(len(lines) * LINE_HEIGHT, OCR_TILE_HEIGHT, OCR_TILE_OVERLAP, OCR_TILE_MAX_TILES)
+        strips += len(bounds)
+        stitched = stitch_text([read_strip(lines, top, bottom) for top, bottom in bounds]).splitlines()
+        whole = [line for line in stitched if not line.endswith('~')]
+        # Chat lines repeat, so compare counts rather than sets
+        for line in set(lines):
+            expected, found = lines.count(line), whole.count(line)
+            lost += max(0, expected - found)
+            duplicated += max(0, found - expected)
+    return {'trials': args.trials, 'lines': args.lines, 'strips_per_image': strips / args.trials,
+            'lines_lost': lost, 'lines_duplicated': duplicated}
+
+
+def tall_image(width, height):
+    from PIL import Image, ImageDraw
+
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    for index, line in enumerate(chat_lines(height // LINE_HEIGHT, 0)):
+        draw.text((20, index * LINE_HEIGHT + 10), line, fill='black')
+    output = io.BytesIO()
+    image.save(output, format='PNG')
+    return output.getvalue()
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3)
+
+
+def wall_time(args):
+    import app
+
+    image = tall_image(args.width, args.height)
+    tiles = app.prepare_ocr_tiles(image)
+    results = {'image': f'{args.width}x{args.height}', 'strips': len(tiles),
+               'single_strip_s': timed(lambda: app.request_ocr(*tiles[0]), args.repeat),
+               'tiled_s': timed(lambda: app.request_text_extraction(image), args.repeat)}
+    app.OCR_TILE_ENABLED = False
+    results['one_call_s'] = timed(lambda: app.request_text_extraction(image), args.repeat)
+    results['tiled_over_single_strip'] = round(results['tiled_s'] / results['single_strip_s'], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=400, help='lines per synthetic chat export')
+    parser.add_argument('--trials', type=int, default=50)
+    parser.add_argument('--width', type=int, default=1080)
+    parser.add_argument('--height', type=int, default=12000)
+    parser.add_argument('--latency-mean', type=float, default=1.0, help='mock upstream latency per call in seconds')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs; the fastest is reported')
+    parser.add_argument('--port', type=int, default=8390)
+    parser.add_argument('--output', help='where to save the JSON report')
+    args = parser.parse_args()
+
+    mock = subprocess.Popen([sys.executable, os.path.join(ROOT, 'benchmarks', 'mock_openrouter.py'),
+                             '--port', str(args.port), '--latency', 'fixed',
+                             '--latency-mean', str(args.latency_mean)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ.update(OPENROUTER_API_URL=f'http://127.0.0.1:{args.port}/api/v1/chat/completions',
+                      OPENROUTER_RPM='0', OPENROUTER_CONCURRENCY='1000', OCR_TILE_ENABLED='1',
+                      LOG_LEVEL='WARNING')
+    try:
+        results = {'stitching': stitching(args)}
+        time.sleep(1)
+        results['wall_time'] = wall_time(args)
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    stitched = results['stitching']
+    print(f"stitching: {stitched['trials']} exports of {stitched['lines']} lines in "
+          f"{stitched['strips_per_image']:.1f} strips: {stitched['lines_lost']} lines lost, "
+          f"{stitched['lines_duplicated']} duplicated")
+    wall = results['wall_time']
+    print(f"wall time ({wall['image']}, {wall['strips']} strips): one strip {wall['single_strip_s']}s, "
+          f"tiled {wall['tiled_s']}s ({wall['tiled_over_single_strip']}x), whole image in one call "
+          f"{wall['one_call_s']}s")
+
+    report = {'args': vars(args), 'created': time.time(), 'results': results}
+    output = args.output or os.path.join(RESULTS_DIR, f"tiles-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Open-loop load generator for /analyze.
+
+Sends sample images at a target rate for a fixed duration and reports
+throughput, p50/p95/p99 latency and the error breakdown. Each run is
+saved as JSON so server configurations can be compared.
+
+    python benchmarks/load_test.py --url http://127.0.0.1:5000/analyze \\
+        --images samples/ --rps 20 --duration 60 --label gunicorn-4w
+
+Without --images, small synthetic PNGs are used. --bust-cache appends
+random trailing bytes to every upload so the OCR cache never hits.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def synthetic_png(seed, width=64, height=64):
+    """Return a small valid PNG with seeded noise"""
+    rng = random.Random(seed)
+    rows = b''.join(b'\x00' + bytes(rng.randrange(256) for _ in range(width * 3)) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b'')
+
+
+def load_samples(pattern):
+    if not pattern:
+        return [(f'synthetic-{i}.png', synthetic_png(i)) for i in range(8)]
+    paths = glob.glob(os.path.join(pattern, '*')) if os.path.isdir(pattern) else glob.glob(pattern)
+    samples = []
+    for path in sorted(paths):
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                samples.append((os.path.basename(path), f.read()))
+    if not samples:
+        raise SystemExit(f"No images found for {pattern}")
+    return samples
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class LoadRun:
+    def __init__(self, url, samples, timeout, bust_cache):
+        self.url = url
+        self.samples = samples
+        self.timeout = timeout
+        self.bust_cache = bust_cache
+        self.session = requests.Session()
+        self.results = []
+        self.lock = threading.Lock()
+
+    def send(self, index, scheduled):
+        filename, data = self.samples[index % len(self.samples)]
+        if self.bust_cache:
+            data = data + os.urandom(16)
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.url, files={'image': (filename, data)}, timeout=self.timeout)
+            outcome = str(response.status_code)
+            if response.status_code == 200 and not response.json().get('success', True):
+                outcome = 'app-error'
+        except requests.Timeout:
+            outcome = 'timeout'
+        except requests.RequestException as e:
+            outcome = type(e).__name__
+        finished = time.perf_counter()
+        with self.lock:
+            self.results.append({
+                'outcome': outcome,
+                'latency': finished - started,
+                # Time the request waited for a free client thread
+                'lag': started - scheduled
+            })
+
+    def run(self, rps, duration, concurrency):
+        total = int(rps * duration)
+        interval = 1.0 / rps
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            started = time.perf_counter()
+            for index in range(total):
+                scheduled = started + index * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self.send, index, scheduled)
+        return time.perf_counter() - started
+
+
+def summarize(results, elapsed, rps, duration):
+    latencies = sorted(r['latency'] for r in results if r['outcome'] == '200')
+    outcomes = {}
+    for r in results:
+        outcomes[r['outcome']] = outcomes.get(r['outcome'], 0) + 1
+    lags = sorted(r['lag'] for r in results)
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        'target_rps': rps,
+        'duration': duration,
+        'elapsed': round(elapsed, 3),
+        'requests': len(results),
+        'succeeded': len(latencies),
+        'throughput_rps': round(len(latencies) / elapsed, 3) if elapsed else 0,
+        'latency_ms': {
+            'p50': ms(percentile(latencies, 50)),
+            'p95': ms(percentile(latencies, 95)),
+            'p99': ms(percentile(latencies, 99)),
+            'max': ms(latencies[-1] if latencies else None)
+        },
+        'client_lag_p99_ms': ms(percentile(lags, 99)),
+        'outcomes': outcomes
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000/analyze')
+    parser.add_argument('--images', help='directory or glob of sample images')
+    parser.add_argument('--rps', type=float, default=5.0, help='target requests per second')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to send requests for')
+    parser.add_argument('--concurrency', type=int, default=200, help='maximum requests in flight')
+    parser.add_argument('--timeout', type=float, default=120.0, help='per-request timeout in seconds')
+    parser.add_argument('--bust-cache', action='store_true', help='make every upload unique')
+    parser.add_argument('--label', default='run', help='name for this server configuration')
+    parser.add_argument('--output', help='where to save the JSON report')
+    args = parser.parse_args()
+
+    load = LoadRun(args.url, load_samples(args.images), args.timeout, args.bust_cache)
+    print(f"Sending {int(args.rps * args.duration)} requests to {args.url} at {args.rps} rps...")
+    elapsed = load.run(args.rps, args.duration, args.concurrency)
+    summary = summarize(load.results, elapsed, args.rps, args.duration)
+
+    latency = summary['latency_ms']
+    print(f"throughput: {summary['throughput_rps']} rps ({summary['succeeded']}/{summary['requests']} ok)")
+    print(f"latency ms: p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} max={latency['max']}")
+    print(f"outcomes:   {summary['outcomes']}")
+
+    report = {'label': args.label, 'url': args.url, 'created': time.time(), 'summary': summary}
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{args.label}-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {output}")
+
+
+if __name__ == '__main__':
+    main()
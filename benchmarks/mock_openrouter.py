@@ -0,0 +1,177 @@
+"""Local stand-in for the OpenRouter chat completions API.
+
+Point the app at it with OPENROUTER_API_URL to load-test /analyze without
+spending real quota:
+
+    python benchmarks/mock_openrouter.py --port 8090 --latency lognormal \\
+        --latency-mean 1.5 --error-rate 0.02 --rate-limit-rate 0.05
+    OPENROUTER_API_URL=http://127.0.0.1:8090/api/v1/chat/completions python app.py
+
+Set OPENROUTER_RPM=0 as well to measure the app without the upstream
+scheduler's rate limit.
+
+Requests with an image get canned OCR text; text-only requests get three
+numbered risk scenarios. "stream": true is answered with SSE chunks.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OCR_TEXT = ("Happy birthday to me! Call me on my mobile 555-0100 or email jane@gmail.com. "
+            "New address: 12 Elm Street. My doctor says the prescription is ready.")
+SCENARIOS_TEXT = (
+    "1. 🆔 Identity thieves could use your birthday and email to reset account passwords.\n"
+    "2. 📍 Your street address could let strangers find your home.\n"
+    "3. 🏥 Your medical details could be used for targeted health scams."
+)
+
+
+class MockConfig:
+    def __init__(self, args):
+        self.latency = args.latency
+        self.latency_mean = args.latency_mean
+        self.latency_sigma = args.latency_sigma
+        self.error_rate = args.error_rate
+        self.rate_limit_rate = args.rate_limit_rate
+        self.retry_after = args.retry_after
+        self.stream_chunks = args.stream_chunks
+        self.ocr_text = args.ocr_text
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def sample_latency(self):
+        mean = self.latency_mean
+        if self.latency == 'fixed':
+            return mean
+        if self.latency == 'uniform':
+            return random.uniform(0, 2 * mean)
+        if self.latency == 'exponential':
+            return random.expovariate(1 / mean) if mean > 0 else 0
+        # Lognormal with the requested mean gives the long tail seen upstream
+        sigma = self.latency_sigma
+        return random.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma) if mean > 0 else 0
+
+    def count(self, outcome):
+        with self.lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body, headers=None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            with config.lock:
+                counts = dict(config.counts)
+            self.send_json(200, {'counts': counts})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                config.count('400')
+                self.send_json(400, {'error': {'message': 'Invalid JSON'}})
+                return
+
+            roll = random.random()
+            if roll < config.rate_limit_rate:
+                config.count('429')
+                self.send_json(429, {'error': {'message': 'Rate limit exceeded'}},
+                               {'Retry-After': str(config.retry_after)})
+                return
+            if roll < config.rate_limit_rate + config.error_rate:
+                config.count('500')
+                self.send_json(500, {'error': {'message': 'Upstream error'}})
+                return
+
+            content = payload.get('messages', [{}])[0].get('content')
+            has_image = isinstance(content, list) and any(
+                part.get('type') == 'image_url' for part in content)
+            text = config.ocr_text if has_image else SCENARIOS_TEXT
+            latency = config.sample_latency()
+
+            if payload.get('stream'):
+                config.count('200-stream')
+                self.stream(text, latency)
+                return
+
+            time.sleep(latency)
+            config.count('200')
+            self.send_json(200, {
+                'id': 'mock',
+                'model': payload.get('model'),
+                'choices': [{'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': length // 4, 'completion_tokens': len(text) // 4}
+            })
+
+        def stream(self, text, latency):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            words = text.split(' ')
+            step = max(1, len(words) // config.stream_chunks)
+            pieces = [' '.join(words[i:i + step]) + ' ' for i in range(0, len(words), step)]
+            delay = latency / max(1, len(pieces))
+            try:
+                for piece in pieces:
+                    time.sleep(delay)
+                    event = {'choices': [{'delta': {'content': piece}}]}
+                    self.write_chunk(b'data: ' + json.dumps(event).encode('utf-8') + b'\n\n')
+                self.write_chunk(b'data: [DONE]\n\n')
+                self.wfile.write(b'0\r\n\r\n')
+            except (BrokenPipeError, ConnectionResetError):
+                config.count('stream-cancelled')
+
+        def write_chunk(self, data):
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            self.wfile.flush()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', choices=['fixed', 'uniform', 'exponential', 'lognormal'], default='lognormal')
+    parser.add_argument('--latency-mean', type=float, default=1.0, help='mean response latency in seconds')
+    parser.add_argument('--latency-sigma', type=float, default=0.8, help='lognormal shape; higher is a longer tail')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--stream-chunks', type=int, default=20, help='SSE chunks per streamed completion')
+    parser.add_argument('--ocr-text', default=OCR_TEXT, help='text returned for image requests')
+    args = parser.parse_args()
+
+    # The default listen backlog of 5 drops connections from bursty clients
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(MockConfig(args)))
+    server.daemon_threads = True
+    print(f"Mock OpenRouter listening on http://{args.host}:{args.port}/api/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Compare peak memory of the /analyze upload path before and after the
+zero-disk change.
+
+The "before" path mirrors the original route: save the upload to the
+uploads folder, read it back, base64-encode it to a str, format the data
+URL and let requests JSON-serialize the payload. The "after" path reads
+the upload stream once and splices the base64 bytes into the JSON body.
+Neither path sends anything over the network.
+
+Usage: python benchmarks/upload_memory.py [size_mb ...]
+"""
+import base64
+import io
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import build_ocr_request_body, read_upload, MODEL_NAME  # noqa: E402
+from config import OCR_PROMPT  # noqa: E402
+
+
+class FakeUpload:
+    """Stand-in for a Werkzeug FileStorage backed by an in-memory stream"""
+
+    def __init__(self, data, filename='upload.png'):
+        self.stream = io.BytesIO(data)
+        self.filename = filename
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.stream.read())
+
+
+def legacy_path(upload, folder):
+    path = os.path.join(folder, upload.filename)
+    upload.save(path)
+    with open(path, 'rb') as image_file:
+        base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+    payload = {
+        "model": MODEL_NAME,
+        "messages": [{"role": "user", "content": [
+            {"type": "text", "text": OCR_PROMPT},
+            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+        ]}],
+        "max_tokens": 1000
+    }
+    # What requests does with json=payload
+    body = json.dumps(payload, allow_nan=False).encode('utf-8')
+    os.remove(path)
+    return len(body)
+
+
+def zero_disk_path(upload):
+    return len(build_ocr_request_body(read_upload(upload)))
+
+
+def peak_bytes(fn, *args):
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    sizes = [float(arg) for arg in sys.argv[1:]] or [1, 4, 16]
+    print(f"{'size':>8} {'before':>12} {'after':>12} {'ratio':>7}")
+    with tempfile.TemporaryDirectory() as folder:
+        for size_mb in sizes:
+            data = os.urandom(int(size_mb * 1024 * 1024))
+            # The upload buffer itself is allocated before tracing starts
+            before = peak_bytes(legacy_path, FakeUpload(data), folder)
+            after = peak_bytes(zero_disk_path, FakeUpload(data))
+            print(f"{size_mb:>6.1f}MB {before / 2**20:>10.1f}MB {after / 2**20:>10.1f}MB "
+                  f"{before / after:>6.2f}x")
+
+
+if __name__ == '__main__':
+    main()
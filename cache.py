@@ -0,0 +1,234 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class DiskCache:
+    """SQLite-backed cache tier with TTL and size-based eviction"""
+
+    def __init__(self, path, max_entries=10000, ttl_seconds=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL, cost REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        """Return (value, cost) or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created, cost FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                return None
+            self._conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return json.loads(row[0]), row[2]
+
+    def set(self, key, value, cost=0.0):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created, accessed, cost) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value), now, now, cost)
+            )
+            if self.ttl_seconds is not None:
+                expired = self._conn.execute(
+                    "DELETE FROM cache WHERE created < ?", (now - self.ttl_seconds,)
+                ).rowcount
+                self.evictions += max(expired, 0)
+            count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                self.evictions += count - self.max_entries
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class _Pending:
+    """A computation in flight that other callers can wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """Bounded in-memory LRU cache with TTL, an optional disk tier and
+    coalescing of concurrent misses for the same key.
+
+    Each entry remembers how long it took to compute, so hits can report
+    the seconds of upstream latency they saved.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=None, disk=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk = disk
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.seconds_saved = 0.0
+
+    def _get_locked(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, created, cost = entry
+        if self.ttl_seconds is not None and now - created > self.ttl_seconds:
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return value, cost
+
+    def _set_locked(self, key, value, cost, now):
+        self._entries[key] = (value, now, cost)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default"""
+        now = time.time()
+        with self._lock:
+            found = self._get_locked(key, now)
+            if found is not None:
+                self.hits += 1
+                self.seconds_saved += found[1]
+                return found[0]
+        if self.disk is not None:
+            found = self.disk.get(key)
+            if found is not None:
+                with self._lock:
+                    self._set_locked(key, found[0], found[1], now)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self.seconds_saved += found[1]
+                return found[0]
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def set(self, key, value, cost=0.0):
+        with self._lock:
+            self._set_locked(key, value, cost, time.time())
+        if self.disk is not None:
+            self.disk.set(key, value, cost)
+
+    def get_or_compute(self, key, compute):
+        """Return (value, hit) for key, calling compute() on a miss.
+
+        Concurrent callers that miss on the same key wait for the first
+        caller's result instead of computing it again. Errors are raised
+        to every waiting caller and are not cached.
+        """
+        now = time.time()
+        with self._lock:
+            found = self._get_locked(key, now)
+            if found is not None:
+                self.hits += 1
+                self.seconds_saved += found[1]
+                return found[0], True
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = _Pending()
+                self._pending[key] = pending
+            else:
+                self.coalesced += 1
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value, True
+
+        try:
+            found = self.disk.get(key) if self.disk is not None else None
+            if found is not None:
+                value, hit = found[0], True
+                with self._lock:
+                    self._set_locked(key, value, found[1], time.time())
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self.seconds_saved += found[1]
+            else:
+                with self._lock:
+                    self.misses += 1
+                started = time.time()
+                value, hit = compute(), False
+                self.set(key, value, time.time() - started)
+            pending.value = value
+            return value, hit
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.event.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        """Return hit, miss and eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions + (self.disk.evictions if self.disk else 0),
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'seconds_saved': round(self.seconds_saved, 3)
+            }
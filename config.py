@@ -5,7 +5,7 @@ load_dotenv()
 
 # API Configuration
 OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_API_URL = os.getenv('OPENROUTER_API_URL', "https://openrouter.ai/api/v1/chat/completions")
 
 # File upload configuration
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
@@ -33,4 +33,146 @@ Please provide your analysis in the following JSON format:
     "risk_explanation": "Detailed explanation of risks",
     "recommendations": []
 }
-"""
\ No newline at end of file
+"""
+
+# Privacy score penalties: per finding in these categories, plus a flat
+# penalty for every finding. Shared by the per-request and bulk scorers.
+CATEGORY_PENALTIES = {'financial_info': 20, 'medical_info': 15, 'personal_identifiers': 10}
+FINDING_PENALTY = 5
+# Scores at or above these are low and medium risk; anything lower is high
+LOW_RISK_MIN_SCORE = 80
+MEDIUM_RISK_MIN_SCORE = 50
+
+# OCR prompt
+OCR_PROMPT = "Extract all text from this image accurately. Return only the extracted text without any additional commentary or analysis."
+
+# OCR result cache, keyed by image SHA-256, model and prompt
+OCR_CACHE_MAX_ENTRIES = int(os.getenv('OCR_CACHE_MAX_ENTRIES', '256'))
+OCR_CACHE_TTL_SECONDS = float(os.getenv('OCR_CACHE_TTL_SECONDS', '86400'))
+# Leave empty to keep the cache in memory only
+OCR_CACHE_PATH = os.getenv('OCR_CACHE_PATH', '')
+OCR_CACHE_DISK_MAX_ENTRIES = int(os.getenv('OCR_CACHE_DISK_MAX_ENTRIES', '10000'))
+
+# Risk scenario cache, keyed by the detected categories and keywords and
+# a hash of the text quoted in the scenario prompt, so scenarios written
+# about one upload are never shown for another
+SCENARIO_CACHE_ENABLED = os.getenv('SCENARIO_CACHE_ENABLED', '0') == '1'
+SCENARIO_CACHE_MAX_ENTRIES = int(os.getenv('SCENARIO_CACHE_MAX_ENTRIES', '512'))
+SCENARIO_CACHE_TTL_SECONDS = float(os.getenv('SCENARIO_CACHE_TTL_SECONDS', '86400'))
+# Characters of extracted text quoted in the scenario prompt; longer texts
+# are cut with a note saying how much was left out
+SCENARIO_TEXT_MAX_CHARS = int(os.getenv('SCENARIO_TEXT_MAX_CHARS', '4000'))
+
+# Shared OpenRouter HTTP client
+OPENROUTER_POOL_SIZE = int(os.getenv('OPENROUTER_POOL_SIZE', '10'))
+OPENROUTER_CONNECT_TIMEOUT = float(os.getenv('OPENROUTER_CONNECT_TIMEOUT', '5'))
+OPENROUTER_READ_TIMEOUT = float(os.getenv('OPENROUTER_READ_TIMEOUT', '60'))
+OPENROUTER_MAX_RETRIES = int(os.getenv('OPENROUTER_MAX_RETRIES', '2'))
+OPENROUTER_BACKOFF_BASE = float(os.getenv('OPENROUTER_BACKOFF_BASE', '0.5'))
+OPENROUTER_BACKOFF_MAX = float(os.getenv('OPENROUTER_BACKOFF_MAX', '10'))
+# Ceiling on a server's Retry-After, which is honored beyond BACKOFF_MAX
+OPENROUTER_RETRY_AFTER_MAX = float(os.getenv('OPENROUTER_RETRY_AFTER_MAX', '300'))
+
+# Upstream scheduler: requests per minute (0 disables the rate limit),
+# burst size and concurrent calls allowed to the model
+OPENROUTER_RPM = float(os.getenv('OPENROUTER_RPM', '20'))
+OPENROUTER_BURST = int(os.getenv('OPENROUTER_BURST', '5'))
+OPENROUTER_CONCURRENCY = int(os.getenv('OPENROUTER_CONCURRENCY', '4'))
+# Interactive requests fail fast with 503 rather than queue longer than
+# this many seconds for the model; batch work waits as long as it takes
+SCHEDULER_MAX_WAIT_SECONDS = float(os.getenv('SCHEDULER_MAX_WAIT_SECONDS', '30'))
+
+# Asynchronous analysis jobs (/analyze?async=1)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', '32'))
+JOB_RESULT_TTL_SECONDS = float(os.getenv('JOB_RESULT_TTL_SECONDS', '600'))
+JOB_MAX_WAIT_SECONDS = float(os.getenv('JOB_MAX_WAIT_SECONDS', '30'))
+
+# Batch analysis (/analyze/batch)
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '4'))
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '500'))
+BATCH_MAX_ARCHIVE_BYTES = int(os.getenv('BATCH_MAX_ARCHIVE_BYTES', str(256 * 1024 * 1024)))
+
+# Largest single image accepted by /analyze
+UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# Image pre-processing before OCR
+OCR_PREPROCESS = os.getenv('OCR_PREPROCESS', '1') == '1'
+# Longest side in pixels after downscaling; text stays legible for the model
+OCR_MAX_SIDE = int(os.getenv('OCR_MAX_SIDE', '2048'))
+OCR_GRAYSCALE = os.getenv('OCR_GRAYSCALE', '0') == '1'
+OCR_JPEG_QUALITY = int(os.getenv('OCR_JPEG_QUALITY', '85'))
+
+# Tiled OCR for long screenshots and chat exports: images taller than
+# OCR_TILE_MIN_HEIGHT pixels, or more than OCR_TILE_MIN_ASPECT times as
+# tall as wide, are cut into strips of about OCR_TILE_HEIGHT pixels that
+# overlap by OCR_TILE_OVERLAP and are read concurrently. Images needing
+# more than OCR_TILE_MAX_TILES strips get taller strips instead
+OCR_TILE_ENABLED = os.getenv('OCR_TILE_ENABLED', '1') == '1'
+OCR_TILE_MIN_HEIGHT = int(os.getenv('OCR_TILE_MIN_HEIGHT', '4000'))
+OCR_TILE_MIN_ASPECT = float(os.getenv('OCR_TILE_MIN_ASPECT', '2.5'))
+OCR_TILE_HEIGHT = int(os.getenv('OCR_TILE_HEIGHT', '1600'))
+OCR_TILE_OVERLAP = int(os.getenv('OCR_TILE_OVERLAP', '160'))
+OCR_TILE_MAX_TILES = int(os.getenv('OCR_TILE_MAX_TILES', '16'))
+
+# Text prefilter: images with fewer than OCR_PREFILTER_MIN_BLOCKS
+# text-like 16x16 blocks (after scaling the short side to 768 pixels) are
+# taken to have no text and skip OCR. Edges are measured against each
+# block's own contrast, so faint or blurred text still counts; only plain
+# or smooth images score below 2. A skip can still miss text, so the
+# prefilter is off by default and its skips are never cached
+OCR_PREFILTER_ENABLED = os.getenv('OCR_PREFILTER_ENABLED', '0') == '1'
+OCR_PREFILTER_MIN_BLOCKS = int(os.getenv('OCR_PREFILTER_MIN_BLOCKS', '2'))
+
+# Logging: 'json' writes one JSON object per line, 'text' is human readable
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+
+# Per-request profiling (/analyze with an X-Profile-Token header or
+# ?profile=<token>); disabled unless a token is set
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_TOP_N = int(os.getenv('PROFILE_TOP_N', '25'))
+# Directory for raw .prof files; empty keeps profiles in the response only
+PROFILE_DIR = os.getenv('PROFILE_DIR', '')
+
+# Token for POST /cache/clear (X-Admin-Token header); the endpoint is
+# disabled unless a token is set
+CACHE_ADMIN_TOKEN = os.getenv('CACHE_ADMIN_TOKEN', '')
+
+# Analysis mode: 'local' scores with the keyword detector only, 'cascade'
+# escalates ambiguous texts to the LLM structured analysis
+ANALYSIS_MODE = os.getenv('ANALYSIS_MODE', 'local')
+# Privacy scores in this inclusive range are escalated in cascade mode
+CASCADE_UNCERTAIN_MIN = int(os.getenv('CASCADE_UNCERTAIN_MIN', '40'))
+CASCADE_UNCERTAIN_MAX = int(os.getenv('CASCADE_UNCERTAIN_MAX', '85'))
+# Categories that are always escalated when found (comma separated)
+CASCADE_TRIGGER_CATEGORIES = [c.strip() for c in os.getenv('CASCADE_TRIGGER_CATEGORIES', 'medical_info').split(',') if c.strip()]
+
+# Near-duplicate OCR reuse: images whose 16x16 difference hashes differ in
+# at most OCR_PHASH_MAX_DISTANCE of 256 bits are candidates, but text is
+# only reused for a copy of the same size, read with the same OCR
+# settings, whose grayscale pixels (short side scaled to 540) differ by at
+# most OCR_PHASH_MAX_PIXEL_DISTANCE levels in every 4x4 tile. Re-compressed
+# and re-saved copies stay under 14; a changed digit scores over 40.
+# Resized copies are read again. Each entry keeps a compressed copy of
+# those pixels, tens of KB for a screenshot
+OCR_PHASH_ENABLED = os.getenv('OCR_PHASH_ENABLED', '0') == '1'
+OCR_PHASH_MAX_DISTANCE = int(os.getenv('OCR_PHASH_MAX_DISTANCE', '6'))
+OCR_PHASH_MAX_PIXEL_DISTANCE = float(os.getenv('OCR_PHASH_MAX_PIXEL_DISTANCE', '24'))
+OCR_PHASH_MAX_ENTRIES = int(os.getenv('OCR_PHASH_MAX_ENTRIES', '10000'))
+
+# Risk scenario source: 'model' asks the LLM (falling back to templates on
+# failure), 'local' answers from precomputed templates with no model call
+SCENARIO_MODE = os.getenv('SCENARIO_MODE', 'model')
+# In local mode, lead with scenarios specific to the findings (card, password, ...)
+LOCAL_SCENARIOS_SPECIALIZE = os.getenv('LOCAL_SCENARIOS_SPECIALIZE', '1') == '1'
+
+# Hedged OCR calls: a call still running after the OCR_HEDGE_PERCENTILE-th
+# percentile of recent latencies (and at least OCR_HEDGE_MIN_DELAY seconds)
+# is sent again, to OCR_HEDGE_MODEL if set; the first answer wins. At most
+# OCR_HEDGE_MAX_RATE of calls are hedged, which bounds the extra quota used
+OCR_HEDGE_ENABLED = os.getenv('OCR_HEDGE_ENABLED', '0') == '1'
+OCR_HEDGE_PERCENTILE = float(os.getenv('OCR_HEDGE_PERCENTILE', '95'))
+OCR_HEDGE_MIN_DELAY = float(os.getenv('OCR_HEDGE_MIN_DELAY', '2'))
+OCR_HEDGE_MAX_RATE = float(os.getenv('OCR_HEDGE_MAX_RATE', '0.1'))
+OCR_HEDGE_MODEL = os.getenv('OCR_HEDGE_MODEL', '')
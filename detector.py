@@ -0,0 +1,203 @@
+import re
+from collections import namedtuple
+
+# Keyword tables for each privacy category.
+# Each category maps a finding group to the keywords that trigger it; a
+# group is reported once no matter how many of its keywords appear.
+KEYWORD_TABLES = {
+    'personal_identifiers': {
+        'name': ['name', 'full name', 'first name', 'last name', 'username'],
+        'email': ['email', 'e-mail', '@', 'gmail', 'yahoo', 'outlook'],
+        'phone': ['phone', 'mobile', 'cell', 'telephone', 'call me', 'contact'],
+        'address': ['address', 'street', 'avenue', 'road', 'city', 'zip code', 'postal'],
+        'birth': ['birth', 'birthday', 'born', 'age', 'date of birth', 'd.o.b'],
+        'id': ['id', 'identification', 'passport', 'driver license', 'license']
+    },
+    'location_data': {
+        keyword: [keyword] for keyword in
+        ['location', 'gps', 'coordinates', 'map', 'here', 'current location', 'latitude', 'longitude']
+    },
+    'financial_info': {
+        'bank': ['bank', 'account number', 'routing number'],
+        'card': ['credit card', 'debit card', 'card number', 'expiry', 'cvv'],
+        'financial': ['salary', 'income', 'tax', 'ssn', 'social security', 'money']
+    },
+    'medical_info': {
+        keyword: [keyword] for keyword in
+        ['medical', 'health', 'doctor', 'hospital', 'prescription', 'medicine', 'illness', 'condition']
+    },
+    'other_sensitive_data': {
+        keyword: [keyword] for keyword in
+        ['password', 'secret', 'confidential', 'private', 'sensitive']
+    }
+}
+
+Match = namedtuple('Match', ['category', 'group', 'keyword', 'start', 'end'])
+
+
+def _trie_pattern(keywords):
+    """Build a regex alternation shaped like a prefix trie of the keywords"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def render(node):
+        terminal = '' in node
+        branches = [re.escape(char) + render(child)
+                    for char, child in sorted(node.items()) if char != '']
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Longer keywords are tried first; a terminal node may stop here
+        return f'(?:{body})?' if terminal else body
+
+    return render(trie)
+
+
+class KeywordDetector:
+    """Find every keyword of every category in a single pass over the text.
+
+    All keywords are compiled once into one trie-shaped regex, so scan time
+    depends on the text length rather than on the size of the tables.
+    Keywords only match on word boundaries ("id" does not match inside
+    "did"), and an optional plural suffix is allowed after word keywords.
+    """
+
+    def __init__(self, tables=KEYWORD_TABLES):
+        self.tables = tables
+        self._owners = {}
+        self._rank = {}
+        for category, groups in tables.items():
+            for group, keywords in groups.items():
+                self._rank.setdefault((category, group), len(self._rank))
+                for keyword in keywords:
+                    self._owners.setdefault(keyword.lower(), []).append((category, group))
+        # (category, group) pairs in table order; group_ids() indexes into this
+        self.group_keys = sorted(self._rank, key=self._rank.__getitem__)
+        self._matched_ids = {}
+
+        # Group keywords by boundary shape so that symbols such as '@' can
+        # still match in the middle of a word
+        shapes = {}
+        for keyword in self._owners:
+            shape = (keyword[0].isalnum(), keyword[-1].isalnum())
+            shapes.setdefault(shape, []).append(keyword)
+
+        alternatives = []
+        for (word_start, word_end), keywords in sorted(shapes.items()):
+            pattern = _trie_pattern(keywords)
+            if word_start:
+                pattern = r'(?<!\w)' + pattern
+            if word_end:
+                pattern = f'(?:{pattern})(?:e?s)?(?!\\w)'
+            alternatives.append(f'(?:{pattern})')
+
+        # The lookahead lets overlapping keywords ('current location' and
+        # 'location') both be reported
+        self._pattern = re.compile('(?=(' + '|'.join(alternatives) + '))')
+        self.max_keyword_length = max(len(keyword) for keyword in self._owners) + 2
+
+    def _keyword_for(self, matched):
+        if matched in self._owners:
+            return matched
+        for suffix in ('es', 's'):
+            if matched.endswith(suffix) and matched[:-len(suffix)] in self._owners:
+                return matched[:-len(suffix)]
+        return None
+
+    def iter_matches(self, text, pos=0):
+        """Yield a Match for every keyword found in the text"""
+        return self._iter_lower(text.lower(), pos)
+
+    def _iter_lower(self, text_lower, pos):
+        for found in self._pattern.finditer(text_lower, pos):
+            keyword = self._keyword_for(found.group(1))
+            if keyword is None:
+                continue
+            for category, group in self._owners[keyword]:
+                yield Match(category, group, keyword, found.start(1), found.end(1))
+
+    def find_matches(self, text):
+        """Return the category, keyword and character span of each match"""
+        return list(self.iter_matches(text))
+
+    def group_ids(self, text):
+        """Return the indexes into group_keys of every group found in the text"""
+        ids = set()
+        for found in self._pattern.finditer(text.lower()):
+            matched = found.group(1)
+            # Memoize per matched string (plural forms included) to skip
+            # building a Match for every occurrence
+            matched_ids = self._matched_ids.get(matched)
+            if matched_ids is None:
+                keyword = self._keyword_for(matched)
+                matched_ids = () if keyword is None else tuple(
+                    self._rank[owner] for owner in self._owners[keyword])
+                self._matched_ids[matched] = matched_ids
+            ids.update(matched_ids)
+        return ids
+
+    def build_detected_data(self, matches):
+        """Collapse matches into the detected_data shape used by the app"""
+        groups = sorted({(match.category, match.group) for match in matches},
+                        key=self._rank.__getitem__)
+        detected_data = {category: [] for category in self.tables}
+        for category, group in groups:
+            detected_data[category].append(f'Potential {group} information')
+        return detected_data
+
+    def detect(self, text):
+        """Return detected_data for the text"""
+        return self.build_detected_data(self.iter_matches(text))
+
+
+class IncrementalDetector:
+    """Run a KeywordDetector over text that arrives in chunks.
+
+    Each feed() rescans only the tail of the text that could hold a new
+    match. A match that starts within one keyword length of the end is
+    held back until more text arrives, since 'birth' may still turn into
+    'birthday'.
+    """
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.chunks = []
+        self.matches = []
+        self._lower = ''
+        self._scanned = 0
+
+    @property
+    def text(self):
+        return ''.join(self.chunks)
+
+    def feed(self, chunk):
+        """Add a chunk of text and return the new matches it completes"""
+        self.chunks.append(chunk)
+        self._lower += chunk.lower()
+        return self._scan(final=False)
+
+    def finish(self):
+        """Flag the end of the text and return any held-back matches"""
+        return self._scan(final=True)
+
+    def _scan(self, final):
+        # Matches starting before self._scanned have already been reported
+        window = self.detector.max_keyword_length
+        new_matches = []
+        for match in self.detector._iter_lower(self._lower, self._scanned):
+            if not final and match.start + window >= len(self._lower):
+                break
+            new_matches.append(match)
+        self._scanned = len(self._lower) if final else max(self._scanned, len(self._lower) - window)
+        self.matches.extend(new_matches)
+        return new_matches
+
+    def detected_data(self):
+        return self.detector.build_detected_data(self.matches)
+
+
+DETECTOR = KeywordDetector()
@@ -0,0 +1,160 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+from metrics import REGISTRY
+
+
+def _start(fn):
+    """Run fn on a new daemon thread in the caller's context; return a Future"""
+    future = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        try:
+            future.set_result(context.run(fn))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+class HedgePolicy:
+    """Send a duplicate of a slow call and keep whichever answers first.
+
+    A call still running after the percentile-th percentile of recent
+    latencies (never less than min_delay) gets a hedge, unless more than
+    max_rate of the last window calls were hedged already. No hedges are
+    sent until min_samples latencies have been seen.
+
+    Callers get the first success. On threads the losing call cannot be
+    interrupted, so its result is discarded when it returns, and primary
+    latencies are recorded in full, which gives the tail the calls would
+    have had without hedging. In run_async the loser is cancelled, and a
+    cancelled primary's latency is not recorded rather than recorded
+    short; those primaries were the slowest, so under run_async the
+    primary histogram understates the unhedged tail.
+    """
+
+    def __init__(self, name, percentile=95, min_delay=2.0, max_rate=0.1, window=200, min_samples=20):
+        self.name = name
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self._history = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.unhedged = REGISTRY.histogram('hedge_primary_seconds',
+                                           'Latency of the original call, hedged or not; '
+                                           'primaries cancelled by run_async are left out', ('call',)).labels(call=name)
+        self.observed = REGISTRY.histogram('hedge_observed_seconds',
+                                           'Latency callers saw with hedging', ('call',)).labels(call=name)
+        self.hedges = REGISTRY.counter('hedge_requests_total', 'Duplicate upstream calls sent', ('call',))
+        self.wins = REGISTRY.counter('hedge_wins_total', 'Hedged calls by which attempt answered first',
+                                     ('call', 'winner'))
+
+    def delay(self):
+        """Seconds to wait before hedging, or None while there is too little history"""
+        if self.unhedged.count < self.min_samples:
+            return None
+        return max(self.min_delay, self.unhedged.percentile(self.percentile))
+
+    def _admit_hedge(self, slow):
+        """Record one call; True if it is slow and may be hedged under the rate cap"""
+        with self._lock:
+            allowed = slow and sum(self._history) + 1 <= self.max_rate * (len(self._history) + 1)
+            self._history.append(allowed)
+        return allowed
+
+    def _record(self, started, winner):
+        self.observed.observe(time.monotonic() - started)
+        if winner is not None:
+            self.wins.labels(call=self.name, winner=winner).inc()
+
+    def run(self, attempt, hedge_attempt=None):
+        """Call attempt() on a thread, hedging with hedge_attempt() (default
+        attempt) when it is slow; return the first successful result"""
+        started = time.monotonic()
+        delay = self.delay()
+        primary = _start(attempt)
+        primary.add_done_callback(lambda _: self.unhedged.observe(time.monotonic() - started))
+
+        if delay is not None:
+            wait([primary], timeout=delay)
+        if not self._admit_hedge(delay is not None and not primary.done()):
+            try:
+                return primary.result()
+            finally:
+                self._record(started, None)
+
+        self.hedges.labels(call=self.name).inc()
+        hedge = _start(hedge_attempt or attempt)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self._record(started, 'primary' if future is primary else 'hedge')
+                    return future.result()
+        self._record(started, None)
+        # Both failed; report the original call's error
+        return primary.result()
+
+    async def run_async(self, attempt, hedge_attempt=None):
+        """run() for coroutine functions; the losing attempt is cancelled"""
+        started = time.monotonic()
+        delay = self.delay()
+        primary = asyncio.ensure_future(attempt())
+        # A cancelled primary never finished, so its latency is unknown
+        primary.add_done_callback(lambda task: task.cancelled() or
+                                  self.unhedged.observe(time.monotonic() - started))
+        hedge = None
+        try:
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+            if not self._admit_hedge(delay is not None and not primary.done()):
+                try:
+                    return await primary
+                finally:
+                    self._record(started, None)
+
+            self.hedges.labels(call=self.name).inc()
+            hedge = asyncio.ensure_future((hedge_attempt or attempt)())
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._record(started, 'primary' if task is primary else 'hedge')
+                        return task.result()
+            self._record(started, None)
+            return await primary
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self):
+        with self._lock:
+            window = len(self._history)
+            hedged = sum(self._history)
+        wins = {labels['winner']: counter.value for labels, counter in self.wins.children()
+                if labels['call'] == self.name}
+        unhedged_p99 = self.unhedged.percentile(99)
+        observed_p99 = self.observed.percentile(99)
+        return {
+            'calls': self.observed.count,
+            'hedges': self.hedges.labels(call=self.name).value,
+            'hedge_rate': round(hedged / window, 4) if window else 0.0,
+            'max_rate': self.max_rate,
+            'wins': wins,
+            'delay': self.delay(),
+            'unhedged_p99': unhedged_p99,
+            'observed_p99': observed_p99,
+            'p99_improvement': (round(unhedged_p99 - observed_p99, 6)
+                                if unhedged_p99 is not None and observed_p99 is not None else None)
+        }
@@ -0,0 +1,85 @@
+import io
+import logging
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; images are then sent unchanged
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Magic numbers of the formats accepted by the upload form
+MAGIC_NUMBERS = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp')
+]
+
+# Formats the vision model accepts without conversion
+MODEL_MIME_TYPES = {'image/png', 'image/jpeg', 'image/gif', 'image/webp'}
+
+
+def sniff_mime_type(image_bytes, default='image/jpeg'):
+    """Return the MIME type of an image from its leading bytes"""
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return 'image/webp'
+    for magic, mime_type in MAGIC_NUMBERS:
+        if image_bytes.startswith(magic):
+            return mime_type
+    return default
+
+
+def encode_jpeg(image, grayscale=False, quality=85):
+    """Encode a Pillow image as JPEG bytes, flattening any transparency"""
+    if grayscale:
+        image = image.convert('L')
+    elif image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        # JPEG has no alpha channel, so flatten onto white
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def preprocess_image(image_bytes, max_side=2048, grayscale=False, quality=85):
+    """Shrink an image for OCR and return (image_bytes, mime_type).
+
+    The image is downscaled so its longest side is at most max_side,
+    optionally converted to grayscale, and re-encoded as JPEG. The original
+    bytes are kept when re-encoding would not make them smaller and the
+    model accepts the original format.
+    """
+    mime_type = sniff_mime_type(image_bytes)
+    if Image is None:
+        return image_bytes, mime_type
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image = ImageOps.exif_transpose(image)
+            resized = max(image.size) > max_side
+            if resized:
+                image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+            processed = encode_jpeg(image, grayscale, quality)
+    except Exception as e:
+        logger.warning(f"Image pre-processing skipped: {str(e)}")
+        return image_bytes, mime_type
+
+    if (not resized and not grayscale and mime_type in MODEL_MIME_TYPES
+            and len(processed) >= len(image_bytes)):
+        processed, new_mime_type = image_bytes, mime_type
+    else:
+        new_mime_type = 'image/jpeg'
+    logger.info(f"Image payload: {len(image_bytes)} bytes ({mime_type}) -> "
+                f"{len(processed)} bytes ({new_mime_type})",
+                extra={'bytes_before': len(image_bytes), 'bytes_after': len(processed),
+                       'mime_before': mime_type, 'mime_after': new_mime_type})
+    return processed, new_mime_type
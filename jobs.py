@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class Job:
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'created_at': self.created_at
+        }
+        if self.started_at is not None:
+            data['queue_wait'] = round(self.started_at - self.created_at, 6)
+        if self.finished_at is not None:
+            data['run_time'] = round(self.finished_at - self.started_at, 6)
+        if self.status == 'done':
+            data['result'] = self.result
+        elif self.status == 'failed':
+            data['error'] = self.error
+        return data
+
+
+class JobManager:
+    """Runs jobs on a bounded thread pool with a limited queue depth.
+
+    Submitting while max_queue jobs are already waiting raises
+    QueueFullError so callers can apply backpressure. Finished jobs are
+    kept for result_ttl seconds so clients can poll for them.
+    """
+
+    def __init__(self, workers=4, max_queue=32, result_ttl=600):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._queued = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self.queue_wait = REGISTRY.histogram('job_queue_wait_seconds',
+                                             'Time async jobs wait for a worker')
+        self.run_time = REGISTRY.histogram('job_run_seconds', 'Time async jobs take to run')
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def _prune_locked(self, now):
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and now - job.finished_at > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) and return the new job id"""
+        with self._lock:
+            self._prune_locked(time.time())
+            if self._queued >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(f"Job queue is full ({self.max_queue} waiting)")
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+            self._queued += 1
+            self.submitted += 1
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            job.status = 'running'
+            job.started_at = time.time()
+        self.queue_wait.observe(job.started_at - job.created_at)
+        try:
+            job.result = fn(*args, **kwargs)
+            job.status = 'done'
+        except Exception as e:
+            logger.error(f"Error in job {job.id}: {str(e)}", extra={'job_id': job.id})
+            job.error = str(e)
+            job.status = 'failed'
+            with self._lock:
+                self.failed += 1
+        finally:
+            job.finished_at = time.time()
+            self.run_time.observe(job.finished_at - job.started_at)
+            with self._lock:
+                self._running -= 1
+            job.done.set()
+
+    def get(self, job_id, wait=0):
+        """Return the job as a dict, waiting up to wait seconds for it to
+        finish, or None if the id is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if wait:
+            job.done.wait(wait)
+        return job.to_dict()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'queued': self._queued,
+                'running': self._running,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'failed': self.failed
+            }
+        stats['queue_wait'] = self.queue_wait.snapshot()
+        stats['run_time'] = self.run_time.snapshot()
+        return stats
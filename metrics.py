@@ -0,0 +1,227 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Latency buckets in seconds, tuned for model calls that take 0.1s-60s
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+# Buckets for fast local stages such as keyword analysis
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30, 120)
+
+
+class Histogram:
+    """Thread-safe bucketed histogram that also keeps recent samples for
+    percentile estimates"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1024):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self._recent.append(value)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[index] += 1
+                    break
+            else:
+                self._counts[-1] += 1
+
+    @contextmanager
+    def time(self):
+        """Observe the wall time of the with block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def percentile(self, q):
+        """Return the q-th percentile (0-100) of recent samples, or None"""
+        with self._lock:
+            samples = sorted(self._recent)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(q / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def cumulative_counts(self):
+        """Return [(upper_bound, cumulative_count)], count and sum"""
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self.count, self.sum
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+        return cumulative, count, total
+
+    def snapshot(self):
+        """Return cumulative bucket counts, totals and recent percentiles"""
+        cumulative, count, total = self.cumulative_counts()
+        return {
+            'count': count,
+            'sum': round(total, 6),
+            'buckets': {('+Inf' if bound == float('inf') else str(bound)): running
+                        for bound, running in cumulative},
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99)
+        }
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class MetricFamily:
+    """A named metric with one child per combination of label values"""
+
+    def __init__(self, kind, name, help_text, labelnames, factory):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._factory()
+            return child
+
+    def children(self):
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), child) for key, child in self._children.items()]
+
+    # Shortcuts for families without labels
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def percentile(self, q):
+        return self.labels().percentile(q)
+
+    def snapshot(self):
+        return self.labels().snapshot()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return str(value)
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._families = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def _family(self, kind, name, help_text, labelnames, factory):
+        # Registering the same name twice returns the existing family
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = MetricFamily(kind, name, help_text, labelnames, factory)
+            return family
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._family('counter', name, help_text, labelnames, Counter)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._family('gauge', name, help_text, labelnames, Gauge)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._family('histogram', name, help_text, labelnames, lambda: Histogram(buckets))
+
+    def callback(self, name, help_text, kind, fn):
+        """Register fn() -> [(labels, value)], read at render time"""
+        with self._lock:
+            self._callbacks.append((name, help_text, kind, fn))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            families = list(self._families.values())
+            callbacks = list(self._callbacks)
+
+        for family in families:
+            lines.append(f'# HELP {family.name} {family.help}')
+            lines.append(f'# TYPE {family.name} {family.kind}')
+            for labels, child in family.children():
+                if family.kind == 'histogram':
+                    cumulative, count, total = child.cumulative_counts()
+                    for bound, running in cumulative:
+                        bucket_labels = dict(labels, le=_format_value(float(bound)))
+                        lines.append(f'{family.name}_bucket{_format_labels(bucket_labels)} {running}')
+                    lines.append(f'{family.name}_sum{_format_labels(labels)} {_format_value(total)}')
+                    lines.append(f'{family.name}_count{_format_labels(labels)} {count}')
+                else:
+                    lines.append(f'{family.name}{_format_labels(labels)} {_format_value(child.value)}')
+
+        for name, help_text, kind, fn in callbacks:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in fn():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
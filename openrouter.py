@@ -0,0 +1,312 @@
+import asyncio
+import base64
+import contextlib
+import email.utils
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # Only the async serving path needs httpx
+    httpx = None
+
+from config import (
+    OPENROUTER_API_KEY, OPENROUTER_API_URL, OPENROUTER_POOL_SIZE,
+    OPENROUTER_CONNECT_TIMEOUT, OPENROUTER_READ_TIMEOUT, OPENROUTER_MAX_RETRIES,
+    OPENROUTER_BACKOFF_BASE, OPENROUTER_BACKOFF_MAX, OPENROUTER_RETRY_AFTER_MAX
+)
+from metrics import FAST_BUCKETS, REGISTRY
+from scheduler import SCHEDULER, current_priority
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Stand-in for the image data URL in payloads passed to build_request_body
+IMAGE_PLACEHOLDER = '__IMAGE_DATA_URL__'
+
+
+def build_request_body(payload, image_bytes, mime_type='image/jpeg'):
+    """JSON-encode a payload with the image spliced in as a base64 data URL.
+
+    The payload must contain IMAGE_PLACEHOLDER exactly once. The base64
+    bytes are joined straight into the request body, which avoids the
+    str copies made by decoding, formatting and re-serializing the image.
+    """
+    prefix, suffix = json.dumps(payload).encode('utf-8').split(IMAGE_PLACEHOLDER.encode('ascii'), 1)
+    return b''.join((prefix, b'data:', mime_type.encode('ascii'), b';base64,',
+                     base64.b64encode(image_bytes), suffix))
+
+
+def parse_retry_after(value):
+    """Return the delay in seconds requested by a Retry-After header"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class OpenRouterClient:
+    """Shared HTTP client for OpenRouter chat completions.
+
+    Owns a pooled keep-alive session, applies connect and read timeouts to
+    every call, retries 429 and 5xx responses with jittered exponential
+    backoff (honoring Retry-After), and records per-call latency. Every
+    attempt first waits for a slot from the upstream scheduler.
+    """
+
+    def __init__(self, api_url=OPENROUTER_API_URL, api_key=OPENROUTER_API_KEY,
+                 pool_size=OPENROUTER_POOL_SIZE, connect_timeout=OPENROUTER_CONNECT_TIMEOUT,
+                 read_timeout=OPENROUTER_READ_TIMEOUT, max_retries=OPENROUTER_MAX_RETRIES,
+                 backoff_base=OPENROUTER_BACKOFF_BASE, backoff_max=OPENROUTER_BACKOFF_MAX,
+                 retry_after_max=OPENROUTER_RETRY_AFTER_MAX, scheduler=SCHEDULER):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.scheduler = scheduler
+        self.session = self._create_session(pool_size)
+        self.latency = REGISTRY.histogram('openrouter_request_seconds',
+                                          'OpenRouter call latency including retries', ('call',))
+        self.responses = REGISTRY.counter('openrouter_responses_total',
+                                          'OpenRouter responses by HTTP status', ('call', 'status'))
+        self.tokens = REGISTRY.counter('openrouter_tokens_total',
+                                       'Tokens reported by OpenRouter usage blocks', ('call', 'kind'))
+        self.truncated = REGISTRY.counter('openrouter_truncated_total',
+                                          'Completions cut off at max_tokens', ('call',))
+        self.schedule_wait = REGISTRY.histogram('openrouter_schedule_wait_seconds',
+                                                'Time calls waited for the upstream scheduler',
+                                                ('priority',), FAST_BUCKETS)
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def _create_session(self, pool_size):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def _histogram(self, name):
+        return self.latency.labels(call=name)
+
+    def _backoff(self, attempt, response=None):
+        # The server knows when it will take calls again; backoff_max only
+        # bounds our own guess
+        if response is not None:
+            delay = parse_retry_after(response.headers.get('Retry-After'))
+            if delay is not None:
+                return min(delay, self.retry_after_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def post(self, payload, name='chat', timeout=None, stream=False, slots=None):
+        """POST a chat completion payload and return the raw response.
+
+        The payload is either a dict or an already encoded JSON body. The
+        scheduler slot is released once the response arrives, unless an
+        ExitStack is passed as slots: then the slot of the returned response
+        is held until that stack closes.
+        """
+        headers = self._headers()
+        if isinstance(payload, bytes):
+            body = {'data': payload}
+        else:
+            body = {'json': payload}
+        started = time.time()
+        try:
+            for attempt in range(self.max_retries + 1):
+                last_attempt = attempt == self.max_retries
+                try:
+                    with contextlib.ExitStack() as held:
+                        waited = held.enter_context(self.scheduler.slot())
+                        self.schedule_wait.labels(priority=current_priority()).observe(waited)
+                        response = self.session.post(self.api_url, headers=headers,
+                                                     timeout=timeout or self.timeout,
+                                                     stream=stream, **body)
+                        if slots is not None and response.ok:
+                            slots.push(held.pop_all())
+                except requests.ConnectionError:
+                    self.responses.labels(call=name, status='connection_error').inc()
+                    if last_attempt:
+                        raise
+                    delay = self._backoff(attempt)
+                else:
+                    self.responses.labels(call=name, status=response.status_code).inc()
+                    if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                        response.raise_for_status()
+                        return response
+                    delay = self._backoff(attempt, response)
+                    response.close()
+                    if response.status_code == 429:
+                        # The whole account is limited, so hold back every caller
+                        self.scheduler.pause(delay)
+                self._retried(name, attempt, delay)
+                time.sleep(delay)
+        finally:
+            self._histogram(name).observe(time.time() - started)
+
+    def _message_content(self, result, name):
+        usage = result.get('usage') or {}
+        for kind in ('prompt_tokens', 'completion_tokens'):
+            if usage.get(kind):
+                self.tokens.labels(call=name, kind=kind).inc(usage[kind])
+        choice = result['choices'][0]
+        if choice.get('finish_reason') == 'length':
+            self.truncated.labels(call=name).inc()
+            logger.warning("OpenRouter completion was cut off at max_tokens", extra={'call': name})
+        return choice['message']['content']
+
+    def _retried(self, name, attempt, delay):
+        with self._lock:
+            self.retries += 1
+        logger.warning(f"Retrying OpenRouter request in {delay:.2f}s...",
+                       extra={'call': name, 'attempt': attempt + 1, 'delay': round(delay, 3)})
+
+    def chat_completion(self, payload, name='chat', timeout=None):
+        """Return the message content of a chat completion"""
+        return self._message_content(self.post(payload, name=name, timeout=timeout).json(), name)
+
+    def stream_chat_completion(self, payload, name='chat', timeout=None):
+        """Yield the content deltas of a streamed chat completion.
+
+        The payload must ask for "stream": true. Closing the generator
+        early closes the connection, which stops the upstream generation.
+        The scheduler slot is held until the generator finishes or closes.
+        Latency is recorded up to the response headers.
+        """
+        with contextlib.ExitStack() as slots:
+            response = self.post(payload, name=name, timeout=timeout, stream=True, slots=slots)
+            try:
+                for line in response.iter_lines():
+                    # Skip blank separators and ': keep-alive' comments
+                    if not line.startswith(b'data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == b'[DONE]':
+                        break
+                    choices = json.loads(data).get('choices') or []
+                    if choices:
+                        content = (choices[0].get('delta') or {}).get('content')
+                        if content:
+                            yield content
+            finally:
+                response.close()
+
+    def stats(self):
+        with self._lock:
+            retries = self.retries
+        tokens = {}
+        for labels, counter in self.tokens.children():
+            tokens.setdefault(labels['call'], {})[labels['kind']] = counter.value
+        return {
+            'retries': retries,
+            'latency': {labels['call']: histogram.snapshot()
+                        for labels, histogram in self.latency.children()},
+            'tokens': tokens,
+            'scheduler': self.scheduler.stats()
+        }
+
+
+class AsyncOpenRouterClient(OpenRouterClient):
+    """OpenRouterClient for coroutines, on shared httpx.AsyncClients.
+
+    Retries, backoff, metrics and scheduler admission behave as in the
+    threaded client; waiting never blocks the event loop. httpcore's pool
+    bookkeeping is quadratic in its connection count, so the pool_size
+    connections are spread over clients of at most SHARD_SIZE each.
+    Call aclose() on shutdown.
+    """
+
+    SHARD_SIZE = 16
+
+    def _create_session(self, pool_size):
+        connect_timeout, read_timeout = self.timeout
+        shards = max(1, -(-pool_size // self.SHARD_SIZE))
+        limits = httpx.Limits(max_connections=-(-pool_size // shards))
+        self._shards = itertools.cycle(range(shards))
+        return [httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(read_timeout, connect=connect_timeout))
+                for _ in range(shards)]
+
+    async def post(self, payload, name='chat', timeout=None):
+        """POST a chat completion payload and return the raw response.
+
+        The payload is either a dict or an already encoded JSON body.
+        """
+        headers = self._headers()
+        if isinstance(payload, bytes):
+            body = {'content': payload}
+        else:
+            body = {'json': payload}
+        if timeout is not None:
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0]) if isinstance(timeout, tuple) else timeout
+        else:
+            timeout = httpx.USE_CLIENT_DEFAULT
+        started = time.time()
+        try:
+            for attempt in range(self.max_retries + 1):
+                last_attempt = attempt == self.max_retries
+                try:
+                    async with self.scheduler.async_slot() as waited:
+                        self.schedule_wait.labels(priority=current_priority()).observe(waited)
+                        response = await self.session[next(self._shards)].post(self.api_url, headers=headers,
+                                                            timeout=timeout, **body)
+                except (httpx.ConnectError, httpx.RemoteProtocolError):
+                    self.responses.labels(call=name, status='connection_error').inc()
+                    if last_attempt:
+                        raise
+                    delay = self._backoff(attempt)
+                else:
+                    self.responses.labels(call=name, status=response.status_code).inc()
+                    if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                        response.raise_for_status()
+                        return response
+                    delay = self._backoff(attempt, response)
+                    if response.status_code == 429:
+                        # The whole account is limited, so hold back every caller
+                        self.scheduler.pause(delay)
+                self._retried(name, attempt, delay)
+                await asyncio.sleep(delay)
+        finally:
+            self._histogram(name).observe(time.time() - started)
+
+    async def chat_completion(self, payload, name='chat', timeout=None):
+        """Return the message content of a chat completion"""
+        response = await self.post(payload, name=name, timeout=timeout)
+        return self._message_content(response.json(), name)
+
+    def stream_chat_completion(self, payload, name='chat', timeout=None):
+        """Not supported; stream with CLIENT from a worker thread instead"""
+        raise NotImplementedError("AsyncOpenRouterClient cannot stream completions; "
+                                  "use CLIENT.stream_chat_completion in a worker thread")
+
+    async def aclose(self):
+        for session in self.session:
+            await session.aclose()
+
+
+CLIENT = OpenRouterClient()
+# None when httpx is not installed
+ASYNC_CLIENT = AsyncOpenRouterClient() if httpx is not None else None
@@ -0,0 +1,237 @@
+import io
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import FAST_BUCKETS, REGISTRY
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; near-duplicate lookup is then off
+    Image = None
+
+
+def fingerprint(image_bytes, hash_size=16, short_side=540):
+    """Return (difference hash, grayscale pixels, size) of an image, or None.
+
+    The image is converted to grayscale and scaled so its short side is
+    at most short_side; those pixels are returned for pixel_distance(),
+    along with the (width, height) the image had before scaling.
+    For the hash they are shrunk further to (hash_size + 1) x hash_size
+    and each bit records whether a pixel is brighter than its right
+    neighbour, so it survives re-compression and resizing; a 16x16 hash
+    (256 bits) keeps enough detail to tell apart screenshots that share
+    a layout.
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image = ImageOps.exif_transpose(image).convert('L')
+            size = image.size
+            scale = min(1.0, short_side / max(1, min(image.size)))
+            if scale < 1.0:
+                image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                     Image.BOX)
+            pixels = np.asarray(image, dtype=np.uint8)
+            small = np.asarray(image.resize((hash_size + 1, hash_size), Image.BOX), dtype=np.int16)
+    except Exception:
+        return None
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big'), pixels, size
+
+
+def pixel_distance(a, b, block=4):
+    """Largest mean absolute difference over block x block tiles of two
+    grayscale images, or None when their sizes differ.
+
+    Re-compression spreads small errors over the whole image, while an
+    edited digit or word changes a few tiles a lot, so the largest tile
+    is what tells a copy from an edit.
+    """
+    if a.shape != b.shape:
+        return None
+    difference = np.abs(a.astype(np.int16) - b.astype(np.int16))
+    height, width = difference.shape[0] // block * block, difference.shape[1] // block * block
+    if not height or not width:
+        return float(difference.max()) if difference.size else 0.0
+    tiles = difference[:height, :width].reshape(height // block, block, width // block, block)
+    return float(tiles.mean(axis=(1, 3)).max())
+
+
+def dhash(image_bytes, hash_size=16):
+    """Return the difference hash of an image as an int, or None"""
+    found = fingerprint(image_bytes, hash_size)
+    return found[0] if found is not None else None
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class MultiIndexHash:
+    """Near-duplicate index over fixed-width hashes.
+
+    Each hash is split into max_distance + 1 chunks with one table per
+    chunk; by the pigeonhole principle, any hash within max_distance bits
+    shares at least one chunk exactly, so a lookup only compares against
+    the entries in max_distance + 1 buckets. The oldest entries are
+    dropped once max_entries is reached.
+    """
+
+    def __init__(self, bits=256, max_distance=6, max_entries=100000):
+        self.bits = bits
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        chunks = max_distance + 1
+        bounds = [round(i * bits / chunks) for i in range(chunks + 1)]
+        self._chunks = [(start, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])]
+        self._tables = [{} for _ in self._chunks]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _keys(self, value):
+        return [(value >> shift) & mask for shift, mask in self._chunks]
+
+    def add(self, value, data):
+        with self._lock:
+            if value in self._entries:
+                self._entries.move_to_end(value)
+                self._entries[value] = data
+                return
+            self._entries[value] = data
+            # Most buckets hold one hash, stored bare to save memory
+            for table, key in zip(self._tables, self._keys(value)):
+                bucket = table.get(key)
+                if bucket is None:
+                    table[key] = value
+                elif isinstance(bucket, list):
+                    bucket.append(value)
+                else:
+                    table[key] = [bucket, value]
+            while len(self._entries) > self.max_entries:
+                oldest, _ = self._entries.popitem(last=False)
+                for table, key in zip(self._tables, self._keys(oldest)):
+                    bucket = table[key]
+                    if not isinstance(bucket, list):
+                        del table[key]
+                        continue
+                    bucket.remove(oldest)
+                    if len(bucket) == 1:
+                        table[key] = bucket[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for table in self._tables:
+                table.clear()
+
+    def matches(self, value):
+        """Return [(distance, data)] of every entry within max_distance, closest first"""
+        with self._lock:
+            candidates = set()
+            for table, key in zip(self._tables, self._keys(value)):
+                bucket = table.get(key)
+                if isinstance(bucket, list):
+                    candidates.update(bucket)
+                elif bucket is not None:
+                    candidates.add(bucket)
+            found = [(hamming(value, candidate), candidate) for candidate in candidates]
+            return [(distance, self._entries[candidate]) for distance, candidate in sorted(found)
+                    if distance <= self.max_distance]
+
+    def nearest(self, value):
+        """Return (distance, data) of the closest entry within max_distance, or None"""
+        found = self.matches(value)
+        return found[0] if found else None
+
+
+class NearDuplicateIndex:
+    """Reuse OCR text across re-encoded copies of an image.
+
+    The perceptual hash finds candidate images cheaply; text is only
+    reused when a candidate was read with the same OCR settings and its
+    pixels, at the size they were stored, differ by at most
+    max_pixel_distance in every 4x4 tile. That accepts re-compressed,
+    re-saved or converted copies and rejects the same layout with
+    another card number. Resized copies have a different size and are
+    read again: resampling error is as large as a changed digit in
+    small text. Rejected near matches are counted.
+    """
+
+    # Screenshots of one layout can share a hash; keep the newest few
+    MAX_CONTENTS_PER_HASH = 16
+
+    def __init__(self, hash_size=16, max_distance=6, max_entries=100000, max_pixel_distance=24,
+                 short_side=540):
+        self.hash_size = hash_size
+        self.max_pixel_distance = max_pixel_distance
+        self.short_side = short_side
+        self.index = MultiIndexHash(hash_size * hash_size, max_distance, max_entries)
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.rejected = 0
+        self.lookup_time = REGISTRY.histogram('phash_lookup_seconds',
+                                              'Near-duplicate index lookup latency', buckets=FAST_BUCKETS)
+
+    def hash(self, image_bytes):
+        """Return the image's (perceptual hash, grayscale pixels, size), or None"""
+        return fingerprint(image_bytes, self.hash_size, self.short_side)
+
+    def _same_content(self, entry, settings, pixels, size):
+        entry_settings, entry_size, shape, packed, _ = entry
+        if entry_settings != settings or entry_size != size or shape != pixels.shape:
+            return False
+        stored = np.frombuffer(zlib.decompress(packed), dtype=np.uint8).reshape(shape)
+        return pixel_distance(stored, pixels) <= self.max_pixel_distance
+
+    def lookup(self, fingerprint):
+        """Return (text, hash distance) of an earlier copy of the image, or None.
+
+        fingerprint is hash() plus settings, naming whatever besides the
+        image shaped the text.
+        """
+        image_hash, pixels, size, settings = fingerprint
+        with self.lookup_time.time():
+            found = self.index.matches(image_hash)
+            match = next(((entry[-1], distance) for distance, entries in found for entry in entries
+                          if self._same_content(entry, settings, pixels, size)), None)
+        with self._lock:
+            self.lookups += 1
+            if match is not None:
+                self.hits += 1
+            elif found:
+                self.rejected += 1
+        return match
+
+    def add(self, fingerprint, text):
+        image_hash, pixels, size, settings = fingerprint
+        # Images that hash alike are kept apart by their pixels
+        found = self.index.matches(image_hash)
+        entries = list(found[0][1]) if found and found[0][0] == 0 else []
+        entries = [entry for entry in entries if not self._same_content(entry, settings, pixels, size)]
+        entries.append((settings, size, pixels.shape, zlib.compress(pixels.tobytes(), 1), text))
+        self.index.add(image_hash, entries[-self.MAX_CONTENTS_PER_HASH:])
+
+    def clear(self):
+        self.index.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups, hits, rejected = self.lookups, self.hits, self.rejected
+        return {
+            'entries': len(self.index),
+            'lookups': lookups,
+            'hits': hits,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'rejected': rejected,
+            'max_distance': self.index.max_distance,
+            'max_pixel_distance': self.max_pixel_distance,
+            'lookup_seconds': self.lookup_time.snapshot()
+        }
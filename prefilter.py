@@ -0,0 +1,112 @@
+import io
+import threading
+import time
+
+import numpy as np
+
+from metrics import FAST_BUCKETS, REGISTRY
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; every image is then sent to OCR
+    Image = None
+
+
+def text_blocks(image_bytes, short_side=768, block=16, min_contrast=12, edge=0.2, flat=0.08,
+                min_edges=0.08, min_flat=0.2, min_stroke=0.02):
+    """Number of text-like blocks in an image, or None if it cannot be decoded.
+
+    The image is scaled so its short side is at most short_side (tall
+    screenshots keep their text legible) and converted to grayscale.
+    Text is strokes on a background that is flat next to them, so a
+    block x block tile is text-like when at least min_edges of its pixels
+    have a gradient above edge, at least min_flat are flat (gradient at
+    most flat), and at least min_stroke have strong horizontal and
+    vertical gradients each. edge and flat are fractions of the tile's
+    own contrast (its 2nd to 98th percentile range), so faint, blurred
+    or low-contrast text scores like sharp black on white, and sensor
+    noise stays flat next to text that stands out from it. Tiles with
+    less than min_contrast grey levels are blank. Only tiles next to
+    another text-like tile in the same row count, since words run across
+    tiles while the corners of objects in photos give isolated hits.
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            scale = min(1.0, short_side / max(1, min(image.size)))
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            # Lets the JPEG decoder skip detail that is thrown away anyway
+            image.draft('L', size)
+            image = image.convert('L')
+            if image.size != size:
+                image = image.resize(size, Image.BILINEAR)
+            pixels = np.asarray(image, dtype=np.int16)
+    except Exception:
+        return None
+
+    height, width = (pixels.shape[0] - 1) // block * block, (pixels.shape[1] - 1) // block * block
+    if not height or not width:
+        return 0
+    shape = (height // block, block, width // block, block)
+    tiles = pixels[:height, :width].reshape(shape).transpose(0, 2, 1, 3).reshape(shape[0], shape[2], -1)
+    low, high = np.percentile(tiles, (2, 98), axis=2)
+    contrast = (high - low)[:, None, :, None]
+    dx = np.abs(pixels[:height, 1:width + 1] - pixels[:height, :width]).reshape(shape)
+    dy = np.abs(pixels[1:height + 1, :width] - pixels[:height, :width]).reshape(shape)
+    gradient = np.maximum(dx, dy)
+    strong = contrast * edge
+    strokes = np.minimum((dx > strong).mean(axis=(1, 3)), (dy > strong).mean(axis=(1, 3)))
+    text_like = (((gradient > strong).mean(axis=(1, 3)) >= min_edges)
+                 & ((gradient <= contrast * flat).mean(axis=(1, 3)) >= min_flat)
+                 & (strokes >= min_stroke)
+                 & (contrast[:, 0, :, 0] >= min_contrast))
+    pairs = text_like[:, 1:] & text_like[:, :-1]
+    in_words = np.zeros_like(text_like)
+    in_words[:, 1:] |= pairs
+    in_words[:, :-1] |= pairs
+    return int(in_words.sum())
+
+
+class TextPrefilter:
+    """Skip OCR for images that are clearly free of text"""
+
+    def __init__(self, min_blocks=2, short_side=768):
+        self.min_blocks = min_blocks
+        self.short_side = short_side
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.skipped = 0
+        self.decisions = REGISTRY.counter('ocr_prefilter_total', 'Images checked by the text prefilter',
+                                          ('decision',))
+        self.blocks = REGISTRY.histogram('ocr_prefilter_text_blocks', 'Text-like blocks found per image',
+                                         buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+        self.latency = REGISTRY.histogram('ocr_prefilter_seconds', 'Text prefilter latency',
+                                          buckets=FAST_BUCKETS)
+
+    def is_text_free(self, image_bytes):
+        """True when the image has fewer than min_blocks text-like blocks;
+        images that cannot be decoded are always sent to OCR"""
+        started = time.perf_counter()
+        blocks = text_blocks(image_bytes, self.short_side)
+        self.latency.observe(time.perf_counter() - started)
+        skip = blocks is not None and blocks < self.min_blocks
+        if blocks is not None:
+            self.blocks.observe(blocks)
+        self.decisions.labels(decision='skipped' if skip else 'ocr').inc()
+        with self._lock:
+            self.checked += 1
+            if skip:
+                self.skipped += 1
+        return skip
+
+    def stats(self):
+        with self._lock:
+            checked, skipped = self.checked, self.skipped
+        return {
+            'checked': checked,
+            'skipped': skipped,
+            'skip_rate': round(skipped / checked, 4) if checked else 0.0,
+            'min_blocks': self.min_blocks,
+            'prefilter_seconds': self.latency.snapshot()
+        }
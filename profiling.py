@@ -0,0 +1,77 @@
+import cProfile
+import os
+import pstats
+import threading
+import time
+import uuid
+
+# Stage timings of the profile running on the current thread
+_local = threading.local()
+
+# cProfile hooks are process wide on newer Pythons, so one profile at a time
+_profile_lock = threading.Lock()
+
+
+def record_stage(stage, seconds):
+    """Add seconds to the stage breakdown of the profile running on this thread"""
+    stages = getattr(_local, 'stages', None)
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+def top_functions(profiler, limit=20, sort='cumulative'):
+    """Return the limit most expensive functions of a finished profile"""
+    stats = pstats.Stats(profiler)
+    stats.sort_stats(sort)
+    functions = []
+    for func in stats.fcn_list[:limit]:
+        primitive_calls, calls, total_time, cumulative_time, _ = stats.stats[func]
+        filename, line, name = func
+        functions.append({
+            'function': name,
+            'location': f'{os.path.basename(filename)}:{line}' if line else filename,
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'total_time': round(total_time, 6),
+            'cumulative_time': round(cumulative_time, 6)
+        })
+    return functions
+
+
+def profile_call(fn, args=(), top_n=20, sort='cumulative', output_dir=None):
+    """Run fn(*args) under cProfile and return (result, profile).
+
+    The profile holds the wall time, the per-stage breakdown reported
+    through record_stage and the top_n hottest functions. With output_dir
+    the raw stats are also written there for snakeviz or pstats. If
+    another request is already being profiled, fn runs unprofiled.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return fn(*args), {'skipped': 'Another request is being profiled'}
+
+    profiler = cProfile.Profile()
+    _local.stages = {}
+    started = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            result = fn(*args)
+        finally:
+            profiler.disable()
+        wall_time = time.perf_counter() - started
+        stages = _local.stages
+    finally:
+        _local.stages = None
+        _profile_lock.release()
+
+    profile = {
+        'wall_time': round(wall_time, 6),
+        'stages': {stage: round(seconds, 6) for stage, seconds in stages.items()},
+        'top_functions': top_functions(profiler, top_n, sort)
+    }
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.prof")
+        profiler.dump_stats(path)
+        profile['file'] = path
+    return result, profile
@@ -0,0 +1,113 @@
+import io
+
+import numpy as np
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; /redact is unavailable without it
+    Image = None
+
+REDACTION_MODES = {'blackout', 'blur', 'opaque-blur'}
+
+# White overlay opacity applied after blurring, matching the canvas tool
+OVERLAY_ALPHA = {'blur': 0.1, 'opaque-blur': 0.6}
+
+OUTPUT_FORMATS = {'png': ('PNG', 'image/png'), 'jpeg': ('JPEG', 'image/jpeg'), 'webp': ('WEBP', 'image/webp')}
+
+
+class RedactionError(Exception):
+    """Raised for rectangles or options that cannot be applied"""
+
+
+def box_blur(pixels, radius, passes=2):
+    """Box blur an (H, W, C) array with a summed-area table.
+
+    Every output pixel is the mean of the (2r+1)^2 window around it, with
+    edges extended, so the cost per pass is independent of the radius.
+    Repeated passes approach a Gaussian blur.
+    """
+    if radius < 1:
+        return pixels
+    size = 2 * radius + 1
+    blurred = pixels.astype(np.float64)
+    height, width = blurred.shape[:2]
+    for _ in range(passes):
+        padded = np.pad(blurred, ((radius + 1, radius), (radius + 1, radius), (0, 0)), mode='edge')
+        # A leading row and column of zeros keeps the window sums branch free
+        padded[0, :] = 0
+        padded[:, 0] = 0
+        table = padded.cumsum(axis=0).cumsum(axis=1)
+        window = (table[size:size + height, size:size + width]
+                  - table[:height, size:size + width]
+                  - table[size:size + height, :width]
+                  + table[:height, :width])
+        blurred = window / (size * size)
+    return blurred
+
+
+def parse_rectangles(rectangles, image_size, scale=1.0, default_mode='blur', default_strength=15):
+    """Validate rectangles and return [(x0, y0, x1, y1, mode, strength)] in
+    image pixels, clipped to the image"""
+    if not isinstance(rectangles, list):
+        raise RedactionError("Rectangles must be a list")
+    width, height = image_size
+    parsed = []
+    for rect in rectangles:
+        try:
+            x = float(rect['x']) * scale
+            y = float(rect['y']) * scale
+            x1 = x + float(rect['width']) * scale
+            y1 = y + float(rect['height']) * scale
+            mode = rect.get('type') or default_mode
+            strength = int(rect.get('blurStrength') or default_strength)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise RedactionError(f"Invalid rectangle: {rect!r}")
+        if mode not in REDACTION_MODES:
+            raise RedactionError(f"Unknown redaction mode: {mode}")
+        x0, x1 = sorted((x, x1))
+        y0, y1 = sorted((y, y1))
+        box = (max(0, int(x0)), max(0, int(y0)), min(width, int(np.ceil(x1))), min(height, int(np.ceil(y1))))
+        if box[2] > box[0] and box[3] > box[1]:
+            parsed.append(box + (mode, max(1, min(strength, 100)) * scale))
+    return parsed
+
+
+def redact_pixels(pixels, rectangles):
+    """Apply parsed rectangles to an (H, W, C) uint8 array in place"""
+    for x0, y0, x1, y1, mode, strength in rectangles:
+        if mode == 'blackout':
+            pixels[y0:y1, x0:x1, :3] = 0
+            continue
+        region = box_blur(pixels[y0:y1, x0:x1, :3], max(1, int(round(strength))))
+        alpha = OVERLAY_ALPHA[mode]
+        region = region * (1 - alpha) + 255 * alpha
+        pixels[y0:y1, x0:x1, :3] = np.clip(np.rint(region), 0, 255).astype(np.uint8)
+    return pixels
+
+
+def redact_image(image_bytes, rectangles, scale=1.0, output_format='png',
+                 default_mode='blur', default_strength=15):
+    """Redact rectangles of an encoded image and return (image_bytes, mime_type).
+
+    Rectangles use the canvas tool's shape ({x, y, width, height, type,
+    blurStrength}); scale converts their coordinates to image pixels.
+    """
+    if Image is None:
+        raise RedactionError("Pillow is required for server-side redaction")
+    if output_format not in OUTPUT_FORMATS:
+        raise RedactionError(f"Unsupported output format: {output_format}")
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if 'A' in image.getbands() and output_format != 'jpeg' else 'RGB')
+    except Exception as e:
+        raise RedactionError(f"Could not read image: {str(e)}")
+
+    boxes = parse_rectangles(rectangles, image.size, scale, default_mode, default_strength)
+    pixels = redact_pixels(np.array(image), boxes)
+
+    pil_format, mime_type = OUTPUT_FORMATS[output_format]
+    output = io.BytesIO()
+    Image.fromarray(pixels).save(output, format=pil_format)
+    return output.getvalue(), mime_type
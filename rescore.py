@@ -0,0 +1,170 @@
+"""Bulk re-scoring of archived extractions.
+
+Re-runs keyword detection and the privacy score over stored extracted
+texts without generating scenarios, for use after the keyword tables or
+score weights change. Per-text detection produces a row of a group hit
+matrix; scores and risk levels are then computed for a whole chunk at
+once with NumPy. Results are produced chunk by chunk so memory stays flat.
+
+    python rescore.py archive.jsonl -o rescored.jsonl --chunk-size 20000
+
+Input lines are JSON objects with an 'extracted_text' field (other fields
+such as 'id' are passed through) or, with --plain, raw text lines.
+"""
+import argparse
+import json
+import sys
+import time
+from itertools import islice
+
+import numpy as np
+
+from config import (
+    CATEGORY_PENALTIES, FINDING_PENALTY, LOW_RISK_MIN_SCORE, MEDIUM_RISK_MIN_SCORE
+)
+from detector import DETECTOR
+
+RISK_LEVELS = np.array(['high', 'medium', 'low'])
+
+
+class InvalidRecord(ValueError):
+    """Raised for an input record that cannot be scored"""
+
+
+class BulkScorer:
+    """Vectorized equivalent of score_findings() for many texts"""
+
+    def __init__(self, detector=DETECTOR):
+        self.detector = detector
+        self.categories = list(detector.tables)
+        # One-hot map from each keyword group to its category
+        self.group_categories = np.zeros((len(detector.group_keys), len(self.categories)), dtype=np.int32)
+        for index, (category, _) in enumerate(detector.group_keys):
+            self.group_categories[index, self.categories.index(category)] = 1
+        # Penalty per finding in each category, including the flat penalty
+        self.penalties = np.array([CATEGORY_PENALTIES.get(category, 0) + FINDING_PENALTY
+                                   for category in self.categories], dtype=np.int64)
+
+    def group_matrix(self, texts):
+        """Return a (texts, groups) boolean matrix of the groups found in each text"""
+        rows, columns = [], []
+        for row, text in enumerate(texts):
+            if text:
+                ids = self.detector.group_ids(text)
+                rows.extend([row] * len(ids))
+                columns.extend(ids)
+        hits = np.zeros((len(texts), len(self.detector.group_keys)), dtype=bool)
+        hits[rows, columns] = True
+        return hits
+
+    def score(self, texts):
+        """Score a chunk of texts and return a dict of per-text arrays"""
+        counts = self.group_matrix(texts).astype(np.int32) @ self.group_categories
+        scores = np.maximum(0, 100 - counts @ self.penalties)
+        levels = (scores >= MEDIUM_RISK_MIN_SCORE).astype(np.int8) + (scores >= LOW_RISK_MIN_SCORE)
+        return {
+            'counts': counts,
+            'total_findings': counts.sum(axis=1),
+            'privacy_score': scores,
+            'risk_level': RISK_LEVELS[levels]
+        }
+
+    def iter_chunks(self, records, chunk_size=10000, text_field='extracted_text'):
+        """Yield (records, scores) for each chunk of an iterable of records.
+
+        Records are dicts holding the text in text_field, or plain strings;
+        anything else raises InvalidRecord naming its position.
+        """
+        records = iter(records)
+        position = 0
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                return
+            texts = []
+            for record in chunk:
+                position += 1
+                texts.append(record_text(record, text_field, position))
+            yield chunk, self.score(texts)
+
+    def iter_results(self, records, chunk_size=10000, text_field='extracted_text'):
+        """Yield one result dict per record, computed chunk by chunk"""
+        for chunk, scores in self.iter_chunks(records, chunk_size, text_field):
+            # Convert each array to Python values once per chunk
+            columns = zip(scores['counts'].tolist(), scores['total_findings'].tolist(),
+                          scores['privacy_score'].tolist(), scores['risk_level'].tolist())
+            for record, (counts, total_findings, privacy_score, risk_level) in zip(chunk, columns):
+                result = {} if isinstance(record, str) else {k: v for k, v in record.items() if k != text_field}
+                result['category_counts'] = dict(zip(self.categories, counts))
+                result['total_findings'] = total_findings
+                result['privacy_score'] = privacy_score
+                result['risk_level'] = risk_level
+                yield result
+
+
+def record_text(record, text_field, position):
+    """The text of one record; position (from 1) names it in errors"""
+    if isinstance(record, str):
+        return record
+    if not isinstance(record, dict):
+        raise InvalidRecord(f"record {position} is not an object or string ({type(record).__name__})")
+    text = record.get(text_field)
+    if text is not None and not isinstance(text, str):
+        raise InvalidRecord(f"record {position} has a non-string '{text_field}' ({type(text).__name__})")
+    return text or ''
+
+
+def read_records(lines, plain=False):
+    """Parse JSONL (or plain text) lines into records, skipping blank lines.
+
+    Each line is a JSON object or a JSON string holding the text; anything
+    else raises InvalidRecord naming the line.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip('\n')
+        if not line.strip():
+            continue
+        if plain:
+            yield line
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise InvalidRecord(f"line {number} is not valid JSON: {str(e)}")
+        if not isinstance(record, (dict, str)):
+            raise InvalidRecord(f"line {number} is not a JSON object or string ({type(record).__name__})")
+        yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', nargs='?', default='-', help="JSONL file, or '-' for stdin")
+    parser.add_argument('-o', '--output', default='-', help="where to write JSONL results, '-' for stdout")
+    parser.add_argument('--chunk-size', type=int, default=10000, help='texts scored per vectorized step')
+    parser.add_argument('--text-field', default='extracted_text')
+    parser.add_argument('--plain', action='store_true', help='input is one raw text per line')
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    sink = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    scorer = BulkScorer()
+    started = time.perf_counter()
+    count = 0
+    try:
+        for result in scorer.iter_results(read_records(source, args.plain), args.chunk_size, args.text_field):
+            sink.write(json.dumps(result) + '\n')
+            count += 1
+    except InvalidRecord as e:
+        raise SystemExit(f"Invalid record: {str(e)}")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    elapsed = time.perf_counter() - started
+    print(f"Re-scored {count} texts in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f}/s)",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""Scan images (or pre-extracted text) for privacy risks from the command line.
+
+Runs the same extract_text_from_image -> analyze_privacy_risk pipeline
+as /analyze over a directory tree or file list, on a thread or process
+pool, and appends one JSON line per item to the output as it finishes.
+Re-running with --resume skips items already scanned successfully, so a
+crashed scan picks up where it stopped; failed items are retried and
+their old records dropped.
+
+    python scan.py screenshots/ -o results.jsonl --workers 8
+    python scan.py --file-list todo.txt -o results.jsonl --resume
+    python scan.py extractions.jsonl --text-only --no-scenarios -o scores.jsonl
+
+With --text-only, .txt files are read as extracted text and .jsonl files
+hold one {"id", "extracted_text"} record per line; OCR is skipped.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+
+# Keep the pipeline's per-item logging out of the progress display
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import app  # noqa: E402
+import scheduler  # noqa: E402
+
+IMAGE_EXTENSIONS = {'.' + extension for extension in app.ALLOWED_EXTENSIONS}
+TEXT_EXTENSIONS = {'.txt', '.jsonl'}
+
+
+def iter_paths(inputs, file_list, extensions):
+    """Yield matching files under each input, in a stable order"""
+    if file_list:
+        with open(file_list, encoding='utf-8') as f:
+            inputs = list(inputs) + [line.strip() for line in f if line.strip()]
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in extensions:
+                        yield os.path.join(root, name)
+        elif os.path.isfile(path):
+            yield path
+        else:
+            print(f"Skipping {path}: not found", file=sys.stderr)
+
+
+def iter_items(paths, text_only):
+    """Yield (item_id, payload) pairs; payload is a path, or text with --text-only.
+
+    Inputs that cannot be read yield a ValueError or OSError as the payload,
+    so one bad line is reported as a failed item instead of ending the scan.
+    """
+    for path in paths:
+        if not text_only:
+            yield path, path
+        elif path.endswith('.jsonl'):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    for line_number, line in enumerate(f, 1):
+                        if not line.strip():
+                            continue
+                        try:
+                            record = json.loads(line)
+                        except ValueError as e:
+                            yield f'{path}:{line_number}', ValueError(f"Invalid JSON: {str(e)}")
+                            continue
+                        if not isinstance(record, dict):
+                            yield f'{path}:{line_number}', ValueError(
+                                f"Expected a JSON object, got {type(record).__name__}")
+                            continue
+                        yield str(record.get('id') or f'{path}:{line_number}'), record.get('extracted_text') or ''
+            except (OSError, ValueError) as e:
+                # Unreadable file, or bytes that are not UTF-8
+                yield path, e
+        else:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    yield path, f.read()
+            except (OSError, ValueError) as e:
+                yield path, e
+
+
+def scan_item(item_id, payload, text_only, scenarios):
+    """Run the pipeline for one item and return its result line"""
+    started = time.perf_counter()
+    result = {'id': item_id}
+    try:
+        # Bulk scans yield to interactive traffic for the upstream model
+        with scheduler.priority('batch'):
+            text = payload if text_only else app.extract_text_from_image(payload)
+            analysis = app.analyze_privacy_risk(text) if scenarios else app.score_privacy_risk(text)
+        result.update({'success': True, 'extracted_text': text, 'analysis': analysis})
+    except Exception as e:
+        result.update({'success': False, 'error': str(e)})
+    result['seconds'] = round(time.perf_counter() - started, 6)
+    return result
+
+
+def load_checkpoint(output):
+    """Return the ids already scanned successfully in output.
+
+    Failed records, and a torn last line left by a crash, are dropped
+    from the file so the retried items replace them.
+    """
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    kept = []
+    for line in lines:
+        # The scan died mid-write; drop the partial line
+        if not line.endswith(b'\n'):
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and record.get('success') is True and 'id' in record:
+            done.add(record['id'])
+            kept.append(line)
+    if len(kept) != len(lines):
+        # Write aside and swap in, so a crash here never loses results
+        partial = output + '.resume'
+        with open(partial, 'wb') as f:
+            f.writelines(kept)
+        os.replace(partial, output)
+    return done
+
+
+class Progress:
+    """Single-line progress and throughput display on stderr"""
+
+    def __init__(self, total=None, interval=0.5):
+        self.total = total
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.done = 0
+        self.failed = 0
+        self._shown = 0.0
+
+    def update(self, success):
+        self.done += 1
+        self.failed += not success
+        now = time.perf_counter()
+        if now - self._shown >= self.interval:
+            self._shown = now
+            self.show(now)
+
+    def show(self, now=None):
+        elapsed = (now or time.perf_counter()) - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        line = f"\r{self.done}"
+        if self.total is not None:
+            remaining = self.total - self.done
+            eta = remaining / rate if rate else float('inf')
+            line += f"/{self.total} ({100.0 * self.done / self.total if self.total else 100:.1f}%) eta {eta:.0f}s"
+        line += f"  {rate:.2f} items/s  {self.failed} failed   "
+        print(line, end='', file=sys.stderr, flush=True)
+
+
+def write_result(sink, result, progress):
+    sink.write(json.dumps(result) + '\n')
+    sink.flush()
+    progress.update(result['success'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='*', help='image files or directories to scan')
+    parser.add_argument('--file-list', help='file with one path per line')
+    parser.add_argument('-o', '--output', default='scan-results.jsonl', help='JSONL file results are appended to')
+    parser.add_argument('--workers', type=int, default=4, help='items processed at once')
+    parser.add_argument('--processes', action='store_true',
+                        help='use a process pool instead of threads (each process has its own upstream rate limit)')
+    parser.add_argument('--resume', action='store_true', help='skip items already scanned successfully in the output file')
+    parser.add_argument('--text-only', action='store_true', help='read pre-extracted text and skip OCR')
+    parser.add_argument('--no-scenarios', action='store_true', help='score findings without generating scenarios')
+    args = parser.parse_args()
+    if not args.inputs and not args.file_list:
+        parser.error('give at least one input or --file-list')
+
+    # Never read back the results file, which may sit inside a scanned tree
+    output_path = os.path.realpath(args.output)
+    paths = [path for path in iter_paths(args.inputs, args.file_list,
+                                         TEXT_EXTENSIONS if args.text_only else IMAGE_EXTENSIONS)
+             if os.path.realpath(path) != output_path]
+    done = load_checkpoint(args.output) if args.resume else set()
+    # Counting records inside .jsonl inputs would mean reading them twice
+    total = None if args.text_only else len([path for path in paths if path not in done])
+    if done:
+        print(f"Resuming: {len(done)} items already done", file=sys.stderr)
+
+    pool = ProcessPoolExecutor if args.processes else ThreadPoolExecutor
+    progress = Progress(total)
+    items = iter_items(paths, args.text_only)
+    with open(args.output, 'a' if args.resume else 'w', encoding='utf-8') as sink, \
+            pool(max_workers=args.workers) as executor:
+        pending = set()
+        try:
+            for item_id, payload in items:
+                # Skip finished items, and repeats of an id within this run
+                if item_id in done:
+                    continue
+                done.add(item_id)
+                if isinstance(payload, Exception):
+                    write_result(sink, {'id': item_id, 'success': False, 'error': str(payload)}, progress)
+                    continue
+                # Keep a bounded number of items in flight so huge trees
+                # don't all sit in memory at once
+                if len(pending) >= args.workers * 4:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        write_result(sink, future.result(), progress)
+                pending.add(executor.submit(scan_item, item_id, payload, args.text_only, not args.no_scenarios))
+            for future in as_completed(pending):
+                write_result(sink, future.result(), progress)
+        except KeyboardInterrupt:
+            executor.shutdown(wait=False, cancel_futures=True)
+            print("\nInterrupted; re-run with --resume to continue", file=sys.stderr)
+            raise SystemExit(130)
+    progress.show()
+    print(f"\nWrote {progress.done} results to {args.output} ({progress.failed} failed)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
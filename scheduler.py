@@ -0,0 +1,272 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from config import OPENROUTER_RPM, OPENROUTER_BURST, OPENROUTER_CONCURRENCY
+
+# Lower values are served first
+PRIORITIES = {'interactive': 0, 'scenario': 1, 'batch': 2}
+_PRIORITY_NAMES = {level: name for name, level in PRIORITIES.items()}
+
+_priority = contextvars.ContextVar('upstream_priority', default=PRIORITIES['interactive'])
+_deadline = contextvars.ContextVar('upstream_deadline', default=None)
+
+
+class SchedulerRejected(Exception):
+    """Raised when an upstream call could not start before its deadline"""
+
+    def __init__(self, estimated_wait):
+        super().__init__(f"Upstream is busy, estimated wait {estimated_wait:.1f}s")
+        self.estimated_wait = estimated_wait
+
+
+def current_priority():
+    """Name of the priority upstream calls from this context run at"""
+    return _PRIORITY_NAMES[_priority.get()]
+
+
+@contextmanager
+def priority(name):
+    """Run upstream calls in the with block at the given priority.
+
+    A block can only lower the priority it inherits, so scenario calls
+    made from a batch stay at batch priority.
+    """
+    token = _priority.set(max(_priority.get(), PRIORITIES[name]))
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@contextmanager
+def deadline(seconds):
+    """Reject upstream calls in the with block that could not start within
+    seconds from now; None waits indefinitely"""
+    token = _deadline.set(None if seconds is None else time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class UpstreamScheduler:
+    """Admit upstream calls under an RPM token bucket and a concurrency cap.
+
+    Waiting calls are served by priority, then in arrival order. A call
+    whose estimated wait exceeds its deadline is rejected up front, and a
+    queued call is dropped once its deadline passes. A rpm of 0 disables
+    the rate limit.
+    """
+
+    def __init__(self, rpm=OPENROUTER_RPM, burst=OPENROUTER_BURST, concurrency=OPENROUTER_CONCURRENCY):
+        self.rate = rpm / 60.0
+        self.burst = max(1, burst)
+        self.concurrency = max(1, concurrency)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        # Moving average of how long a call holds its slot
+        self._service_time = 0.0
+        self._cond = threading.Condition()
+        # Coroutines waiting for a slot: entry -> (loop, future)
+        self._async_waiters = {}
+        self.admitted = 0
+        self.rejected = {name: 0 for name in PRIORITIES}
+
+    def _refill_locked(self, now):
+        if self.rate:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _estimate_locked(self, level, now):
+        ahead = sum(1 for waiting_level, _ in self._waiting if waiting_level <= level)
+        estimate = max(0.0, self._paused_until - now)
+        if self.rate:
+            estimate = max(estimate, (ahead + 1 - self._tokens) / self.rate)
+        slots_short = self._in_flight + ahead + 1 - self.concurrency
+        if slots_short > 0:
+            estimate = max(estimate, -(-slots_short // self.concurrency) * self._service_time)
+        return max(0.0, estimate)
+
+    def estimated_wait(self, name='interactive'):
+        """Seconds a call at this priority would wait if submitted now"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill_locked(now)
+            return self._estimate_locked(PRIORITIES[name], now)
+
+    def pause(self, seconds):
+        """Hold back every call for seconds, e.g. after a 429 with Retry-After"""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._notify_locked()
+
+    def _notify_locked(self):
+        """Wake every waiting thread and coroutine to re-check admission"""
+        self._cond.notify_all()
+        for loop, future in self._async_waiters.values():
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # The waiter's loop has closed
+                pass
+
+    def _ready_locked(self, entry, now):
+        if self._waiting[0] != entry or self._in_flight >= self.concurrency:
+            return False, None
+        if now < self._paused_until:
+            return False, self._paused_until - now
+        if self.rate and self._tokens < 1:
+            return False, (1 - self._tokens) / self.rate
+        return True, None
+
+    def _enqueue_locked(self, level, name, give_up, now):
+        self._refill_locked(now)
+        estimate = self._estimate_locked(level, now)
+        if give_up is not None and now + estimate > give_up:
+            self.rejected[name] += 1
+            raise SchedulerRejected(estimate)
+        entry = (level, next(self._sequence))
+        heapq.heappush(self._waiting, entry)
+        return entry
+
+    def _poll_locked(self, entry, level, name, give_up):
+        """Admit entry if it may start. Returns (admitted, seconds to wait,
+        or None for until notified); raises SchedulerRejected past the deadline."""
+        now = time.monotonic()
+        self._refill_locked(now)
+        ready, timeout = self._ready_locked(entry, now)
+        if ready:
+            heapq.heappop(self._waiting)
+            if self.rate:
+                self._tokens -= 1
+            self._in_flight += 1
+            self.admitted += 1
+            # The next caller may be able to start too
+            self._notify_locked()
+            return True, None
+        if give_up is not None:
+            if now >= give_up:
+                self.rejected[name] += 1
+                raise SchedulerRejected(self._estimate_locked(level, now))
+            timeout = min(timeout or give_up - now, give_up - now)
+        return False, timeout
+
+    def _abandon_locked(self, entry):
+        self._waiting.remove(entry)
+        heapq.heapify(self._waiting)
+        self._notify_locked()
+
+    def _release(self, admitted_at):
+        with self._cond:
+            self._in_flight -= 1
+            held = time.monotonic() - admitted_at
+            self._service_time = held if not self._service_time else 0.8 * self._service_time + 0.2 * held
+            self._notify_locked()
+
+    @contextmanager
+    def slot(self):
+        """Block until the call may start, then hold a concurrency slot.
+
+        Yields the seconds spent waiting. Raises SchedulerRejected when the
+        call could not start before the deadline set with deadline().
+        """
+        level = _priority.get()
+        name = current_priority()
+        give_up = _deadline.get()
+        with self._cond:
+            started = time.monotonic()
+            entry = self._enqueue_locked(level, name, give_up, started)
+            try:
+                while True:
+                    admitted, timeout = self._poll_locked(entry, level, name, give_up)
+                    if admitted:
+                        break
+                    self._cond.wait(timeout)
+            except BaseException:
+                self._abandon_locked(entry)
+                raise
+
+        admitted_at = time.monotonic()
+        try:
+            yield admitted_at - started
+        finally:
+            self._release(admitted_at)
+
+    @asynccontextmanager
+    async def async_slot(self):
+        """slot() for coroutines: waits without blocking the event loop.
+
+        Admissions are shared with threaded callers. A waiting coroutine
+        awaits a future that is resolved, through its loop, whenever a
+        thread would be notified.
+        """
+        level = _priority.get()
+        name = current_priority()
+        give_up = _deadline.get()
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            started = time.monotonic()
+            entry = self._enqueue_locked(level, name, give_up, started)
+        try:
+            while True:
+                with self._cond:
+                    admitted, timeout = self._poll_locked(entry, level, name, give_up)
+                    if admitted:
+                        break
+                    # Registered under the lock, so no wake-up is missed
+                    woken = loop.create_future()
+                    self._async_waiters[entry] = (loop, woken)
+                try:
+                    await asyncio.wait((woken,), timeout=timeout)
+                finally:
+                    with self._cond:
+                        self._async_waiters.pop(entry, None)
+        except BaseException:
+            with self._cond:
+                self._abandon_locked(entry)
+            raise
+
+        admitted_at = time.monotonic()
+        try:
+            yield admitted_at - started
+        finally:
+            self._release(admitted_at)
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            self._refill_locked(now)
+            queued = {name: 0 for name in PRIORITIES}
+            for level, _ in self._waiting:
+                queued[_PRIORITY_NAMES[level]] += 1
+            return {
+                'rpm': round(self.rate * 60, 3),
+                'burst': self.burst,
+                'concurrency': self.concurrency,
+                'tokens': round(self._tokens, 3),
+                'in_flight': self._in_flight,
+                'queued': queued,
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+                'paused_for': round(max(0.0, self._paused_until - now), 3),
+                'avg_service_time': round(self._service_time, 6),
+                'estimated_wait': {name: round(self._estimate_locked(level, now), 3)
+                                   for name, level in PRIORITIES.items()}
+            }
+
+
+SCHEDULER = UpstreamScheduler()
@@ -12,6 +12,7 @@ let currentY = 0;
 let redactionCanvas = null;
 let redactionCtx = null;
 let originalImage = null;
+let originalImageFile = null;
 let blurStrength = 15;
 let redactionRectangles = [];
 
@@ -57,6 +58,7 @@ function initializeRedactionTool(imageFile) {
     redactionCanvas = document.getElementById('redactionCanvas');
     redactionCtx = redactionCanvas.getContext('2d');
     redactionRectangles = [];
+    originalImageFile = imageFile;
     
     const img = new Image();
     img.onload = function() {
@@ -187,55 +189,46 @@ function applyRedaction(rect) {
         // Blackout - simple rectangle
         redactionCtx.fillStyle = '#000000';
         redactionCtx.fillRect(rect.x, rect.y, rect.width, rect.height);
-    } else {
-        // Blur effects - we need to work with image data
-        const imageData = redactionCtx.getImageData(rect.x, rect.y, rect.width, rect.height);
-        
-        if (rect.type === 'blur') {
-            // Glass blur - transparent blur
-            applyBlurEffect(imageData, rect.blurStrength);
-            redactionCtx.putImageData(imageData, rect.x, rect.y);
-            
-            // Add semi-transparent overlay
-            redactionCtx.fillStyle = 'rgba(255, 255, 255, 0.1)';
-            redactionCtx.fillRect(rect.x, rect.y, rect.width, rect.height);
-        } else if (rect.type === 'opaque-blur') {
-            // Opaque blur - stronger blur with white background
-            applyBlurEffect(imageData, rect.blurStrength);
-            redactionCtx.putImageData(imageData, rect.x, rect.y);
-            
-            // Add stronger white overlay
-            redactionCtx.fillStyle = 'rgba(255, 255, 255, 0.6)';
-            redactionCtx.fillRect(rect.x, rect.y, rect.width, rect.height);
-        }
+        return;
     }
+
+    // Blur effects - let the canvas blur the clipped region; the exact blur is
+    // rendered by the server on download
+    drawBlurPreview(rect);
+
+    // Glass blur gets a light overlay, opaque blur a stronger white one
+    redactionCtx.fillStyle = rect.type === 'opaque-blur' ? 'rgba(255, 255, 255, 0.6)' : 'rgba(255, 255, 255, 0.1)';
+    redactionCtx.fillRect(rect.x, rect.y, rect.width, rect.height);
 }
 
-function applyBlurEffect(imageData, strength) {
-    const data = imageData.data;
-    const width = imageData.width;
-    const height = imageData.height;
-    
-    // Simple box blur implementation
-    for (let i = 0; i < strength; i++) {
-        for (let y = 1; y < height - 1; y++) {
-            for (let x = 1; x < width - 1; x++) {
-                const idx = (y * width + x) * 4;
-                
-                // Get surrounding pixels
-                const top = ((y-1) * width + x) * 4;
-                const bottom = ((y+1) * width + x) * 4;
-                const left = (y * width + (x-1)) * 4;
-                const right = (y * width + (x+1)) * 4;
-                
-                // Average the RGB values
-                data[idx] = (data[top] + data[bottom] + data[left] + data[right]) / 4;     // R
-                data[idx+1] = (data[top+1] + data[bottom+1] + data[left+1] + data[right+1]) / 4; // G
-                data[idx+2] = (data[top+2] + data[bottom+2] + data[left+2] + data[right+2]) / 4; // B
-                // Alpha remains the same
-            }
-        }
+function drawBlurPreview(rect) {
+    const width = redactionCanvas.width;
+    const height = redactionCanvas.height;
+
+    redactionCtx.save();
+    redactionCtx.beginPath();
+    redactionCtx.rect(rect.x, rect.y, rect.width, rect.height);
+    redactionCtx.clip();
+
+    if ('filter' in redactionCtx) {
+        redactionCtx.filter = `blur(${rect.blurStrength}px)`;
+        redactionCtx.drawImage(originalImage, 0, 0, width, height);
+    } else {
+        // No canvas filters (older Safari): pixelate by scaling the region down and back up
+        const scale = Math.max(2, rect.blurStrength);
+        const small = document.createElement('canvas');
+        small.width = Math.max(1, Math.round(rect.width / scale));
+        small.height = Math.max(1, Math.round(rect.height / scale));
+        const sx = rect.x * originalImage.width / width;
+        const sy = rect.y * originalImage.height / height;
+        const sw = rect.width * originalImage.width / width;
+        const sh = rect.height * originalImage.height / height;
+        small.getContext('2d').drawImage(originalImage, sx, sy, sw, sh, 0, 0, small.width, small.height);
+        redactionCtx.imageSmoothingEnabled = false;
+        redactionCtx.drawImage(small, rect.x, rect.y, rect.width, rect.height);
     }
+
+    redactionCtx.restore();
 }
 
 function redrawCanvas() {
@@ -287,13 +280,34 @@ function clearRedactions() {
     redrawCanvas();
 }
 
-function downloadRedactedImage() {
+async function downloadRedactedImage() {
     if (!redactionCanvas) return;
     
+    // Redact the full-resolution original on the server; fall back to the
+    // downscaled canvas if that fails
+    let href = null;
+    if (originalImageFile && redactionRectangles.length > 0) {
+        try {
+            const formData = new FormData();
+            formData.append('image', originalImageFile);
+            formData.append('rectangles', JSON.stringify(redactionRectangles));
+            formData.append('scale', originalImage.width / redactionCanvas.width);
+            const response = await fetch('/redact', { method: 'POST', body: formData });
+            if (response.ok) {
+                href = URL.createObjectURL(await response.blob());
+            }
+        } catch (error) {
+            console.error('Server-side redaction failed:', error);
+        }
+    }
+    
     const link = document.createElement('a');
     link.download = 'redacted-safe-image.png';
-    link.href = redactionCanvas.toDataURL();
+    link.href = href || redactionCanvas.toDataURL();
     link.click();
+    if (href) {
+        setTimeout(() => URL.revokeObjectURL(href), 1000);
+    }
 }
 
 function displayRiskScenarios(scenarios) {
@@ -535,20 +549,19 @@ async function analyzeImage() {
     hideError();
 
     try {
-        const response = await fetch('/analyze', {
+        // Stream the analysis so each stage renders as soon as it is ready
+        const response = await fetch('/analyze/stream', {
             method: 'POST',
             body: formData
         });
         
-        const data = await response.json();
-        
-        if (data.success) {
-            // Initialize redaction tool with the uploaded image
-            initializeRedactionTool(file);
-            displayResults(data);
-        } else {
+        if (!response.ok || !response.body) {
+            const data = await response.json();
             showError(data.error || 'Analysis failed');
+            return;
         }
+
+        await readEventStream(response, (event, data) => handleAnalysisEvent(event, data, file));
     } catch (error) {
         showError('Network error: ' + error.message);
     } finally {
@@ -556,46 +569,116 @@ async function analyzeImage() {
     }
 }
 
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Server-Sent Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            const dataLines = [];
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trim());
+                }
+            });
+            if (dataLines.length > 0) {
+                onEvent(event, JSON.parse(dataLines.join('\n')));
+            }
+        }
+    }
+}
+
+function handleAnalysisEvent(event, data, file) {
+    switch(event) {
+        case 'text':
+            // Initialize redaction tool with the uploaded image
+            hideLoading();
+            initializeRedactionTool(file);
+            displayExtractedText(data.extracted_text);
+            displayScenariosPending();
+            showResults();
+            break;
+        case 'findings':
+            displayFindings(data.analysis);
+            break;
+        case 'scenarios':
+            displayRiskScenarios(data.risk_scenarios);
+            break;
+        case 'error':
+            showError(data.error || 'Analysis failed');
+            break;
+    }
+}
+
 function displayResults(data) {
-    // Display extracted text
-    document.getElementById('extractedText').textContent = data.extracted_text || 'No text extracted';
+    displayExtractedText(data.extracted_text);
+    displayFindings(data.analysis);
 
+    // Display risk scenarios
+    if (data.analysis.risk_scenarios) {
+        displayRiskScenarios(data.analysis.risk_scenarios);
+    }
+
+    showResults();
+}
+
+function displayExtractedText(extractedText) {
+    document.getElementById('extractedText').textContent = extractedText || 'No text extracted';
+}
+
+function displayScenariosPending() {
+    const container = document.getElementById('riskScenariosContainer');
+    container.innerHTML = '<div class="scenario-card"><div class="scenario-text">⏳ Generating risk scenarios...</div></div>';
+}
+
+function displayFindings(analysis) {
     // Display detected data
-    const detectedData = data.analysis.detected_data || {};
+    const detectedData = analysis.detected_data || {};
     document.getElementById('detectedData').innerHTML = formatDetectedData(detectedData);
 
     // Display risk level and update gauge
-    const riskLevel = data.analysis.risk_level || 'unknown';
+    const riskLevel = analysis.risk_level || 'unknown';
     updateRiskGauge(riskLevel);
 
     // Display risk explanation
-    document.getElementById('riskExplanation').textContent = data.analysis.risk_explanation || 'No explanation provided';
+    document.getElementById('riskExplanation').textContent = analysis.risk_explanation || 'No explanation provided';
 
     // Display recommendations
     const recommendationsList = document.getElementById('recommendations');
     recommendationsList.innerHTML = '';
-    (data.analysis.recommendations || []).forEach(rec => {
+    (analysis.recommendations || []).forEach(rec => {
         const li = document.createElement('li');
         li.textContent = rec;
         recommendationsList.appendChild(li);
     });
 
     // Update privacy score display
-    if (data.analysis.privacy_score !== undefined) {
-        updateScoreDisplay(data.analysis.privacy_score);
+    if (analysis.privacy_score !== undefined) {
+        updateScoreDisplay(analysis.privacy_score);
     }
 
-    // Display risk scenarios
-    if (data.analysis.risk_scenarios) {
-        displayRiskScenarios(data.analysis.risk_scenarios);
+    // No text means no scenarios will follow
+    if (Object.keys(detectedData).length === 0) {
+        displayRiskScenarios([]);
     }
 
     // Create interactive visualizations
     createDataDistributionChart(detectedData);
     createRiskBreakdownChart(detectedData);
     updateCategoryBreakdown(detectedData);
-
-    showResults();
 }
 
 function formatDetectedData(data) {
@@ -0,0 +1,70 @@
+import io
+import unittest
+
+from PIL import Image, ImageDraw, ImageFont
+
+from phash import NearDuplicateIndex
+
+LINES = ["Card 4111 1111 1111 1111", "exp 04/29 cvv 123", "Call me on 555-0100", "12 Elm Street"]
+
+
+def screenshot(lines, size=(1080, 2400), font_size=24):
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=font_size)
+    for index, line in enumerate(lines):
+        draw.text((40, 100 + index * font_size * 2), line, font=font, fill=(20, 20, 20))
+    return image
+
+
+def encode(image, format='PNG', quality=90):
+    output = io.BytesIO()
+    if format == 'JPEG':
+        image.save(output, format=format, quality=quality)
+    else:
+        image.save(output, format=format)
+    return output.getvalue()
+
+
+class NearDuplicateIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = NearDuplicateIndex()
+        self.original = screenshot(LINES)
+        self.index.add(self.fingerprint(encode(self.original)), 'original text')
+
+    def fingerprint(self, image_bytes, settings='ocr'):
+        return self.index.hash(image_bytes) + (settings,)
+
+    def test_recompressed_copies_reuse_text(self):
+        for copy in (encode(self.original, 'JPEG', 60), encode(self.original, 'JPEG', 95),
+                     encode(self.original, 'WEBP'), encode(self.original.convert('L'))):
+            found = self.index.lookup(self.fingerprint(copy))
+            self.assertIsNotNone(found)
+            self.assertEqual(found[0], 'original text')
+
+    def test_changed_digit_is_read_again(self):
+        edited = list(LINES)
+        edited[0] = "Card 4111 1111 1111 1112"
+        self.assertIsNone(self.index.lookup(self.fingerprint(encode(screenshot(edited), 'JPEG', 70))))
+        self.assertEqual(self.index.stats()['rejected'], 1)
+
+    def test_other_settings_are_read_again(self):
+        self.assertIsNone(self.index.lookup(self.fingerprint(encode(self.original), settings='other')))
+
+    def test_resized_copy_is_read_again(self):
+        resized = self.original.resize((720, 1600), Image.LANCZOS)
+        self.assertIsNone(self.index.lookup(self.fingerprint(encode(resized))))
+
+    def test_layouts_sharing_a_hash_keep_their_own_text(self):
+        edited = list(LINES)
+        edited[1] = "exp 05/29 cvv 321"
+        edited_bytes = encode(screenshot(edited))
+        self.index.add(self.fingerprint(edited_bytes), 'edited text')
+        self.assertEqual(self.index.lookup(self.fingerprint(edited_bytes))[0], 'edited text')
+        self.assertEqual(self.index.lookup(self.fingerprint(encode(self.original, 'JPEG', 80)))[0],
+                         'original text')
+
+
+if __name__ == '__main__':
+    unittest.main()
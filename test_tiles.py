@@ -0,0 +1,64 @@
+import unittest
+
+from tiles import stitch_text, tile_bounds
+
+
+class StitchTextTest(unittest.TestCase):
+
+    def test_overlap_kept_once(self):
+        above = "Alice: hey\nBob: my number is 555-1234\nAlice: see you at 5\nBob: address is 12 Main St\nAlice: ok th"
+        below = "ice: see you at 5\nBob: address is 12 Main St\nAlice: ok thanks\nBob: bye"
+        self.assertEqual(stitch_text([above, below]),
+                         "Alice: hey\nBob: my number is 555-1234\nAlice: see you at 5\n"
+                         "Bob: address is 12 Main St\nAlice: ok thanks\nBob: bye")
+
+    def test_repeated_sender_above_the_seam(self):
+        above = "Alice Smith\nhere's my card 4111 1111 1111 1111\nAlice Smith"
+        below = "Alice Smith\nexp 04/29 cvv 123"
+        stitched = stitch_text([above, below])
+        self.assertIn("here's my card 4111 1111 1111 1111", stitched)
+        self.assertIn("exp 04/29 cvv 123", stitched)
+
+    def test_repeated_timestamps_around_a_line(self):
+        above = "Delivered 10:41 PM\nmy SSN is 123-45-6789\nDelivered 10:41 PM"
+        below = "Delivered 10:41 PM\nthanks, got it"
+        self.assertEqual(stitch_text([above, below]),
+                         "Delivered 10:41 PM\nmy SSN is 123-45-6789\nDelivered 10:41 PM\nthanks, got it")
+
+    def test_repeated_line_in_lower_strip(self):
+        above = "Bob: call me tonight\nDelivered 10:41 PM"
+        below = "Delivered 10:41 PM\nBob: my PIN is 4321\nDelivered 10:41 PM\nBob: bye"
+        self.assertEqual(stitch_text([above, below]),
+                         "Bob: call me tonight\nDelivered 10:41 PM\nBob: my PIN is 4321\n"
+                         "Delivered 10:41 PM\nBob: bye")
+
+    def test_no_overlap_keeps_both(self):
+        self.assertEqual(stitch_text(["one line here", "another line there"]),
+                         "one line here\nanother line there")
+
+    def test_match_away_from_seam_is_not_used(self):
+        above = "Alice Smith\nline one of the message\nline two of the message\nline three of the message"
+        below = "Alice Smith\nsomething new"
+        self.assertEqual(stitch_text([above, below]), above + "\n" + below)
+
+
+class TileBoundsTest(unittest.TestCase):
+
+    def test_short_image_is_one_tile(self):
+        self.assertEqual(tile_bounds(1000, 1600, 160, 16), [(0, 1000)])
+
+    def test_strips_cover_the_image_and_overlap(self):
+        bounds = tile_bounds(8000, 1600, 160, 16)
+        self.assertEqual(bounds[0][0], 0)
+        self.assertEqual(bounds[-1][1], 8000)
+        for (_, bottom), (top, _) in zip(bounds, bounds[1:]):
+            self.assertEqual(bottom - top, 160)
+
+    def test_max_tiles_grows_strips(self):
+        bounds = tile_bounds(100000, 1600, 160, 16)
+        self.assertEqual(len(bounds), 16)
+        self.assertEqual(bounds[-1][1], 100000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import io
+import logging
+
+from image_preprocess import encode_jpeg
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; tall images are then read in one call
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+
+def image_size(image_bytes):
+    """(width, height) of an image as displayed, or None if it cannot be read"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            width, height = image.size
+            # Orientations 5-8 are rotated by a quarter turn
+            if image.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+                width, height = height, width
+            return width, height
+    except Exception:
+        return None
+
+
+def tile_bounds(height, tile_height, overlap, max_tiles):
+    """[(top, bottom)] of overlapping horizontal strips covering height.
+
+    Strips are at most tile_height tall, evenly sized, and share overlap
+    rows with the next one. Rather than drop the bottom of an image that
+    would need more than max_tiles strips, the strips are made taller.
+    """
+    if height <= tile_height:
+        return [(0, height)]
+    count = min(max_tiles, -(-(height - overlap) // (tile_height - overlap)))
+    step = -(-(height - overlap) // count)
+    tile_height = step + overlap
+    bounds = []
+    for index in range(count):
+        top = index * step
+        bounds.append((top, min(height, top + tile_height)))
+    return bounds
+
+
+def split_image(image_bytes, bounds, max_side=2048, grayscale=False, quality=85, lossless=False):
+    """Crop an image into strips and return [(image_bytes, mime_type)].
+
+    The image is decoded once. Each strip is downscaled to max_side and
+    encoded as JPEG, or as PNG with lossless (when pre-processing is off).
+    """
+    strips = []
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.load()
+        for top, bottom in bounds:
+            strip = image.crop((0, top, image.width, bottom))
+            if lossless:
+                output = io.BytesIO()
+                strip.save(output, format='PNG')
+                strips.append((output.getvalue(), 'image/png'))
+                continue
+            strip.thumbnail((max_side, max_side), Image.LANCZOS)
+            strips.append((encode_jpeg(strip, grayscale, quality), 'image/jpeg'))
+    return strips
+
+
+def _normalize(line):
+    return ' '.join(line.lower().split())
+
+
+def _merge(above, below, window, max_edge_lines, min_chars):
+    """Join two strips' lines, keeping one copy of the lines they share.
+
+    The shared run must sit at the seam: it ends at the last non-blank
+    line of the upper strip, or at most max_edge_lines before it (lines
+    cut by the edge), and starts at most max_edge_lines into the lower
+    strip. The run closest to the seam wins, so a sender name or time
+    stamp repeated higher up never anchors the join.
+    """
+    # Only non-blank lines take part in matching; keep their positions
+    tail = [(index, _normalize(line)) for index, line in enumerate(above)
+            if line.strip()][-window:]
+    head = [(index, _normalize(line)) for index, line in enumerate(below)
+            if line.strip()][:window]
+    tail_lines = [line for _, line in tail]
+    head_lines = [line for _, line in head]
+    for trailing in range(min(max_edge_lines, len(tail) - 1) + 1):
+        end = len(tail) - trailing
+        for size in range(end, 0, -1):
+            run = tail_lines[end - size:end]
+            if sum(len(line) for line in run) < min_chars:
+                break
+            for leading in range(min(max_edge_lines, len(head) - size) + 1):
+                if head_lines[leading:leading + size] == run:
+                    cut_above = tail[end - 1][0] + 1
+                    cut_below = head[leading + size - 1][0] + 1
+                    return above[:cut_above] + below[cut_below:]
+    # No convincing overlap: keep both copies rather than risk dropping text
+    logger.info("No overlap found between OCR strips; joining them whole")
+    return above + below
+
+
+def stitch_text(texts, window=12, max_edge_lines=2, min_chars=8):
+    """Join the text read from overlapping strips, top to bottom.
+
+    Lines read in both strips of a seam are kept once, and lines cut in
+    half by an edge are taken from the strip that saw them whole. When
+    the strips share no convincing run of lines at the seam, both are
+    kept in full: text may repeat but is never dropped.
+    """
+    lines = []
+    for index, text in enumerate(texts):
+        following = (text or '').splitlines()
+        lines = following if index == 0 else _merge(lines, following, window, max_edge_lines, min_chars)
+    return '\n'.join(lines).strip()
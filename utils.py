@@ -1,7 +1,11 @@
-import requests
 import base64
+import json
+import logging
 import os
-from config import OPENROUTER_API_KEY, OPENROUTER_API_URL, MODEL_NAME, PRIVACY_ANALYSIS_PROMPT
+from config import MODEL_NAME, PRIVACY_ANALYSIS_PROMPT
+from openrouter import CLIENT
+
+logger = logging.getLogger(__name__)
 
 def encode_image_to_base64(image_path):
     """Encode image to base64 string"""
@@ -13,16 +17,11 @@ def encode_image_to_base64(image_path):
 
 def extract_text_from_image(image_path):
     """Extract text from image using Qwen VL model"""
-    print("Starting text extraction from image...")
+    logger.info("Starting text extraction from image...")
     
     try:
         base64_image = encode_image_to_base64(image_path)
         
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "model": MODEL_NAME,
             "messages": [
@@ -45,23 +44,56 @@ def extract_text_from_image(image_path):
             "max_tokens": 1000
         }
         
-        print("Sending request to OpenRouter API...")
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload)
-        response.raise_for_status()
-        
-        result = response.json()
-        extracted_text = result['choices'][0]['message']['content']
-        print("Text extraction completed successfully")
+        logger.info("Sending request to OpenRouter API...")
+        extracted_text = CLIENT.chat_completion(payload, name='ocr')
+        logger.info("Text extraction completed successfully")
         
         return extracted_text
         
     except Exception as e:
-        print(f"Error in extract_text_from_image: {str(e)}")
+        logger.error(f"Error in extract_text_from_image: {str(e)}")
         raise Exception(f"Failed to extract text from image: {str(e)}")
 
+def build_analysis_payload(text):
+    """Chat completion payload for the structured privacy analysis"""
+    return {
+        "model": MODEL_NAME,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        # The prompt's JSON example has braces, so str.format() can't be used
+                        "text": PRIVACY_ANALYSIS_PROMPT.replace('{text}', text)
+                    }
+                ]
+            }
+        ],
+        "max_tokens": 2000
+    }
+
+def parse_analysis(analysis_text):
+    """Parse the model's analysis as JSON, or wrap the raw text if it isn't"""
+    try:
+        # Models often wrap the JSON in a ```json fenced block
+        cleaned = analysis_text.strip()
+        if cleaned.startswith('```'):
+            cleaned = cleaned.strip('`')
+            if cleaned.startswith('json'):
+                cleaned = cleaned[4:]
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        return {
+            "detected_data": {"raw_analysis": analysis_text},
+            "risk_level": "unknown",
+            "risk_explanation": "Analysis completed but could not parse JSON format",
+            "recommendations": ["Please review the content manually"]
+        }
+
 def analyze_privacy_risk(text):
     """Analyze extracted text for privacy risks"""
-    print("Starting privacy risk analysis...")
+    logger.info("Starting privacy risk analysis...")
     
     if not text or not text.strip():
         return {
@@ -72,47 +104,12 @@ def analyze_privacy_risk(text):
         }
     
     try:
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": MODEL_NAME,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": PRIVACY_ANALYSIS_PROMPT.format(text=text)
-                        }
-                    ]
-                }
-            ],
-            "max_tokens": 2000
-        }
-        
-        print("Sending analysis request to OpenRouter API...")
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=payload)
-        response.raise_for_status()
-        
-        result = response.json()
-        analysis_text = result['choices'][0]['message']['content']
-        print("Privacy analysis completed successfully")
-        
-        # Try to parse as JSON, but if it fails, return the raw text
-        try:
-            import json
-            return json.loads(analysis_text)
-        except json.JSONDecodeError:
-            return {
-                "detected_data": {"raw_analysis": analysis_text},
-                "risk_level": "unknown",
-                "risk_explanation": "Analysis completed but could not parse JSON format",
-                "recommendations": ["Please review the content manually"]
-            }
+        payload = build_analysis_payload(text)
+        logger.info("Sending analysis request to OpenRouter API...")
+        analysis_text = CLIENT.chat_completion(payload, name='analysis')
+        logger.info("Privacy analysis completed successfully")
+        return parse_analysis(analysis_text)
             
     except Exception as e:
-        print(f"Error in analyze_privacy_risk: {str(e)}")
-        raise Exception(f"Failed to analyze privacy risk: {str(e)}")
\ No newline at end of file
+        logger.error(f"Error in analyze_privacy_risk: {str(e)}")
+        raise Exception(f"Failed to analyze privacy risk: {str(e)}")